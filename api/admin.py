@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import FuelStation
+from .models import FuelStation, PlanJob, PriceSnapshot, RoutePlan
 
 
 admin.site.register(FuelStation)
+admin.site.register(RoutePlan)
+admin.site.register(PriceSnapshot)
+admin.site.register(PlanJob)
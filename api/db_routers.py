@@ -0,0 +1,122 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Models whose reads can be served by a replica within the route pipeline's pinned_replica() block, its station
+# lookups. The price version is read from the same replica, so it never names prices the replica doesn't have yet.
+REPLICA_MODELS = {'api.fuelstation', 'api.pricesnapshot'}
+
+_use_primary = ContextVar('use_primary', default=False)
+_pinned_replica = ContextVar('pinned_replica', default=None)
+_lock = threading.Lock()
+_down_until: dict[str, float] = {}  # replicas failing their health check, skipped until then
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary in this block, for code that must see its own writes (ingestion, price changes)."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+@contextmanager
+def pinned_replica():
+    """
+    Serve the reads of REPLICA_MODELS in this block, the route pipeline's, from one replica so they see the same
+    point of replication. Outside of it they go to the primary, like admin reads and the ones right after a load.
+    """
+    replicas = healthy_replicas()
+    token = _pinned_replica.set(random.choice(replicas) if replicas else None)
+    try:
+        yield
+    finally:
+        _pinned_replica.reset(token)
+
+
+def healthy_replicas() -> list[str]:
+    now = time.monotonic()
+    with _lock:
+        return [alias for alias in settings.DATABASE_REPLICAS if _down_until.get(alias, 0) <= now]
+
+
+def mark_replica_down(alias: str):
+    with _lock:
+        _down_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+    logger.warning("Replica %s failed its health check, reading from the other databases for %ss.",
+                   alias, settings.DATABASE_REPLICA_RETRY_SECONDS)
+
+
+class ReplicaRouter:
+    """
+    Station reads of the route pipeline go to a healthy read replica, everything else and every write to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        pinned = _pinned_replica.get()
+        if model._meta.label_lower not in REPLICA_MODELS or pinned is None or _use_primary.get():
+            return None
+        replicas = healthy_replicas()
+        if pinned in replicas:
+            return pinned
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def check_connection(connection):
+    """
+    Close connection when it's broken or older than its CONN_MAX_AGE, so the next query reconnects. Checking costs
+    a query, a connection checked in the last DATABASE_HEALTH_CHECK_INTERVAL seconds is trusted. Safe to call from
+    any thread, Django only closes the old connections of request threads.
+    """
+    # Not within a transaction, closing would lose it
+    if connection.connection is None or connection.in_atomic_block:
+        return
+    now = time.monotonic()
+    if connection.close_at is not None and now >= connection.close_at:
+        connection.close()
+        return
+    checked_at = getattr(connection, 'health_checked_at', None)
+    if checked_at is None or now - checked_at >= settings.DATABASE_HEALTH_CHECK_INTERVAL:
+        if connection.is_usable():
+            connection.health_checked_at = now
+        else:
+            connection.close()
+
+
+def check_connections():
+    """
+    Health check of the persistent connections before they are used, see check_connection(). Replicas that can't
+    be reached are skipped for DATABASE_REPLICA_RETRY_SECONDS. Django 3.2 has no CONN_HEALTH_CHECKS, call this
+    at the start of every request or job.
+    """
+    for alias in connections:
+        check_connection(connections[alias])
+
+    for alias in healthy_replicas():
+        try:
+            # Only connects when the replica isn't connected yet
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            connections[alias].close()
+            mark_replica_down(alias)
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.contrib.gis.geos import Point
+from api.models import FuelStation
+from api.services.station_tiles import station_tile
+from api.services.price_snapshot import publish_price_snapshot
+from api.services.synthetic_stations import generate_lanes, generate_stations
+import itertools
+import json
+import time
+
+SYNTHETIC_ID_PREFIX = 'SYN'
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic fuel stations along interstate corridors, and optionally synthetic lanes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stations', type=int, default=10000, help='Number of stations to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete previously generated stations first, real stations are kept')
+        parser.add_argument('--lanes', type=int, default=0, help='Number of lanes to write to --lanes-output')
+        parser.add_argument('--lanes-output', type=str, default='lanes.jsonl',
+                            help='JSONL file for the plan_lanes command')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-graph', action='store_true',
+                            help="Don't rebuild the station graph after generating, with ROUTE_OPTIMIZER=graph")
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        if kwargs['replace']:
+            deleted, _ = FuelStation.objects.filter(truckstop_id__startswith=SYNTHETIC_ID_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted} synthetic stations.")
+
+        count = insert_stations(generate_stations(kwargs['stations'], seed=kwargs['seed']), kwargs['batch_size'])
+        publish_price_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {count} synthetic stations in {time.perf_counter() - started:.1f}s."
+        ))
+
+        if kwargs['lanes']:
+            with open(kwargs['lanes_output'], 'w') as file:
+                for lane in generate_lanes(kwargs['lanes'], seed=kwargs['seed']):
+                    file.write(json.dumps(lane) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {kwargs['lanes']} lanes to {kwargs['lanes_output']}."))
+
+        # Only the graph optimizer reads the station graph
+        if settings.ROUTE_OPTIMIZER == 'graph' and not kwargs['skip_graph']:
+            call_command('build_station_graph', stdout=self.stdout)
+
+
+def insert_stations(stations, batch_size: int = 5000) -> int:
+    """Bulk insert generated station rows, returns how many were written."""
+    count = 0
+    for batch in itertools.batched(stations, batch_size):
+        FuelStation.objects.bulk_create([
+            FuelStation(
+                truckstop_id=station['truckstop_id'],
+                name=station['name'],
+                address=station['address'],
+                city=station['city'],
+                state=station['state'],
+                rack_id=station['rack_id'],
+                retail_price=station['retail_price'],
+                location=Point(station['longitude'], station['latitude'], srid=4326),
+                tile=station_tile(station['latitude'], station['longitude']),  # bulk_create skips save()
+            )
+            for station in batch
+        ])
+        count += len(batch)
+    return count
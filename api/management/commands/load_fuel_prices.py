@@ -1,7 +1,12 @@
+from django.conf import settings
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.gis.geos import Point
+from api.db_routers import use_primary
 from api.models import FuelStation
 from api.services import GoogleMapsGeocodingService
+from api.services.price_snapshot import publish_price_snapshot
+from api.services.provider_quota import bulk_priority
 import csv
 
 
@@ -10,11 +15,29 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('--skip-graph', action='store_true',
+                            help="Don't rebuild the station graph after loading, with ROUTE_OPTIMIZER=graph")
 
     def handle(self, *args, **kwargs):
+        # Geocoding thousands of stations mustn't starve interactive route requests of quota.
+        # Ingestion reads and writes the primary only, replicas serve the API.
+        with bulk_priority(), use_primary():
+            changed = self.load(**kwargs)
+        # New price version, cached route responses are revalidated and the API workers drop the changed stations
+        snapshot = publish_price_snapshot(changed)
+        self.stdout.write(f"Published prices v{snapshot.id}, {len(changed)} stations changed.")
+
+        # Prices changed, so the cheapest hops in the station graph may have as well. Only the graph optimizer reads it.
+        if settings.ROUTE_OPTIMIZER == 'graph' and not kwargs['skip_graph']:
+            call_command('build_station_graph', stdout=self.stdout)
+
+    def load(self, **kwargs) -> set[int]:
+        """Load the CSV, returns the ids of the stations added or whose price or location changed."""
         geocoding_service = GoogleMapsGeocodingService()
         csv_file = kwargs['csv_file']
         count = 0
+        changed = set()
+        previous_prices = dict(FuelStation.objects.values_list('truckstop_id', 'retail_price'))
         with open(csv_file, 'r') as file:
             reader = csv.DictReader(file)
             for row in reader:
@@ -29,6 +52,8 @@ class Command(BaseCommand):
                         'retail_price': float(row['Retail Price'].strip())
                     }
                 )
+                if created or previous_prices.get(station.truckstop_id) != station.retail_price:
+                    changed.add(station.id)
 
                 if not station.location:
                     coords = geocoding_service.get_coordinates(
@@ -36,5 +61,7 @@ class Command(BaseCommand):
                     )
                     station.location = Point(coords[1], coords[0], srid=4326)  # longitude, latitude
                     station.save()
+                    changed.add(station.id)
                     count += 1
         self.stdout.write(self.style.SUCCESS(f"Fuel stations and prices loaded successfully for {count} stations."))
+        return changed
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.services.lane_planner import open_lane_writer, plan_lanes
+from api.services.station_snapshot import StationSnapshot
+import json
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = "Plan fuel stops for a JSONL file of lanes in parallel, writing one result per lane"
+
+    def add_arguments(self, parser):
+        parser.add_argument('lanes_file', type=str,
+                            help='JSONL file with a {"start_location", "end_location", optional "id"} object per line')
+        parser.add_argument('output_file', type=str, help='Results file, .jsonl or .parquet')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Worker processes')
+        parser.add_argument('--optimizer', type=str, default=settings.ROUTE_OPTIMIZER, help='Route optimizer name')
+        parser.add_argument('--max-range', type=float, default=settings.VEHICLE_MAX_RANGE_MILES)
+        parser.add_argument('--mpg', type=float, default=settings.VEHICLE_MPG)
+        parser.add_argument('--progress-every', type=int, default=100, help='Report progress every N lanes')
+
+    def handle(self, *args, **kwargs):
+        lanes = self.read_lanes(kwargs['lanes_file'])
+        try:
+            writer = open_lane_writer(kwargs['output_file'])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        snapshot = StationSnapshot.from_db(with_details=True)
+        self.stdout.write(
+            f"Planning {len(lanes)} lanes with {kwargs['processes']} processes "
+            f"over a snapshot of {len(snapshot)} stations."
+        )
+
+        planned = failed = 0
+        try:
+            for row in plan_lanes(
+                lanes,
+                snapshot,
+                kwargs['processes'],
+                optimizer=kwargs['optimizer'],
+                max_range_miles=kwargs['max_range'],
+                mpg=kwargs['mpg'],
+            ):
+                writer.write(row)
+                planned += 1
+                if row['error'] is not None:
+                    failed += 1
+                    self.stderr.write(f"Lane {row['id']} failed: {row['error']}")
+                if planned % kwargs['progress_every'] == 0:
+                    self.stdout.write(self.progress(planned, len(lanes), failed, started))
+        finally:
+            writer.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.progress(planned, len(lanes), failed, started)} Results written to {kwargs['output_file']}."
+        ))
+
+    def read_lanes(self, path: str) -> list[dict]:
+        lanes = []
+        with open(path, 'r') as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    lane = json.loads(line)
+                    lanes.append({
+                        'id': lane.get('id', line_number),
+                        'start_location': lane['start_location'],
+                        'end_location': lane['end_location'],
+                    })
+                except (ValueError, KeyError, AttributeError) as e:
+                    raise CommandError(f"Invalid lane on line {line_number}: {e}")
+        return lanes
+
+    def progress(self, planned: int, total: int, failed: int, started: float) -> str:
+        elapsed = time.perf_counter() - started
+        return (
+            f"Planned {planned}/{total} lanes ({failed} failed) in {elapsed:.1f}s, "
+            f"{planned / elapsed if elapsed else 0:.1f} lanes/s."
+        )
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.services.route_plan_store import prune_route_plans
+from datetime import timedelta
+
+
+class Command(BaseCommand):
+    help = "Delete the stored route plans older than the retention window, run it daily"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=settings.ROUTE_PLAN_RETENTION_DAYS,
+                            help='Keep the plans of the last this many days')
+
+    def handle(self, *args, **kwargs):
+        deleted = prune_route_plans(timedelta(days=kwargs['days']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} route plans older than {kwargs['days']:g} days."))
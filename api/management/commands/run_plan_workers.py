@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from api.services.plan_jobs import PlanJobWorker, get_plan_job_queue
+import multiprocessing
+import os
+import signal
+import threading
+
+
+class Command(BaseCommand):
+    help = "Run plan job workers, each claiming jobs from the database queue until stopped with SIGTERM or Ctrl+C"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Worker processes')
+        parser.add_argument('--poll-interval', type=float, default=settings.PLAN_JOB_POLL_INTERVAL,
+                            help='Seconds to wait before looking again when the queue is empty')
+        parser.add_argument('--drain', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **kwargs):
+        processes = kwargs['processes']
+        self.stdout.write(f"Starting {processes} plan workers.")
+        if processes <= 1:
+            run_worker(kwargs['poll_interval'], kwargs['drain'])
+            return
+
+        # Children open their own connections, none may be shared through the fork
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=run_worker, args=(kwargs['poll_interval'], kwargs['drain']), name=f'plan-worker-{i}')
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    os.kill(worker.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS("Plan workers stopped."))
+
+
+def run_worker(poll_interval: float, drain: bool = False):
+    """Worker loop, the job running when the process is told to stop is finished first."""
+    stop = threading.Event()
+    handlers = {signum: signal.signal(signum, lambda signum, frame: stop.set())
+                for signum in (signal.SIGTERM, signal.SIGINT)}
+
+    worker = PlanJobWorker(get_plan_job_queue(), poll_interval=poll_interval)
+    try:
+        if drain:
+            while not stop.is_set() and worker.run_once():
+                pass
+            connections.close_all()
+        else:
+            worker.run(stop)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
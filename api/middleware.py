@@ -0,0 +1,91 @@
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import slugify
+
+from .db_routers import check_connections
+from .profiling import QueryRecorder, SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Route'
+
+
+class DatabaseHealthCheckMiddleware:
+    """Check the persistent database connections at the start of every request, see check_connections()."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        check_connections()
+        return self.get_response(request)
+
+
+class RouteProfilingMiddleware:
+    """
+    Opt-in profiling of route requests. A sampled request, or one carrying the
+    X-Profile-Route header, runs under the sampling profiler and leaves a speedscope
+    call tree plus the executed SQL in ROUTE_PROFILING_DIR, labelled with the lane.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        lane = self.lane_label(request)
+        started = time.time()
+        with QueryRecorder() as queries, SamplingProfiler(settings.ROUTE_PROFILING_INTERVAL) as profiler:
+            response = self.get_response(request)
+
+        try:
+            self.dump(lane, started, profiler, queries, response)
+        except OSError:
+            # Profiling must never break the request it observes
+            logger.exception("Could not write route profile.")
+        return response
+
+    def should_profile(self, request) -> bool:
+        if not settings.ROUTE_PROFILING_ENABLED:
+            return False
+        if request.method != 'POST' or request.path != reverse('optimize-route'):
+            return False
+        if request.headers.get(PROFILE_HEADER):
+            return True
+        return random.random() < settings.ROUTE_PROFILING_SAMPLE_RATE
+
+    def lane_label(self, request) -> str:
+        try:
+            data = json.loads(request.body or b'{}')
+            lane = f"{data['start_location']} to {data['end_location']}"
+        except (ValueError, KeyError, TypeError):
+            lane = 'unknown lane'
+        return slugify(lane)[:100]
+
+    def dump(self, lane: str, started: float, profiler: SamplingProfiler, queries: QueryRecorder, response):
+        output_dir = Path(settings.ROUTE_PROFILING_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.fromtimestamp(started, tz=timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+        prefix = output_dir / f"{timestamp}_{lane}"
+
+        with open(f"{prefix}.speedscope.json", 'w') as file:
+            json.dump(profiler.to_speedscope(lane), file)
+        with open(f"{prefix}.sql.json", 'w') as file:
+            json.dump({
+                'lane': lane,
+                'status_code': response.status_code,
+                'duration_ms': round(profiler.duration * 1000, 3),
+                'query_count': len(queries.queries),
+                'query_time_ms': round(sum(query['duration_ms'] for query in queries.queries), 3),
+                'queries': queries.queries,
+            }, file, indent=2)
+        logger.info("Route profile written to %s.*", prefix)
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.23 on 2026-10-19 09:12
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_fuelstation_api_fuelsta_locatio_c6f98d_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutePlan',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('start_location', models.CharField(max_length=255)),
+                ('end_location', models.CharField(max_length=255)),
+                ('route', django.contrib.gis.db.models.fields.LineStringField(srid=4326)),
+                ('total_distance', models.FloatField()),
+                ('max_range_miles', models.FloatField()),
+                ('mpg', models.FloatField()),
+                ('candidate_station_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+            ],
+        ),
+    ]
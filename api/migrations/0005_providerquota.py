@@ -0,0 +1,21 @@
+# Generated by Django 3.2.23 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_routeplan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderQuota',
+            fields=[
+                ('endpoint', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.23 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_planjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planjob',
+            name='waypoints',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.23 on 2026-10-19 14:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_planjob_waypoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('start_point', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+                ('end_point', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+                ('route', django.contrib.gis.db.models.fields.LineStringField(srid=4326)),
+                ('total_distance', models.FloatField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.23 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_cachedroute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fuelstation',
+            name='tile',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        # Same as station_tiles.station_tile() with 1 degree tiles
+        migrations.RunSQL(
+            sql="""
+                UPDATE api_fuelstation
+                SET tile = floor(ST_Y(location) + 90)::integer * 360 + mod(floor(ST_X(location) + 180)::integer, 360)
+                WHERE location IS NOT NULL
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='fuelstation',
+            index=models.Index(fields=['tile', 'retail_price'], name='api_fuelsta_tile_522a1d_idx'),
+        ),
+    ]
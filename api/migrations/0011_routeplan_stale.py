@@ -0,0 +1,39 @@
+# Generated by Django 3.2.23 on 2026-10-19 16:10
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_fuelstation_tile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routeplan',
+            name='geometry_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='routeplan',
+            name='price_version',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='routeplan',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='routeplan',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['candidate_station_ids'], name='api_routepl_candida_a67fcd_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='routeplan',
+            index=models.Index(
+                fields=['geometry_hash', 'max_range_miles', 'mpg'], name='api_routepl_geometr_481d0a_idx'),
+        ),
+    ]
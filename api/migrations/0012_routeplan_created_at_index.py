@@ -0,0 +1,17 @@
+# Generated by Django 3.2.23 on 2026-10-19 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_routeplan_stale'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='routeplan',
+            index=models.Index(fields=['created_at'], name='api_routepl_created_3e202a_idx'),
+        ),
+    ]
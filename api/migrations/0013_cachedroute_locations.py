@@ -0,0 +1,25 @@
+# Generated by Django 3.2.23 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_routeplan_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedroute',
+            name='start_location',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='cachedroute',
+            name='end_location',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+            preserve_default=False,
+        ),
+    ]
@@ -1,4 +1,10 @@
+import uuid
+
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+
+from .services.station_tiles import station_tile
 
 
 class FuelStation(models.Model):
@@ -10,11 +16,114 @@ class FuelStation(models.Model):
     location = models.PointField(blank=True, null=True)
     rack_id = models.CharField(max_length=255, default='')
     retail_price = models.FloatField(blank=True, null=True)
+    # Tile of the location, lookups are narrowed to the tiles around the route first (see station_tiles)
+    tile = models.IntegerField(blank=True, null=True)
 
     class Meta:
         indexes = [
-            models.Index(fields=['location'])  # Geospatial index for location field
+            models.Index(fields=['location']),  # Geospatial index for location field
+            models.Index(fields=['tile', 'retail_price']),
         ]
 
     def __str__(self):
         return f"{self.name} - {self.city}, {self.state}"
+
+    def save(self, *args, **kwargs):
+        self.tile = station_tile(self.location.y, self.location.x) if self.location else None
+        super().save(*args, **kwargs)
+
+
+class RoutePlan(models.Model):
+    """A computed plan, kept so it can be re-planned from a later position."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    start_location = models.CharField(max_length=255)
+    end_location = models.CharField(max_length=255)
+    route = models.LineStringField()
+    total_distance = models.FloatField()  # driving distance in miles
+    max_range_miles = models.FloatField()
+    mpg = models.FloatField()
+    # Stations in the route corridor, the only ones a re-plan considers
+    candidate_station_ids = ArrayField(models.BigIntegerField(), default=list)
+    geometry_hash = models.CharField(max_length=32, blank=True, default='')  # route_geometry.geometry_hash()
+    price_version = models.IntegerField(blank=True, null=True)  # PriceSnapshot the plan was priced with
+    # Set when prices of its corridor stations change, or a station is added or moved near the route
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['candidate_station_ids']),  # plans that considered the stations of a price load
+            models.Index(fields=['geometry_hash', 'max_range_miles', 'mpg']),
+            models.Index(fields=['created_at']),  # retention window and pruning
+        ]
+
+    def __str__(self):
+        return f"{self.start_location} - {self.end_location}"
+
+
+class CachedRoute(models.Model):
+    """Directions fetched for a lane, reused for requests whose endpoints are close to the route's."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    # First and last point of the route, spatially indexed to find the routes starting and ending near a request
+    start_point = models.PointField()
+    end_point = models.PointField()
+    route = models.LineStringField()
+    total_distance = models.FloatField()  # driving distance in miles
+    # Normalized addresses the route was fetched for, every process locates them without geocoding
+    start_location = models.CharField(max_length=255, blank=True, db_index=True)
+    end_location = models.CharField(max_length=255, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.start_point.coords} - {self.end_point.coords} ({self.total_distance:.0f} mi)"
+
+
+class ProviderQuota(models.Model):
+    """Token bucket of a provider endpoint, shared by every process when PROVIDER_QUOTA_BACKEND is postgres."""
+    endpoint = models.CharField(max_length=100, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.endpoint}: {self.tokens:.1f} tokens"
+
+
+class PriceSnapshot(models.Model):
+    """A fuel price load. The latest id versions the prices route ETags are computed from."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    stations = models.IntegerField(default=0)  # priced stations after the load
+
+    def __str__(self):
+        return f"Prices v{self.id} ({self.stations} stations)"
+
+
+class PlanJob(models.Model):
+    """A route plan requested through the jobs API, claimed and run by a plan worker."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    start_location = models.CharField(max_length=255)
+    end_location = models.CharField(max_length=255)
+    waypoints = models.JSONField(blank=True, default=list)  # stops in between, in order
+    optimizer = models.CharField(max_length=50)
+    max_range_miles = models.FloatField()
+    mpg = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    result = models.JSONField(blank=True, null=True)  # the route response body
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'])  # workers claim the oldest queued job
+        ]
+
+    def __str__(self):
+        return f"{self.start_location} - {self.end_location} ({self.status})"
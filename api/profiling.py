@@ -0,0 +1,108 @@
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from typing import Any
+
+from django.db import connections
+
+
+class SamplingProfiler:
+    """
+    Low overhead profiler: a background thread samples the profiled thread's stack
+    every `interval` seconds instead of tracing every call.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.frames: list[dict[str, Any]] = []
+        self.samples: list[list[int]] = []
+        self.weights: list[float] = []
+        self.duration = 0.0
+        self._frame_index: dict[tuple, int] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._target_thread_id = None
+
+    def __enter__(self):
+        self._target_thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name='route-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _sample(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()  # speedscope wants the outermost frame first
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+
+    def _index(self, frame) -> int:
+        code = frame.f_code
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def to_speedscope(self, name: str) -> dict[str, Any]:
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'spotter',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+        }
+
+
+class QueryRecorder:
+    """Record the SQL executed on every database connection of the current thread."""
+
+    def __init__(self):
+        self.queries: list[dict[str, Any]] = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for conn in connections.all():
+            self._stack.enter_context(conn.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params),
+                'many': many,
+                'database': context['connection'].alias,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
@@ -0,0 +1,167 @@
+import json
+from decimal import Decimal
+from typing import Any
+
+from rest_framework.renderers import BaseRenderer
+
+from .services.route_geometry import dedupe_consecutive, encode_polyline
+
+STOP_FIELDS = ('name', 'address', 'city', 'state', 'price')
+EXTRA_FIELDS = ('plan_id', 'off_route_miles', 'route_approximation_miles')
+
+# ~10cm, more precision than any provider returns
+COORDINATE_DECIMALS = 6
+
+
+def _extras(plan: dict[str, Any]) -> dict[str, Any]:
+    """Optional top level fields, with the plan id as a string so every format can encode it."""
+    return {
+        field: str(plan[field]) if field == 'plan_id' else plan[field]
+        for field in EXTRA_FIELDS if field in plan
+    }
+
+
+def compact_route_plan(plan: dict[str, Any]) -> dict[str, Any]:
+    """Plain route plan for the compact renderers: floats, deduplicated route and separate stops."""
+    route, stops = [], []
+    for point in plan['route']:
+        if isinstance(point, tuple):
+            route.append(point)
+            continue
+        route.append((point['latitude'], point['longitude']))
+        if 'name' in point:
+            stops.append({
+                'latitude': point['latitude'],
+                'longitude': point['longitude'],
+                **{field: point[field] for field in STOP_FIELDS},
+            })
+
+    return {
+        **_extras(plan),
+        'total_distance': float(plan['total_distance']),
+        'total_fuel_cost': float(plan['total_fuel_cost']),
+        'route': dedupe_consecutive(route),
+        'stops': stops,
+    }
+
+
+class RoutePlanRenderer(BaseRenderer):
+    """
+    Base of the compact route plan formats. The view hands these renderers
+    the output of compact_route_plan() instead of the serialized response.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = renderer_context.get('response') if renderer_context else None
+        if data is None or (response is not None and response.status_code == 304):
+            # Not modified, there is no body to render
+            return b''
+        if response is not None and response.status_code >= 400:
+            # Errors keep the plain JSON shape whatever the accepted format, and say so
+            response['Content-Type'] = 'application/json'
+            return json.dumps(data, default=str).encode()
+        return self.render_plan(data)
+
+    def render_plan(self, plan: dict[str, Any]) -> bytes:
+        raise NotImplementedError
+
+
+def _stop_properties(stop: dict[str, Any]) -> dict[str, Any]:
+    properties = {field: stop[field] for field in STOP_FIELDS}
+    if isinstance(properties['price'], Decimal):
+        properties['price'] = float(properties['price'])
+    return properties
+
+
+class GeoJSONRenderer(RoutePlanRenderer):
+    media_type = 'application/geo+json'
+    format = 'geojson'
+
+    def render_plan(self, plan: dict[str, Any]) -> bytes:
+        line = {
+            'type': 'Feature',
+            'geometry': {
+                'type': 'LineString',
+                'coordinates': [
+                    [round(lon, COORDINATE_DECIMALS), round(lat, COORDINATE_DECIMALS)]
+                    for lat, lon in plan['route']
+                ],
+            },
+            'properties': {
+                **_extras(plan),
+                'total_distance': plan['total_distance'],
+                'total_fuel_cost': plan['total_fuel_cost'],
+            },
+        }
+        stops = [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [
+                        round(stop['longitude'], COORDINATE_DECIMALS),
+                        round(stop['latitude'], COORDINATE_DECIMALS),
+                    ],
+                },
+                'properties': _stop_properties(stop),
+            }
+            for stop in plan['stops']
+        ]
+        return json.dumps(
+            {'type': 'FeatureCollection', 'features': [line] + stops},
+            separators=(',', ':'),
+        ).encode()
+
+
+class EncodedPolylineRenderer(RoutePlanRenderer):
+    media_type = 'application/vnd.spotter.polyline+json'
+    format = 'polyline'
+
+    def render_plan(self, plan: dict[str, Any]) -> bytes:
+        return json.dumps(
+            {
+                **_extras(plan),
+                'total_distance': plan['total_distance'],
+                'total_fuel_cost': plan['total_fuel_cost'],
+                'polyline': encode_polyline(plan['route']),
+                'stops': [
+                    {'latitude': stop['latitude'], 'longitude': stop['longitude'], **_stop_properties(stop)}
+                    for stop in plan['stops']
+                ],
+            },
+            separators=(',', ':'),
+        ).encode()
+
+
+class MessagePackRenderer(RoutePlanRenderer):
+    """
+    Route as a flat [lat, lon, lat, lon, ...] array of single precision floats (~1m), every other number,
+    prices included, in double precision.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+
+    def render_plan(self, plan: dict[str, Any]) -> bytes:
+        import msgpack
+
+        fields = {
+            **_extras(plan),
+            'total_distance': plan['total_distance'],
+            'total_fuel_cost': plan['total_fuel_cost'],
+            'route': None,
+            'stops': [
+                {'latitude': stop['latitude'], 'longitude': stop['longitude'], **_stop_properties(stop)}
+                for stop in plan['stops']
+            ],
+        }
+        # One map packed field by field, so the precision can differ between them
+        packer, single_packer = msgpack.Packer(), msgpack.Packer(use_single_float=True)
+        body = [packer.pack_map_header(len(fields))]
+        for name, value in fields.items():
+            body.append(packer.pack(name))
+            if name == 'route':
+                body.append(single_packer.pack([coordinate for point in plan['route'] for coordinate in point]))
+            else:
+                body.append(packer.pack(value))
+        return b''.join(body)
@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import FuelStation
+from .models import FuelStation, PlanJob
 
 
 class FuelStationSerializer(serializers.ModelSerializer):
@@ -24,11 +25,92 @@ class FuelStationSerializer(serializers.ModelSerializer):
         return []
 
 
+class PlanJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+
+    class Meta:
+        model = PlanJob
+        fields = [
+            'job_id',
+            'status',
+            'start_location',
+            'end_location',
+            'waypoints',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'attempts',
+            'result',
+            'error',
+        ]
+
+
 class RouteRequestSerializer(serializers.Serializer):
     start_location = serializers.CharField(
         help_text="Starting location (city, state or address)")
     end_location = serializers.CharField(
         help_text="Destination location (city, state or address)")
+    waypoints = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        default=list,
+        max_length=settings.ROUTE_MAX_WAYPOINTS,
+        help_text="Stops between the start and the destination, visited in order")
+
+
+class WhatIfRequestSerializer(RouteRequestSerializer):
+    max_range_miles = serializers.ListField(
+        child=serializers.FloatField(min_value=1),
+        required=False,
+        default=lambda: [settings.VEHICLE_MAX_RANGE_MILES],
+        min_length=1,
+        help_text="Ranges on a full tank to try, in miles")
+    mpg = serializers.ListField(
+        child=serializers.FloatField(min_value=0.1),
+        required=False,
+        default=lambda: [settings.VEHICLE_MPG],
+        min_length=1,
+        help_text="Fuel efficiencies to try, in miles per gallon")
+    fuel_levels = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=1),
+        required=False,
+        default=lambda: [1.0],
+        min_length=1,
+        help_text="Starting fuel levels to try, from 0 (empty) to 1 (full)")
+
+    def validate(self, data):
+        scenarios = len(data['max_range_miles']) * len(data['mpg']) * len(data['fuel_levels'])
+        if scenarios > settings.WHAT_IF_MAX_SCENARIOS:
+            raise serializers.ValidationError(
+                f"{scenarios} scenarios requested, at most {settings.WHAT_IF_MAX_SCENARIOS} are allowed.")
+        return data
+
+
+class AlternativesRequestSerializer(RouteRequestSerializer):
+    count = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.ALTERNATIVE_PLANS_MAX,
+        required=False,
+        default=3,
+        help_text="Number of plans to return, best first")
+    objective = serializers.ChoiceField(
+        choices=['cost', 'stops'],
+        required=False,
+        default='cost',
+        help_text="Ranking of the plans: cheapest first, or fewest stops first")
+    avoid = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        default=list,
+        help_text="Chains to avoid, stations whose name contains one of them are skipped")
+
+
+class ReplanRequestSerializer(serializers.Serializer):
+    plan_id = serializers.UUIDField(help_text="ID of the plan returned by the route endpoint")
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    fuel_level = serializers.FloatField(
+        min_value=0, max_value=1, help_text="Fuel left in the tank, from 0 (empty) to 1 (full)")
 
 
 class RouteWithStopSerializer(serializers.Serializer):
@@ -50,7 +132,65 @@ class RouteWithStopSerializer(serializers.Serializer):
         return super().to_representation(instance)
 
 
+_PRICE_FIELD = serializers.DecimalField(max_digits=15, decimal_places=5)
+_STOP_TEXT_FIELDS = ('name', 'address', 'city', 'state')
+_PLAN_EXTRA_FIELDS = ('plan_id', 'off_route_miles', 'route_approximation_miles')
+
+
+def route_point_data(point: tuple | dict) -> dict:
+    """
+    Same output as validating RouteWithStopSerializer(point).data, without building
+    a serializer per point. Routes have thousands of points, only the stops have details.
+    """
+    if isinstance(point, tuple):
+        return {'latitude': point[0], 'longitude': point[1]}
+
+    data = {'latitude': float(point['latitude']), 'longitude': float(point['longitude'])}
+    for field in _STOP_TEXT_FIELDS:
+        if field in point:
+            data[field] = None if point[field] is None else str(point[field]).strip()
+    if 'price' in point:
+        data['price'] = None if point['price'] is None else _PRICE_FIELD.to_representation(point['price'])
+    return data
+
+
 class RouteResponseSerializer(serializers.Serializer):
+    plan_id = serializers.UUIDField(required=False)
+    off_route_miles = serializers.FloatField(required=False)
+    route_approximation_miles = serializers.FloatField(required=False)
     total_distance = serializers.DecimalField(max_digits=15, decimal_places=5)
     total_fuel_cost = serializers.DecimalField(max_digits=15, decimal_places=5)
-    route_points = RouteWithStopSerializer(many=True)
+    # Optional so the view can validate the totals and add route_point_data() points itself
+    route_points = RouteWithStopSerializer(many=True, required=False)
+
+
+def route_response_data(plan: dict) -> dict:
+    """JSON body of a route response for a plan of the RoutePlanner."""
+    route_points_data = [route_point_data(point) for point in plan['route']]
+    response_data = {
+        **{field: plan[field] for field in _PLAN_EXTRA_FIELDS if field in plan},
+        'total_distance': plan['total_distance'],
+        'total_fuel_cost': plan['total_fuel_cost'],
+    }
+
+    # Only the totals go through the serializer, the points are already in their output form
+    response_serializer = RouteResponseSerializer(data=response_data)
+    response_serializer.is_valid(raise_exception=True)
+    return {**response_serializer.data, 'route_points': route_points_data}
+
+
+def alternatives_response_data(result: dict) -> dict:
+    """JSON body of an alternatives response, the route once and the stops and cost of every plan."""
+    return {
+        'total_distance': result['total_distance'],
+        'objective': result['objective'],
+        'route_points': [route_point_data(point) for point in result['route']],
+        'alternatives': [
+            {
+                'rank': rank,
+                'total_fuel_cost': _PRICE_FIELD.to_representation(plan['total_fuel_cost']),
+                'stops': [route_point_data({**stop._asdict(), 'price': stop.retail_price}) for stop in plan['stops']],
+            }
+            for rank, plan in enumerate(result['alternatives'], start=1)
+        ],
+    }
@@ -1,14 +1,47 @@
-from .spotter_fuel_station_repository import SpotterFuelStationRepository
-from .greedy_route_optimizer import GreedyRouteOptimizer
-from .spotter_geocoding_service import OpenRouteGeocodingService, GoogleMapsGeocodingService
-from .standard_fuel_calculator import StandardFuelCostCalculator
-from .folium_map_plotter import FoliumMapPlotter
-
-__all__ = [
-    "SpotterFuelStationRepository",
-    "GreedyRouteOptimizer",
-    "OpenRouteGeocodingService",
-    "GoogleMapsGeocodingService",
-    "StandardFuelCostCalculator",
-    "FoliumMapPlotter",
-]
+import importlib
+
+# Services are imported on first attribute access (PEP 562), so importing the package
+# doesn't drag in folium, googlemaps or openrouteservice for callers that never use them.
+_LAZY_ATTRIBUTES = {
+    "SpotterFuelStationRepository": ".spotter_fuel_station_repository",
+    "GreedyRouteOptimizer": ".greedy_route_optimizer",
+    "OpenRouteGeocodingService": ".spotter_geocoding_service",
+    "GoogleMapsGeocodingService": ".spotter_geocoding_service",
+    "StandardFuelCostCalculator": ".standard_fuel_calculator",
+    "FoliumMapPlotter": ".folium_map_plotter",
+    "FakeGeocodingService": ".fake_geocoding_service",
+    "HedgedRoutingService": ".hedged_routing_service",
+    "get_routing_service": ".hedged_routing_service",
+    "QuotaManager": ".provider_quota",
+    "bulk_priority": ".provider_quota",
+    "get_quota_manager": ".provider_quota",
+    "RouteRequestCoalescer": ".route_coalescer",
+    "SingleFlight": ".route_coalescer",
+    "get_route_coalescer": ".route_coalescer",
+    "RoutePlanner": ".route_planner",
+    "RoutePlanStore": ".route_plan_store",
+    "GraphRouteOptimizer": ".graph_route_optimizer",
+    "StationGraph": ".station_graph",
+    "StationSnapshot": ".station_snapshot",
+    "get_price_version": ".price_snapshot",
+    "publish_price_snapshot": ".price_snapshot",
+    "get_routing_provider_class": ".registry",
+    "get_route_optimizer_class": ".registry",
+    "get_map_plotter_class": ".registry",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .geo_arrays import haversine_miles
+from .station_snapshot import StationSnapshot
+
+OBJECTIVES = ('cost', 'stops')
+
+# Stations are matched to the route in chunks, bounding the station x route point distance matrix
+_CHUNK_POINTS = 1_000_000
+
+
+@dataclass
+class AlternativePlan:
+    """Fuel stops of one plan, as indices into the snapshot the plans were made from."""
+    stations: list[int]
+    price_sum: float  # sum of the stop prices, the plan costs that times the gallons of a full tank
+
+    @property
+    def stops(self) -> int:
+        return len(self.stations)
+
+
+def stations_along(
+    route_points: list[tuple[float, float]],
+    total_distance: float,
+    stations: StationSnapshot,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """
+    Driving miles from the start to the route point closest to every station, the station's straight line
+    offset from that point, and the route length. Straight line lengths along the route are scaled to
+    total_distance, the driving distance.
+    """
+    route = np.asarray(route_points, dtype=np.float64).reshape(-1, 2)
+    latitudes, longitudes = route[:, 0], route[:, 1]
+    along = np.concatenate([[0.0], np.cumsum(
+        haversine_miles(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:]))])
+    scale = total_distance / along[-1] if along[-1] > 0 else 1.0
+
+    # Closest route point on a local equirectangular plane, much cheaper than haversine and as good at this scale
+    closest = np.zeros(len(stations), dtype=np.int64)
+    chunk = max(1, _CHUNK_POINTS // len(route))
+    for first in range(0, len(stations), chunk):
+        station_latitudes = stations.latitudes[first:first + chunk, None]
+        scale_x = np.cos(np.radians(station_latitudes))
+        squared = ((latitudes[None, :] - station_latitudes) ** 2
+                   + ((longitudes[None, :] - stations.longitudes[first:first + chunk, None]) * scale_x) ** 2)
+        closest[first:first + chunk] = squared.argmin(axis=1)
+    offsets = haversine_miles(stations.latitudes, stations.longitudes, latitudes[closest], longitudes[closest])
+    return along[closest] * scale, offsets, float(total_distance)
+
+
+def k_best_plans(
+    route_points: list[tuple[float, float]],
+    total_distance: float,
+    stations: StationSnapshot,
+    max_range_miles: float,
+    k: int,
+    objective: str = 'cost',
+    start_fuel_range: float | None = None,
+) -> list[AlternativePlan]:
+    """
+    The k best plans of the route, ranked by objective: 'cost' (cheapest first, fewer stops on a tie) or
+    'stops' (fewest stops first, then cheapest). Stations ordered along the route make a DAG whose edges
+    join stations within tank range of each other, driving along the route plus the detours to the stations.
+    One pass over the stations in route order keeps the k best partial plans reaching each of them, costs
+    being the ones of StandardFuelCostCalculator: a full tank at every stop.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    start_fuel_range = max_range_miles if start_fuel_range is None else start_fuel_range
+
+    along, offsets, length = stations_along(route_points, total_distance, stations)
+    order = np.argsort(along, kind='stable')
+    along, offsets, prices = along[order], offsets[order], stations.prices[order]
+    count = len(order)
+
+    # Labels of the k best plans reaching every station: objective keys and the label they extend
+    price_sums = np.full((count, k), np.inf)
+    stop_counts = np.full((count, k), np.inf)
+    parents = np.full((count, k), -1, dtype=np.int64)  # station index, -1 for the start
+    parent_ranks = np.zeros((count, k), dtype=np.int64)
+    stop_weight = prices.sum() + 1  # more than any sum of prices, a stop weighs more than any price difference
+
+    def best_labels(candidates: np.ndarray, from_start: bool) -> tuple[np.ndarray, ...]:
+        """The k best labels among the ones of the candidate stations, and the start's when reachable."""
+        # Labels are sorted, only the stations whose best label is among the k best first ones can contribute
+        if len(candidates) > k:
+            first = price_sums[candidates, 0]
+            if objective == 'stops':
+                first = first + stop_counts[candidates, 0] * stop_weight
+            candidates = candidates[first <= np.partition(first, k - 1)[k - 1]]
+        candidate_prices = price_sums[candidates].ravel()
+        candidate_stops = stop_counts[candidates].ravel()
+        candidate_parents = np.repeat(candidates, k)
+        candidate_ranks = np.tile(np.arange(k), len(candidates))
+        if from_start:
+            candidate_prices = np.append(candidate_prices, 0.0)
+            candidate_stops = np.append(candidate_stops, 0.0)
+            candidate_parents = np.append(candidate_parents, -1)
+            candidate_ranks = np.append(candidate_ranks, 0)
+        keys = (candidate_stops, candidate_prices) if objective == 'cost' else (candidate_prices, candidate_stops)
+        best = np.lexsort(keys)[:k]
+        best = best[np.isfinite(candidate_prices[best])]
+        return candidate_prices[best], candidate_stops[best], candidate_parents[best], candidate_ranks[best]
+
+    for station in range(count):
+        # Earlier stations within a full tank, closer ones being the only ones the offsets can rule out
+        reach = max_range_miles - offsets[station]
+        first = np.searchsorted(along, along[station] - reach, side='left')
+        candidates = np.arange(first, station)
+        candidates = candidates[along[station] - along[candidates] + offsets[candidates] <= reach]
+        from_start = along[station] + offsets[station] <= start_fuel_range
+
+        labels, stops, parent, rank = best_labels(candidates, from_start)
+        found = len(labels)
+        price_sums[station, :found] = labels + prices[station]
+        stop_counts[station, :found] = stops + 1
+        parents[station, :found], parent_ranks[station, :found] = parent, rank
+
+    # Plans end at the destination, reached from the last stop or straight from the start
+    last_stops = np.flatnonzero(length - along + offsets <= max_range_miles)
+    labels, _, parent, rank = best_labels(last_stops, total_distance <= start_fuel_range)
+
+    plans = []
+    for price_sum, station, station_rank in zip(labels, parent, rank):
+        path = []
+        while station != -1:
+            path.append(int(order[station]))
+            station, station_rank = parents[station, station_rank], parent_ranks[station, station_rank]
+        plans.append(AlternativePlan(stations=path[::-1], price_sum=float(price_sum)))
+    return plans
@@ -6,12 +6,17 @@ from decimal import Decimal
 class GeocodingService(ABC):
     @abstractmethod
     def get_coordinates(self, location: str) -> tuple[float, float]:
-        """Convert a location string to coordinates."""
+        """Convert a location string to (latitude, longitude) coordinates."""
         pass
 
     @abstractmethod
-    def get_route(self, start_coords: tuple[float, float], end_coords: tuple[float, float]) -> list[dict]:
-        """Get route between two coordinate points."""
+    def get_route(
+        self,
+        start_coords: tuple[float, float],
+        end_coords: tuple[float, float],
+        waypoints: list[tuple[float, float] | str] | None = None,
+    ) -> list[dict]:
+        """Get route between two coordinate points, through the waypoints in order."""
         pass
 
 
@@ -20,9 +25,10 @@ class RoutingService(ABC):
     def get_route(
         self,
         start_coords: tuple[float, float],
-        end_coords: tuple[float, float]
+        end_coords: tuple[float, float],
+        waypoints: list[tuple[float, float] | str] | None = None,
     ) -> list[dict]:
-        """Get route between two coordinate points."""
+        """Get route between two coordinate points, through the waypoints in order."""
         pass
 
 
@@ -47,9 +53,15 @@ class RouteOptimizer(ABC):
     def find_optimal_stops(
         self,
         route_points: list[tuple[float, float]],
-        total_distance: float
+        total_distance: float,
+        start_fuel_range: float | None = None,
+        candidate_station_ids: list[int] | None = None,
+        corridor_stations: list[Any] | None = None,
     ) -> list[dict]:
-        """Find optimal fuel stops along the route."""
+        """
+        Find optimal fuel stops along the route, optionally starting on a partial tank.
+        When given, stops are chosen from corridor_stations (StationRecords) without querying.
+        """
         pass
 
 
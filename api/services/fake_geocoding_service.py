@@ -0,0 +1,103 @@
+import hashlib
+import math
+import time
+from typing import Any, Callable, Dict
+
+from .provider_quota import get_quota_manager
+from .spotter_geocoding_service import GoogleMapsGeocodingService
+
+# Rough bounding box of the continental US, used for unknown locations
+CONUS_LAT_RANGE = (25.0, 49.0)
+CONUS_LON_RANGE = (-124.0, -67.0)
+
+
+class FakeGeocodingService(GoogleMapsGeocodingService):
+    """Local stand-in for a routing provider, answering with Google-shaped responses."""
+
+    def __init__(
+        self,
+        locations: dict[str, tuple[float, float]] | None = None,
+        latency: float | Callable[[], float] = 0.0,
+        error: Exception | None = None,
+        steps: int = 20,
+        detour_factor: float = 1.2,
+    ):
+        # no client: nothing leaves the process
+        self.locations = locations or {}
+        self.latency = latency
+        self.error = error
+        self.steps = steps
+        self.detour_factor = detour_factor
+        self.calls = 0
+
+    def _wait(self, endpoint: str):
+        # Counted and rate limited like a real provider, under the fake.* endpoints
+        get_quota_manager().acquire(f'fake.{endpoint}')
+        self.calls += 1
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        if self.error is not None:
+            raise self.error
+
+    def _resolve(self, location: tuple[float, float] | str) -> tuple[float, float]:
+        if not isinstance(location, str):
+            return location
+        if location in self.locations:
+            return self.locations[location]
+
+        # Deterministic pseudo-location so the same address always maps to the same point
+        digest = hashlib.sha256(location.strip().lower().encode()).digest()
+        lat_fraction = int.from_bytes(digest[:4], 'big') / 2 ** 32
+        lon_fraction = int.from_bytes(digest[4:8], 'big') / 2 ** 32
+        return (
+            CONUS_LAT_RANGE[0] + lat_fraction * (CONUS_LAT_RANGE[1] - CONUS_LAT_RANGE[0]),
+            CONUS_LON_RANGE[0] + lon_fraction * (CONUS_LON_RANGE[1] - CONUS_LON_RANGE[0]),
+        )
+
+    def _haversine_meters(self, point1: tuple[float, float], point2: tuple[float, float]) -> float:
+        lat1, lon1 = map(math.radians, point1)
+        lat2, lon2 = map(math.radians, point2)
+        a = (math.sin((lat2 - lat1) / 2) ** 2
+             + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+        return 6371008.8 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    def get_coordinates(self, location: str) -> tuple[float, float]:
+        self._wait('geocode')
+        return self._resolve(location)
+
+    def get_route(
+        self,
+        start_coords: tuple[float, float] | str,
+        end_coords: tuple[float, float] | str,
+        waypoints: list[tuple[float, float] | str] | None = None,
+    ) -> list[Dict[str, Any]]:
+        self._wait('directions')
+        stops = [self._resolve(location) for location in [start_coords, *(waypoints or []), end_coords]]
+        return [{'legs': [self._leg(start, end) for start, end in zip(stops, stops[1:])]}]
+
+    def _leg(self, start: tuple[float, float], end: tuple[float, float]) -> Dict[str, Any]:
+        # Straight line between both ends, split into evenly sized steps
+        points = [
+            (
+                start[0] + (end[0] - start[0]) * i / self.steps,
+                start[1] + (end[1] - start[1]) * i / self.steps,
+            )
+            for i in range(self.steps + 1)
+        ]
+        steps = [
+            {
+                'start_location': {'lat': a[0], 'lng': a[1]},
+                'end_location': {'lat': b[0], 'lng': b[1]},
+                'distance': {'value': round(self._haversine_meters(a, b) * self.detour_factor)},
+            }
+            for a, b in zip(points, points[1:])
+        ]
+        return {
+            'distance': {'value': sum(step['distance']['value'] for step in steps)},
+            'steps': steps,
+        }
+
+    def get_distance_between_points(self, point_a: tuple[float, float], point_b: tuple[float, float]) -> float:
+        self._wait('distance_matrix')
+        return round(self._haversine_meters(point_a, point_b) * self.detour_factor / 1609.34, 5)
@@ -1,38 +1,38 @@
 import folium
 from django.conf import settings
 from api.services.base_services import MapPlotter
+from api.services.route_geometry import simplify_to
 
 
 class FoliumMapPlotter(MapPlotter):
+    """
+    Plot a route with folium. The default 'lite' mode draws the route as one simplified
+    polyline with markers for the endpoints and fuel stops only, so the page stays small
+    however long the route. The 'markers' mode adds a marker for every route point.
+    """
+
+    def __init__(self, mode: str | None = None, max_points: int | None = None):
+        self.mode = mode or settings.MAP_RENDER_MODE
+        self.max_points = max_points or settings.MAP_MAX_POINTS
+        if self.mode not in ('lite', 'markers'):
+            raise ValueError(f"Unknown map render mode: {self.mode}")
 
     def plot_map(self, data: list[dict]):
         start_point = data[0]
         map_route = folium.Map(
             location=[start_point["latitude"], start_point["longitude"]], zoom_start=6)
 
-        # Add points and draw lines
-        coordinates = []
-        for point in data:
-            lat = point["latitude"]
-            lon = point["longitude"]
-            coordinates.append((lat, lon))
+        coordinates = [(point["latitude"], point["longitude"]) for point in data]
 
-            # Check if the point has address and name
-            if "name" in point and "address" in point:
-                popup_text = f"Fuelstation: {point['name']}<br>"
-                f"Address: {point['address']}<br>"
-                f"City: {point['city']}, State: {point['state']}<br>"
-                f"Price: {point['price']}"
-                marker_color = "red"  # Highlight points with additional details in red
-            else:
-                popup_text = f"Latitude: {lat}, Longitude: {lon}"
-                marker_color = "blue"  # Default color for basic points
+        if self.mode == 'markers':
+            markers = data
+        else:
+            # Only the points worth clicking on: both ends and the fuel stops
+            markers = [data[0]] + [point for point in data[1:-1] if self._is_stop(point)] + [data[-1]]
+            coordinates = simplify_to(coordinates, self.max_points)
 
-            folium.Marker(
-                location=[lat, lon],
-                popup=folium.Popup(popup_text, max_width=300),
-                icon=folium.Icon(color=marker_color)
-            ).add_to(map_route)
+        for point in markers:
+            self._marker(point).add_to(map_route)
 
         # Draw the route
         folium.PolyLine(coordinates, color="blue", weight=2.5,
@@ -40,3 +40,29 @@ class FoliumMapPlotter(MapPlotter):
 
         # Save the map to an HTML file
         map_route.save(settings.MAP_PLOT_FILE)
+
+    def _is_stop(self, point: dict) -> bool:
+        return "name" in point and "address" in point
+
+    def _marker(self, point: dict) -> folium.Marker:
+        lat = point["latitude"]
+        lon = point["longitude"]
+
+        # Check if the point has address and name
+        if self._is_stop(point):
+            popup_text = (
+                f"Fuelstation: {point['name']}<br>"
+                f"Address: {point['address']}<br>"
+                f"City: {point['city']}, State: {point['state']}<br>"
+                f"Price: {point['price']}"
+            )
+            marker_color = "red"  # Highlight points with additional details in red
+        else:
+            popup_text = f"Latitude: {lat}, Longitude: {lon}"
+            marker_color = "blue"  # Default color for basic points
+
+        return folium.Marker(
+            location=[lat, lon],
+            popup=folium.Popup(popup_text, max_width=300),
+            icon=folium.Icon(color=marker_color)
+        )
@@ -0,0 +1,22 @@
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Driving distance is approximated as the great circle distance times this factor
+ROAD_DETOUR_FACTOR = 1.2
+
+
+def haversine_miles(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine distance in miles, arguments broadcast like numpy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return EARTH_RADIUS_MILES * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bearing_radians(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Initial bearing from the first to the second points, in [0, 2pi)."""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    y = np.sin(lon2 - lon1) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.mod(np.arctan2(y, x), 2 * np.pi)
@@ -0,0 +1,122 @@
+import logging
+
+import numpy as np
+from django.conf import settings
+
+from .base_services import RouteOptimizer
+from .geo_arrays import haversine_miles
+from .spotter_fuel_station_repository import SpotterFuelStationRepository
+from .station_graph import StationGraph, get_station_graph
+from .station_records import StationRecord, records_by_id
+from .station_snapshot import StationSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class GraphRouteOptimizer(RouteOptimizer):
+    """Plan fuel stops with a search along the route over the corridor stations of the precomputed station graph."""
+
+    def __init__(
+        self,
+        max_range_miles=500,
+        mpg=10,
+        graph: StationGraph | None = None,
+        station_snapshot: StationSnapshot | None = None,
+        corridor_miles: float | None = None,
+    ):
+        self.max_range_miles = max_range_miles  # Maximum range in miles
+        self.mpg = mpg  # Miles per gallon
+        self.graph = graph
+        # Stops are searched among the stations within corridor_miles of the route
+        self.corridor_miles = settings.ROUTE_CORRIDOR_MILES if corridor_miles is None else corridor_miles
+        # When given, stop details come from the snapshot instead of the database
+        self.station_snapshot = station_snapshot
+
+    def find_optimal_stops(
+        self,
+        route_points: list[tuple[float, float]],
+        total_distance: float,
+        start_fuel_range: float | None = None,
+        candidate_station_ids: list[int] | None = None,
+        corridor_stations: list[StationRecord] | None = None,
+    ) -> dict:
+        start_fuel_range = self.max_range_miles if start_fuel_range is None else start_fuel_range
+        if total_distance <= start_fuel_range:
+            logger.info(
+                "Total distance is less than or equal to the max range. No stops needed.")
+            return {
+                'route': route_points,
+                'stops': [],
+                'total_cost': 0.0
+            }
+
+        graph = self.graph or get_station_graph()
+        if graph is None:
+            raise Exception("The station graph hasn't been built yet, run build_station_graph.")
+
+        if candidate_station_ids is not None:
+            station_ids = candidate_station_ids
+        elif corridor_stations is not None:
+            station_ids = [station.id for station in corridor_stations]
+        else:
+            # One query for the corridor, the route shape and its waypoints decide which stations are on the way
+            station_ids = SpotterFuelStationRepository(None).get_station_ids_along_route(
+                route_points, self.corridor_miles)
+
+        cheapest = graph.cheapest_path(
+            route_points,
+            total_distance,
+            self.max_range_miles,
+            self.mpg,
+            start_range_miles=start_fuel_range,
+            station_ids=station_ids,
+        )
+        if cheapest is None:
+            logger.error("No stations can be reached to refuel. Stuck without fuel.")
+            raise Exception("No stations can be reached to refuel. Stuck without fuel.")
+        path, total_cost = cheapest
+
+        station_ids = [int(graph.station_ids[node]) for node in path]
+        if self.station_snapshot is not None:
+            stops = [self.station_snapshot.record(station_id) for station_id in station_ids]
+        else:
+            # Stops along the corridor are already known, only the others are read
+            stations = {station.id: station for station in corridor_stations or []}
+            missing = [station_id for station_id in station_ids if station_id not in stations]
+            if missing:
+                stations.update(records_by_id(missing))
+            stops = [stations[station_id] for station_id in station_ids]
+
+        return {
+            'route': self._route_with_stops(route_points, stops),
+            'stops': stops,
+            'total_cost': total_cost,
+        }
+
+    def _route_with_stops(
+        self,
+        route_points: list[tuple[float, float]],
+        stops: list[StationRecord]
+    ) -> list[dict]:
+        """Route points with each stop inserted after the route point closest to it."""
+        latitudes = np.array([point[0] for point in route_points])
+        longitudes = np.array([point[1] for point in route_points])
+        stops_after = {}
+        for stop in stops:
+            closest = int(np.argmin(haversine_miles(stop.latitude, stop.longitude, latitudes, longitudes)))
+            stops_after.setdefault(closest, []).append(stop)
+
+        route = []
+        for i, (lat, lon) in enumerate(route_points):
+            route.append({'latitude': lat, 'longitude': lon})
+            for stop in stops_after.get(i, []):
+                route.append({
+                    'latitude': stop.latitude,
+                    'longitude': stop.longitude,
+                    'name': stop.name,
+                    'address': stop.address,
+                    'city': stop.city,
+                    'state': stop.state,
+                    'price': stop.retail_price
+                })
+        return route
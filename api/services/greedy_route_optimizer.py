@@ -4,6 +4,9 @@ from django.contrib.gis.db.models.functions import Distance
 
 from api.models import FuelStation
 from .base_services import RouteOptimizer
+from .station_records import StationRecord, station_record_rows
+from .station_snapshot import StationSnapshot
+from .station_tiles import tiles_near
 import math
 import logging
 
@@ -12,10 +15,12 @@ logger = logging.getLogger(__name__)
 
 class GreedyRouteOptimizer(RouteOptimizer):
 
-    def __init__(self, max_range_miles=500, mpg=10):
+    def __init__(self, max_range_miles=500, mpg=10, station_snapshot: StationSnapshot | None = None):
         self.max_range_miles = max_range_miles  # Maximum range in miles
         self.mpg = mpg  # Miles per gallon
         self.max_tank_gallons = max_range_miles / mpg  # Full tank capacity in gallons
+        # When given, stations are looked up in memory instead of with spatial queries
+        self.station_snapshot = station_snapshot
 
     def calculate_distance(self, point1: tuple[float, float], point2: tuple[float, float]) -> float:
         """Calculate haversine distance between two latitude/longitude points."""
@@ -31,16 +36,29 @@ class GreedyRouteOptimizer(RouteOptimizer):
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         return R * c
 
-    def find_optimal_stops(self, route_points: list[tuple[float, float]], total_distance: float) -> dict:
-        current_fuel_range = self.max_range_miles
+    def find_optimal_stops(
+        self,
+        route_points: list[tuple[float, float]],
+        total_distance: float,
+        start_fuel_range: float | None = None,
+        candidate_station_ids: list[int] | None = None,
+        corridor_stations: list[StationRecord] | None = None,
+    ) -> dict:
+        # Stations along the route fetched up front are searched in memory, no query per stop
+        station_snapshot = (
+            StationSnapshot.from_records(corridor_stations) if corridor_stations is not None else self.station_snapshot
+        )
+        # Start on a full tank unless told otherwise, e.g. when re-planning mid route
+        current_fuel_range = self.max_range_miles if start_fuel_range is None else start_fuel_range
         total_cost = 0.0
         stops = []
         current_lat, current_lon = route_points[0]
         distance_remaining = total_distance
         i = 0
+        refuel_attempts = 0
         new_route_points = []
 
-        if total_distance <= self.max_range_miles:
+        if total_distance <= current_fuel_range:
             logger.info(
                 "Total distance is less than or equal to the max range. No stops needed.")
             new_route_points = route_points
@@ -82,10 +100,11 @@ class GreedyRouteOptimizer(RouteOptimizer):
 
                 current_point = Point(current_lon, current_lat, srid=4326)
                 max_reachable_range = current_fuel_range
-                chosen_station = self._find_next_station(current_point, max_reachable_range)
+                chosen_station = self.find_next_station(
+                    current_point, max_reachable_range, candidate_station_ids, station_snapshot)
 
-                station_lat = chosen_station.location.y
-                station_lon = chosen_station.location.x
+                station_lat = chosen_station.latitude
+                station_lon = chosen_station.longitude
                 station_distance = self.calculate_distance(
                     (current_lat, current_lon), (station_lat, station_lon))
 
@@ -135,16 +154,33 @@ class GreedyRouteOptimizer(RouteOptimizer):
             'total_cost': total_cost
         }
 
-    def _find_next_station(self, current_point: Point, max_reachable_range: float) -> FuelStation:
-        nearby_stations = (FuelStation.objects
-                           .annotate(distance=Distance('location', current_point))
-                           .filter(distance__lte=D(mi=max_reachable_range))
-                           .order_by('retail_price', 'distance'))
-
-        if not nearby_stations.exists():
+    def find_next_station(
+        self,
+        current_point: Point,
+        max_reachable_range: float,
+        candidate_station_ids: list[int] | None = None,
+        station_snapshot: StationSnapshot | None = None,
+    ) -> StationRecord:
+        if station_snapshot is None:
+            station_snapshot = self.station_snapshot
+        if station_snapshot is not None:
+            station = station_snapshot.find_next_station(
+                current_point.y, current_point.x, max_reachable_range, candidate_station_ids)
+        else:
+            nearby_stations = (FuelStation.objects
+                               .filter(tile__in=tiles_near([(current_point.y, current_point.x)], max_reachable_range))
+                               .annotate(distance=Distance('location', current_point))
+                               .filter(distance__lte=D(mi=max_reachable_range))
+                               .order_by('retail_price', 'distance'))
+            if candidate_station_ids is not None:
+                nearby_stations = nearby_stations.filter(id__in=candidate_station_ids)
+            # One query for a plain row, no model instance or GEOS Point
+            row = station_record_rows(nearby_stations).first()
+            station = StationRecord(*row) if row is not None else None
+
+        if station is None:
             logger.error(
                 "No nearby stations found on the route. Please try again with a different starting point.")
             raise Exception(
                 "No nearby stations found on the route. Please try again with a different starting point.")
-
-        return nearby_stations.first()
+        return station
@@ -0,0 +1,307 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+
+from .base_services import GeocodingService
+from .registry import get_routing_provider_class
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingProviderUnavailable(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ProviderRoute:
+    """A raw route payload tagged with the provider that produced it."""
+    provider: str
+    payload: Any
+
+
+class ProviderStats:
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)  # seconds, successful calls only
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+
+    def record(self, latency: float, success: bool):
+        with self._lock:
+            self.calls += 1
+            if success:
+                self._latencies.append(latency)
+            else:
+                self.errors += 1
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def percentile(self, percentile: float) -> float | None:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.calls, 4) if self.calls else 0.0,
+            'wins': self.wins,
+            'hedges': self.hedges,
+            'latency_p50_ms': self._ms(self.percentile(50)),
+            'latency_p95_ms': self._ms(self.percentile(95)),
+            'latency_p99_ms': self._ms(self.percentile(99)),
+        }
+
+    @staticmethod
+    def _ms(seconds: float | None) -> float | None:
+        return None if seconds is None else round(seconds * 1000, 1)
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                # Let a single trial request through
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit opened after %s consecutive failures.", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+
+class HedgedRoutingService(GeocodingService):
+    """
+    Route through an ordered list of providers. The first available provider is asked first,
+    the next one is hedged in when the first hasn't answered within its latency percentile.
+    """
+
+    def __init__(
+        self,
+        providers: list[tuple[str, GeocodingService]],
+        hedge_percentile: float = 95,
+        default_hedge_delay: float = 1.0,
+        min_hedge_delay: float = 0.05,
+        min_samples: int = 20,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_workers: int | None = None,
+    ):
+        if not providers:
+            raise ValueError("At least one routing provider is required.")
+
+        self.providers = dict(providers)
+        self.provider_order = [name for name, _ in providers]
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.breakers = {
+            name: CircuitBreaker(failure_threshold, reset_timeout) for name in self.provider_order
+        }
+        self.provider_stats = {name: ProviderStats() for name in self.provider_order}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or 4 * len(providers), thread_name_prefix='routing')
+
+    @property
+    def primary(self) -> GeocodingService:
+        return self.providers[self.provider_order[0]]
+
+    def hedge_delay(self, name: str) -> float:
+        stats = self.provider_stats[name]
+        if stats.samples < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, stats.percentile(self.hedge_percentile))
+
+    def _call(self, name: str, start_coords, end_coords, waypoints=None):
+        started = time.monotonic()
+        try:
+            if waypoints:
+                route = self.providers[name].get_route(start_coords, end_coords, waypoints=waypoints)
+            else:
+                route = self.providers[name].get_route(start_coords, end_coords)
+        except Exception:
+            self.provider_stats[name].record(time.monotonic() - started, success=False)
+            self.breakers[name].record_failure()
+            raise
+        self.provider_stats[name].record(time.monotonic() - started, success=True)
+        self.breakers[name].record_success()
+        return route
+
+    def get_route(
+        self,
+        start_coords: tuple[float, float] | str,
+        end_coords: tuple[float, float] | str,
+        waypoints: list[tuple[float, float] | str] | None = None,
+    ) -> ProviderRoute:
+        # Breakers are only asked right before a launch, asking a half-open breaker uses up its trial
+        remaining = list(self.provider_order)
+        pending = {}
+        started = {}  # provider name -> when a worker picked its call up
+        errors = []
+
+        def run(name: str):
+            started[name] = time.monotonic()
+            return self._call(name, start_coords, end_coords, waypoints)
+
+        def launch() -> str | None:
+            while remaining:
+                name = remaining.pop(0)
+                if self.breakers[name].allow_request():
+                    # Run in the caller's context, so the provider call keeps its quota priority
+                    pending[self._executor.submit(contextvars.copy_context().run, run, name)] = name
+                    return name
+            return None
+
+        def hedge_in(name: str) -> float:
+            """Seconds before hedging name. Calls still queued for a worker are not timed yet."""
+            if name not in started:
+                return self.min_hedge_delay
+            return started[name] + self.hedge_delay(name) - time.monotonic()
+
+        if launch() is None:
+            raise RoutingProviderUnavailable("All routing providers are unavailable.")
+
+        try:
+            while pending:
+                # Only wait for the hedge deadline if there is still someone to hedge to
+                oldest = next(iter(pending.values()))
+                timeout = max(0.0, hedge_in(oldest)) if remaining else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    # A call waiting for a worker isn't slow, hedging it would queue one more call behind it
+                    if oldest in started and hedge_in(oldest) <= 0:
+                        name = launch()
+                        if name is not None:
+                            logger.info("Hedging route request to %s.", name)
+                            self.provider_stats[name].record_hedge()
+                    continue
+
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        payload = future.result()
+                    except Exception as e:
+                        logger.warning("Routing provider %s failed: %s", name, e)
+                        errors.append(f"{name}: {e}")
+                        if not pending:
+                            launch()
+                        continue
+                    self.provider_stats[name].record_win()
+                    return ProviderRoute(name, payload)
+        finally:
+            # Losers that haven't started yet give their worker back
+            for future in pending:
+                future.cancel()
+
+        raise RoutingProviderUnavailable(
+            "All routing providers failed: " + "; ".join(errors))
+
+    def get_coordinates(self, location: str) -> tuple[float, float]:
+        # Geocoding never fails over, it isn't on the path of a route request
+        return self.primary.get_coordinates(location)
+
+    def get_route_coordinates(self, route: ProviderRoute) -> list[tuple[float, float]]:
+        return self.providers[route.provider].get_route_coordinates(route.payload)
+
+    def get_route_distance(self, route: ProviderRoute) -> float:
+        return self.providers[route.provider].get_route_distance(route.payload)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            name: {
+                **self.provider_stats[name].snapshot(),
+                'circuit': self.breakers[name].state,
+                'hedge_delay_ms': round(self.hedge_delay(name) * 1000, 1),
+            }
+            for name in self.provider_order
+        }
+
+
+_routing_service = None
+_routing_service_lock = threading.Lock()
+
+
+def build_routing_service() -> HedgedRoutingService:
+    providers = []
+    for name in settings.ROUTING_PROVIDERS:
+        try:
+            providers.append((name, get_routing_provider_class(name)()))
+        except Exception as e:
+            # e.g. a missing API key for a secondary provider
+            logger.warning("Routing provider %s is not available: %s", name, e)
+
+    return HedgedRoutingService(
+        providers,
+        hedge_percentile=settings.ROUTING_HEDGE_PERCENTILE,
+        default_hedge_delay=settings.ROUTING_HEDGE_DEFAULT_DELAY,
+        min_hedge_delay=settings.ROUTING_HEDGE_MIN_DELAY,
+        failure_threshold=settings.ROUTING_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=settings.ROUTING_CIRCUIT_RESET_TIMEOUT,
+        max_workers=settings.ROUTING_HEDGE_WORKERS,
+    )
+
+
+def get_routing_service() -> HedgedRoutingService:
+    """Process-wide routing service, so latency stats and circuit state outlive a request."""
+    global _routing_service
+    if _routing_service is None:
+        with _routing_service_lock:
+            if _routing_service is None:
+                _routing_service = build_routing_service()
+    return _routing_service
@@ -0,0 +1,169 @@
+import json
+import multiprocessing
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from django.db import connections
+
+from ..db_routers import pinned_replica
+from .hedged_routing_service import build_routing_service
+from .provider_quota import bulk_priority
+from .registry import get_route_optimizer_class
+from .route_geometry import dedupe_consecutive, encode_polyline
+from .route_planner import RoutePlanner
+from .standard_fuel_calculator import StandardFuelCostCalculator
+from .station_snapshot import StationSnapshot
+
+# Set in the parent before the pool forks, so every worker reads the same pages copy-on-write
+_station_snapshot: StationSnapshot | None = None
+_route_planner: RoutePlanner | None = None
+
+
+def _init_worker(optimizer: str, max_range_miles: float, mpg: float):
+    global _route_planner
+    # A fresh routing service per process, a forked thread pool has no threads left
+    _route_planner = RoutePlanner(
+        build_routing_service(),
+        get_route_optimizer_class(optimizer)(
+            max_range_miles=max_range_miles, mpg=mpg, station_snapshot=_station_snapshot),
+        StandardFuelCostCalculator(mpg=mpg, max_range_miles=max_range_miles),
+    )
+
+
+def plan_lane(lane: dict[str, Any]) -> dict[str, Any]:
+    """Plan one lane in a worker. Failures are returned in the row, one bad lane doesn't stop the run."""
+    started = time.perf_counter()
+    row = {
+        'id': str(lane['id']),
+        'start_location': lane['start_location'],
+        'end_location': lane['end_location'],
+    }
+    try:
+        with bulk_priority(), pinned_replica():
+            plan = _route_planner.plan(lane['start_location'], lane['end_location'])
+    except Exception as e:
+        return {**row, 'error': str(e) or type(e).__name__, 'seconds': time.perf_counter() - started}
+
+    route = [
+        point if isinstance(point, tuple) else (point['latitude'], point['longitude'])
+        for point in plan['route']
+    ]
+    return {
+        **row,
+        'total_distance': float(plan['total_distance']),
+        'total_fuel_cost': float(plan['total_fuel_cost']),
+        'stops': [
+            {
+                'id': stop.id,
+                'name': stop.name,
+                'address': stop.address,
+                'city': stop.city,
+                'state': stop.state,
+                'latitude': stop.latitude,
+                'longitude': stop.longitude,
+                'price': float(stop.retail_price),
+            }
+            for stop in plan['stops']
+        ],
+        'route': encode_polyline(dedupe_consecutive(route)),
+        'error': None,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def plan_lanes(
+    lanes: Iterable[dict[str, Any]],
+    snapshot: StationSnapshot,
+    processes: int,
+    optimizer: str = 'greedy',
+    max_range_miles: float = 500,
+    mpg: float = 10,
+    chunksize: int = 4,
+) -> Iterator[dict[str, Any]]:
+    """Plan lanes across a pool of forked workers, yielding result rows as they complete, in any order."""
+    global _station_snapshot
+    _station_snapshot = snapshot
+    initargs = (optimizer, max_range_miles, mpg)
+
+    if processes <= 1:
+        _init_worker(*initargs)
+        yield from map(plan_lane, lanes)
+        return
+
+    # Children must not inherit the parent's database sockets, they don't need the database at all
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        yield from pool.imap_unordered(plan_lane, lanes, chunksize)
+
+
+class JsonLinesLaneWriter:
+    """One JSON object per planned lane, flushed as it comes."""
+
+    def __init__(self, path: Path | str):
+        self.file = open(path, 'w')
+
+    def write(self, row: dict[str, Any]):
+        self.file.write(json.dumps(row) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetLaneWriter:
+    """Planned lanes written as Parquet row groups of batch_size rows, needs pyarrow."""
+
+    def __init__(self, path: Path | str, batch_size: int = 1000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing Parquet needs pyarrow, install it with `pip install pyarrow`.")
+
+        stop = pa.struct([
+            ('id', pa.int64()),
+            ('name', pa.string()),
+            ('address', pa.string()),
+            ('city', pa.string()),
+            ('state', pa.string()),
+            ('latitude', pa.float64()),
+            ('longitude', pa.float64()),
+            ('price', pa.float64()),
+        ])
+        self.schema = pa.schema([
+            ('id', pa.string()),
+            ('start_location', pa.string()),
+            ('end_location', pa.string()),
+            ('total_distance', pa.float64()),
+            ('total_fuel_cost', pa.float64()),
+            ('stops', pa.list_(stop)),
+            ('route', pa.string()),
+            ('error', pa.string()),
+            ('seconds', pa.float64()),
+        ])
+        self.table = pa.Table
+        self.writer = pq.ParquetWriter(str(path), self.schema)
+        self.batch_size = batch_size
+        self.batch = []
+
+    def write(self, row: dict[str, Any]):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self.writer.write_table(self.table.from_pylist(self.batch, schema=self.schema))
+            self.batch = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def open_lane_writer(path: Path | str) -> JsonLinesLaneWriter | ParquetLaneWriter:
+    if Path(path).suffix == '.parquet':
+        return ParquetLaneWriter(path)
+    return JsonLinesLaneWriter(path)
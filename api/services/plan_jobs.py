@@ -0,0 +1,164 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Sequence
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..db_routers import check_connections, pinned_replica
+from ..models import PlanJob
+from ..serializers import route_response_data
+from .hedged_routing_service import build_routing_service
+from .provider_quota import bulk_priority
+from .registry import get_route_optimizer_class
+from .route_plan_store import RoutePlanStore
+from .route_planner import RoutePlanner
+from .route_reuse import build_route_reuse
+from .spotter_fuel_station_repository import SpotterFuelStationRepository
+from .standard_fuel_calculator import StandardFuelCostCalculator
+
+logger = logging.getLogger(__name__)
+
+
+class PlanJobQueue:
+    """
+    Work queue of plan jobs in a Postgres table. Workers claim the oldest queued job with
+    SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never claim the same one.
+    Running jobs not finished after stale_after seconds belong to a dead worker and are
+    claimed again, until they have been tried max_attempts times.
+    """
+
+    def __init__(self, stale_after: float = 600, max_attempts: int = 3):
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+
+    def submit(
+        self,
+        start_location: str,
+        end_location: str,
+        optimizer: str,
+        max_range_miles: float,
+        mpg: float,
+        waypoints: Sequence[str] = (),
+    ):
+        return PlanJob.objects.create(
+            start_location=start_location[:255],
+            end_location=end_location[:255],
+            waypoints=list(waypoints),
+            optimizer=optimizer,
+            max_range_miles=max_range_miles,
+            mpg=mpg,
+        )
+
+    def claim(self, worker: str) -> PlanJob | None:
+        now = timezone.now()
+        abandoned = Q(
+            status=PlanJob.RUNNING,
+            started_at__lt=now - timedelta(seconds=self.stale_after),
+            attempts__lt=self.max_attempts,
+        )
+        with transaction.atomic():
+            job = (PlanJob.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(Q(status=PlanJob.QUEUED) | abandoned)
+                   .order_by('created_at')
+                   .first())
+            if job is None:
+                return None
+            job.status = PlanJob.RUNNING
+            job.worker = worker
+            job.started_at = now
+            job.attempts += 1
+            job.save(update_fields=['status', 'worker', 'started_at', 'attempts'])
+        return job
+
+    def complete(self, job: PlanJob, result: dict[str, Any]):
+        self._finish(job, PlanJob.SUCCEEDED, result=result)
+
+    def fail(self, job: PlanJob, error: str):
+        self._finish(job, PlanJob.FAILED, error=error)
+
+    def _finish(self, job: PlanJob, status: str, result: dict[str, Any] | None = None, error: str = ''):
+        # Only the current claim may finish the job, a reclaimed one belongs to another worker now
+        updated = PlanJob.objects.filter(pk=job.pk, worker=job.worker, attempts=job.attempts).update(
+            status=status, result=result, error=error, finished_at=timezone.now())
+        if not updated:
+            logger.warning("Plan job %s was reclaimed by another worker, dropping this result.", job.pk)
+
+    def fail_abandoned(self) -> int:
+        """Fail running jobs whose workers died on every attempt."""
+        return PlanJob.objects.filter(
+            status=PlanJob.RUNNING,
+            started_at__lt=timezone.now() - timedelta(seconds=self.stale_after),
+            attempts__gte=self.max_attempts,
+        ).update(status=PlanJob.FAILED, error="The worker stopped responding.", finished_at=timezone.now())
+
+
+def get_plan_job_queue() -> PlanJobQueue:
+    return PlanJobQueue(settings.PLAN_JOB_STALE_AFTER, settings.PLAN_JOB_MAX_ATTEMPTS)
+
+
+class PlanJobWorker:
+    """Claims and runs plan jobs until stopped, sleeping poll_interval seconds while the queue is empty."""
+
+    def __init__(self, queue: PlanJobQueue, name: str | None = None, poll_interval: float = 1.0):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.routing_service = None
+        self._planners = {}  # by (optimizer, max_range_miles, mpg)
+
+    def planner(self, job: PlanJob) -> RoutePlanner:
+        key = (job.optimizer, job.max_range_miles, job.mpg)
+        if key not in self._planners:
+            if self.routing_service is None:
+                # Built in the worker process, a forked thread pool has no threads left
+                self.routing_service = build_routing_service()
+            station_repository = SpotterFuelStationRepository(None)
+            self._planners[key] = RoutePlanner(
+                self.routing_service,
+                get_route_optimizer_class(job.optimizer)(max_range_miles=job.max_range_miles, mpg=job.mpg),
+                StandardFuelCostCalculator(mpg=job.mpg, max_range_miles=job.max_range_miles),
+                plan_store=(
+                    RoutePlanStore(station_repository, settings.ROUTE_CORRIDOR_MILES)
+                    if settings.ROUTE_PLAN_PERSIST else None
+                ),
+                station_repository=station_repository,
+                corridor_miles=settings.ROUTE_CORRIDOR_MILES,
+                route_reuse=build_route_reuse(self.routing_service),
+            )
+        return self._planners[key]
+
+    def run_once(self) -> bool:
+        """Run one job, returns False when there was none."""
+        close_old_connections()
+        check_connections()
+        job = self.queue.claim(self.name)
+        if job is None:
+            return False
+
+        started = time.perf_counter()
+        try:
+            # Jobs aren't waited on by an open request, interactive route requests go first
+            with bulk_priority(), pinned_replica():
+                plan = self.planner(job).plan(job.start_location, job.end_location, waypoints=job.waypoints)
+            self.queue.complete(job, route_response_data(plan))
+            logger.info("Plan job %s succeeded in %.1fs.", job.pk, time.perf_counter() - started)
+        except Exception as e:
+            logger.exception("Plan job %s failed.", job.pk)
+            self.queue.fail(job, str(e) or type(e).__name__)
+        return True
+
+    def run(self, stop: threading.Event):
+        logger.info("Plan worker %s started.", self.name)
+        while not stop.is_set():
+            if not self.run_once():
+                self.queue.fail_abandoned()
+                stop.wait(self.poll_interval)
+        connections.close_all()
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import select
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects notification payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+
+@dataclass(frozen=True)
+class PriceChange:
+    """A price load: the new price snapshot version and the stations whose prices changed, None for every station."""
+    version: int | None
+    station_ids: frozenset[int] | None = None
+
+    def affects(self, station_id: int) -> bool:
+        return self.station_ids is None or station_id in self.station_ids
+
+    def payload(self) -> str:
+        """JSON payload of the notification. Too many stations to fit are sent as a change of every station."""
+        stations = sorted(self.station_ids) if self.station_ids is not None else None
+        payload = json.dumps({'version': self.version, 'stations': stations}, separators=(',', ':'))
+        if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({'version': self.version, 'stations': None}, separators=(',', ':'))
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "PriceChange":
+        data = json.loads(payload)
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object, got {payload!r}")
+        stations = data.get('stations')
+        return cls(data.get('version'), frozenset(stations) if stations is not None else None)
+
+
+_subscribers: list[Callable[[PriceChange], None]] = []
+_subscribers_lock = threading.Lock()
+
+
+def subscribe(callback: Callable[[PriceChange], None]) -> Callable[[PriceChange], None]:
+    """Call callback(change) on every price change heard by this process. Usable as a decorator."""
+    with _subscribers_lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback: Callable[[PriceChange], None]):
+    with _subscribers_lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def dispatch(change: PriceChange):
+    with _subscribers_lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(change)
+        except Exception:
+            logger.exception("Price change subscriber %s failed.", getattr(callback, '__qualname__', callback))
+
+
+def notify_price_change(version: int, station_ids: Iterable[int] | None = None) -> PriceChange:
+    """
+    Publish a price change on the PRICE_CHANGES_CHANNEL, delivered to the listeners of every process
+    when the current transaction commits. Subscribers of this process are called right away.
+    """
+    change = PriceChange(version, frozenset(station_ids) if station_ids is not None else None)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [settings.PRICE_CHANGES_CHANNEL, change.payload()])
+    dispatch(change)
+    return change
+
+
+class PriceChangeListener:
+    """
+    LISTENs on the price channel in a daemon thread, on a connection of its own, and dispatches
+    every notification to the subscribers. Notifications sent while it was disconnected are lost,
+    so after reconnecting the subscribers get a change of every station.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        alias: str = 'default',
+        poll_timeout: float = 1.0,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+    ):
+        self.channel = channel
+        self.alias = alias
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.listening = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='price-listener', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def connect(self):
+        wrapper = connections[self.alias]
+        raw_connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        raw_connection.autocommit = True
+        with raw_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {wrapper.ops.quote_name(self.channel)}")
+        return raw_connection
+
+    def run(self):
+        delay = self.reconnect_delay
+        reconnecting = False
+        while not self._stop.is_set():
+            raw_connection = None
+            try:
+                raw_connection = self.connect()
+                self.listening.set()
+                logger.info("Listening for price changes on %s.", self.channel)
+                if reconnecting:
+                    dispatch(PriceChange(version=None))
+                reconnecting, delay = True, self.reconnect_delay
+                self.listen(raw_connection)
+            except Exception as e:
+                logger.warning("Price change listener failed: %s, reconnecting in %.0fs.", e, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            finally:
+                self.listening.clear()
+                if raw_connection is not None:
+                    raw_connection.close()
+        # Connections the subscribers opened in this thread
+        connections.close_all()
+
+    def listen(self, raw_connection):
+        while not self._stop.is_set():
+            # Wake up every poll_timeout to notice stop()
+            if select.select([raw_connection], [], [], self.poll_timeout) == ([], [], []):
+                continue
+            raw_connection.poll()
+            while raw_connection.notifies:
+                notification = raw_connection.notifies.pop(0)
+                try:
+                    change = PriceChange.from_payload(notification.payload)
+                except ValueError:
+                    logger.warning("Ignoring malformed price change %r.", notification.payload)
+                    continue
+                dispatch(change)
+            close_old_connections()
+
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def get_price_listener() -> PriceChangeListener:
+    """Listener of this process. Forked workers get their own, threads don't survive a fork."""
+    global _listener, _listener_pid
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            _listener, _listener_pid = PriceChangeListener(settings.PRICE_CHANGES_CHANNEL), os.getpid()
+        return _listener
+
+
+def start_price_listener() -> PriceChangeListener:
+    listener = get_price_listener()
+    listener.start()
+    return listener
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Iterable
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router
+
+from ..db_routers import use_primary
+from ..models import FuelStation, PriceSnapshot
+from .price_events import PriceChange, notify_price_change, subscribe
+
+_lock = threading.Lock()
+_cached_versions: dict[str, tuple[int, float]] = {}  # database alias -> (version, when it was read)
+
+
+def get_price_version() -> int:
+    """
+    Id of the latest price snapshot, 0 before the first load, as seen by the database station reads go to: a
+    replica lagging behind has the prices of its own version. Read at most every PRICE_VERSION_CACHE_SECONDS.
+    """
+    alias = router.db_for_read(PriceSnapshot)
+    now = time.monotonic()
+    with _lock:
+        cached = _cached_versions.get(alias)
+        if cached is not None and now - cached[1] < settings.PRICE_VERSION_CACHE_SECONDS:
+            return cached[0]
+
+    version = PriceSnapshot.objects.using(alias).order_by('-id').values_list('id', flat=True).first() or 0
+    with _lock:
+        _cached_versions[alias] = (version, now)
+    return version
+
+
+def invalidate_price_version():
+    """Forget the cached versions, the next get_price_version() reads them again."""
+    with _lock:
+        _cached_versions.clear()
+
+
+@subscribe
+def _price_changed(change: PriceChange):
+    """Take the new version of the primary from the notification, no need to wait for the cache to expire."""
+    if change.version is None:
+        invalidate_price_version()
+        return
+    with _lock:
+        # Replicas may not have replayed the load yet, they are read again
+        for alias in [alias for alias in _cached_versions if alias != DEFAULT_DB_ALIAS]:
+            del _cached_versions[alias]
+        cached = _cached_versions.get(DEFAULT_DB_ALIAS)
+        if cached is None or change.version > cached[0]:
+            _cached_versions[DEFAULT_DB_ALIAS] = (change.version, time.monotonic())
+
+
+def publish_price_snapshot(station_ids: Iterable[int] | None = None) -> PriceSnapshot:
+    """
+    Record that station prices changed, so route ETags computed from now on change as well, and notify
+    every process of the new version and the stations whose prices changed (None for all of them).
+    """
+    with use_primary():  # replicas may not have the load yet
+        stations = FuelStation.objects.filter(retail_price__isnull=False).count()
+    snapshot = PriceSnapshot.objects.create(stations=stations)
+    # Plans of other corridors keep their price version, their ETags survive the load
+    from .route_plan_store import mark_stale_plans
+    mark_stale_plans(station_ids)
+    notify_price_change(snapshot.id, station_ids)
+    return snapshot
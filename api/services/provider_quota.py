@@ -0,0 +1,285 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any
+
+from django.conf import settings
+from django.db import connection
+
+from ..db_routers import check_connection
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+_priority = contextvars.ContextVar('provider_quota_priority', default=INTERACTIVE)
+_call_listeners = contextvars.ContextVar('provider_call_listeners', default=())
+
+# Tokens in a ProviderQuota row after refilling it for the time since its last update
+REFILLED_TOKENS = "LEAST(%(capacity)s, tokens + %(rate)s * EXTRACT(EPOCH FROM (clock_timestamp() - updated_at)))"
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+@contextmanager
+def bulk_priority():
+    """Provider calls made inside yield to interactive ones and leave them a reserve of every bucket."""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def provider_call_listener(listener):
+    """Call listener(endpoint, priority) for every provider call let through inside, in any thread it's copied to."""
+    token = _call_listeners.set(_call_listeners.get() + (listener,))
+    try:
+        yield
+    finally:
+        _call_listeners.reset(token)
+
+
+class TokenBucket:
+    """In-process token bucket, refilled continuously at rate tokens per second up to capacity."""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated_at = clock()
+
+    def take(self, tokens: float = 1, reserve: float = 0) -> float:
+        """
+        Take tokens if at least reserve tokens would be left. Returns 0 when they were taken,
+        otherwise the seconds until enough tokens will have been refilled.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens - tokens >= reserve - 1e-9:  # refills are floats, don't wait for rounding errors
+                self._tokens = max(self._tokens - tokens, 0.0)
+                return 0.0
+            return (tokens + reserve - self._tokens) / self.rate
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return min(self.capacity, self._tokens + (self.clock() - self._updated_at) * self.rate)
+
+
+class PostgresTokenBucket:
+    """
+    Token bucket kept in a ProviderQuota row, shared by every process using the database.
+    Refill and take happen in one conditional UPDATE, so concurrent callers can't overdraw it.
+    """
+
+    def __init__(self, endpoint: str, rate: float, capacity: float):
+        from ..models import ProviderQuota
+
+        self.endpoint = endpoint
+        self.rate = rate
+        self.capacity = capacity
+        self.table = connection.ops.quote_name(ProviderQuota._meta.db_table)
+        ProviderQuota.objects.get_or_create(endpoint=endpoint, defaults={'tokens': capacity})
+
+    def take(self, tokens: float = 1, reserve: float = 0) -> float:
+        params = {
+            'endpoint': self.endpoint,
+            'capacity': self.capacity,
+            'rate': self.rate,
+            'tokens': tokens,
+            'reserve': reserve,
+        }
+        # Taken from the routing executor's threads, whose old connections Django never closes
+        check_connection(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {self.table} SET tokens = {REFILLED_TOKENS} - %(tokens)s, updated_at = clock_timestamp() "
+                f"WHERE endpoint = %(endpoint)s AND {REFILLED_TOKENS} - %(tokens)s >= %(reserve)s "
+                "RETURNING tokens",
+                params,
+            )
+            if cursor.fetchone() is not None:
+                return 0.0
+            cursor.execute(f"SELECT {REFILLED_TOKENS} FROM {self.table} WHERE endpoint = %(endpoint)s", params)
+            available = cursor.fetchone()[0]
+        return max((tokens + reserve - available) / self.rate, 0.001)
+
+    @property
+    def tokens(self) -> float:
+        check_connection(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {REFILLED_TOKENS} FROM {self.table} WHERE endpoint = %(endpoint)s",
+                {'endpoint': self.endpoint, 'capacity': self.capacity, 'rate': self.rate},
+            )
+            return cursor.fetchone()[0]
+
+
+class QuotaUsage:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)  # by priority
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.rejected = 0
+
+    def record(self, priority: str, waited: float):
+        with self._lock:
+            self.calls[priority] += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'calls': sum(self.calls.values()),
+            'interactive_calls': self.calls[INTERACTIVE],
+            'bulk_calls': self.calls[BULK],
+            'waits': self.waits,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'max_wait_seconds': round(self.max_wait_seconds, 3),
+            'rejected': self.rejected,
+        }
+
+
+class QuotaManager:
+    """
+    Per-endpoint token buckets in front of the provider APIs. Callers over the rate are queued
+    (they sleep until their tokens are refilled) rather than failed, up to max_wait seconds.
+    Bulk callers leave bulk_reserve of every bucket to interactive ones, and wait while
+    interactive callers of this process are waiting for the same endpoint.
+    """
+
+    def __init__(
+        self,
+        quotas: dict[str, tuple[float, float]],
+        backend: str = 'local',
+        bulk_reserve: float = 0.2,
+        max_wait: float = 30.0,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        if backend not in ('local', 'postgres'):
+            raise ValueError(f"Unknown quota backend: {backend}")
+        self.quotas = quotas
+        self.backend = backend
+        self.bulk_reserve = bulk_reserve
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._usage = defaultdict(QuotaUsage)
+        self._interactive_waiting = defaultdict(int)
+
+    def _bucket(self, endpoint: str) -> TokenBucket | PostgresTokenBucket | None:
+        if endpoint not in self.quotas:
+            return None
+        with self._lock:
+            if endpoint not in self._buckets:
+                rate, capacity = self.quotas[endpoint]
+                self._buckets[endpoint] = (
+                    PostgresTokenBucket(endpoint, rate, capacity) if self.backend == 'postgres'
+                    else TokenBucket(rate, capacity, clock=self.clock)
+                )
+            return self._buckets[endpoint]
+
+    def acquire(self, endpoint: str, tokens: float = 1):
+        """Block until the endpoint's bucket allows the call, raises QuotaExceeded after max_wait."""
+        priority = current_priority()
+        with self._lock:
+            usage = self._usage[endpoint]
+        bucket = self._bucket(endpoint)
+        if bucket is None:
+            usage.record(priority, 0.0)  # not rate limited, only counted
+            self._notify(endpoint, priority)
+            return
+
+        reserve = self.bulk_reserve * bucket.capacity if priority == BULK else 0.0
+        started = self.clock()
+        queued = slept = False
+        try:
+            while True:
+                if priority == BULK and self._interactive_waiting.get(endpoint):
+                    wait = 1 / bucket.rate  # give way, interactive callers are queued
+                else:
+                    wait = bucket.take(tokens, reserve)
+                    if wait == 0:
+                        break
+
+                if self.clock() + wait - started > self.max_wait:
+                    usage.record_rejected()
+                    logger.warning("Quota for %s exhausted, rejecting a call with %s priority.", endpoint, priority)
+                    raise QuotaExceeded(f"Quota for {endpoint} exhausted, waited {self.clock() - started:.1f}s")
+                if priority == INTERACTIVE and not queued:
+                    queued = True
+                    with self._lock:
+                        self._interactive_waiting[endpoint] += 1
+                self.sleep(wait)
+                slept = True
+        finally:
+            if queued:
+                with self._lock:
+                    self._interactive_waiting[endpoint] -= 1
+
+        usage.record(priority, self.clock() - started if slept else 0.0)
+        self._notify(endpoint, priority)
+
+    @staticmethod
+    def _notify(endpoint: str, priority: str):
+        for listener in _call_listeners.get():
+            listener(endpoint, priority)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            usage, buckets = dict(self._usage), dict(self._buckets)
+        stats = {}
+        for endpoint in sorted(set(self.quotas) | set(usage)):
+            stats[endpoint] = usage[endpoint].snapshot() if endpoint in usage else QuotaUsage().snapshot()
+            if endpoint in self.quotas:
+                rate, capacity = self.quotas[endpoint]
+                stats[endpoint].update({'rate_per_second': rate, 'burst': capacity})
+            if endpoint in buckets:
+                stats[endpoint]['tokens'] = round(buckets[endpoint].tokens, 2)
+        return stats
+
+
+_quota_manager = None
+_quota_manager_lock = threading.Lock()
+
+
+def get_quota_manager() -> QuotaManager:
+    """Process-wide quota manager, buckets are shared by every provider instance."""
+    global _quota_manager
+    if _quota_manager is None:
+        with _quota_manager_lock:
+            if _quota_manager is None:
+                _quota_manager = QuotaManager(
+                    settings.PROVIDER_QUOTAS,
+                    backend=settings.PROVIDER_QUOTA_BACKEND,
+                    bulk_reserve=settings.PROVIDER_QUOTA_BULK_RESERVE,
+                    max_wait=settings.PROVIDER_QUOTA_MAX_WAIT,
+                )
+    return _quota_manager
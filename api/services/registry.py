@@ -0,0 +1,51 @@
+from django.utils.module_loading import import_string
+
+# Implementations are registered by dotted path and only imported on first use,
+# so a process never pays for a provider or plotter it doesn't touch.
+ROUTING_PROVIDERS = {
+    'google': 'api.services.spotter_geocoding_service.GoogleMapsGeocodingService',
+    'openroute': 'api.services.spotter_geocoding_service.OpenRouteGeocodingService',
+    'fake': 'api.services.fake_geocoding_service.FakeGeocodingService',
+}
+
+ROUTE_OPTIMIZERS = {
+    'greedy': 'api.services.greedy_route_optimizer.GreedyRouteOptimizer',
+    'graph': 'api.services.graph_route_optimizer.GraphRouteOptimizer',
+}
+
+MAP_PLOTTERS = {
+    'folium': 'api.services.folium_map_plotter.FoliumMapPlotter',
+}
+
+
+def register_routing_provider(name: str, dotted_path: str):
+    ROUTING_PROVIDERS[name] = dotted_path
+
+
+def register_route_optimizer(name: str, dotted_path: str):
+    ROUTE_OPTIMIZERS[name] = dotted_path
+
+
+def register_map_plotter(name: str, dotted_path: str):
+    MAP_PLOTTERS[name] = dotted_path
+
+
+def get_routing_provider_class(name: str) -> type:
+    try:
+        return import_string(ROUTING_PROVIDERS[name])
+    except KeyError:
+        raise ValueError(f"Unknown routing provider: {name}")
+
+
+def get_route_optimizer_class(name: str) -> type:
+    try:
+        return import_string(ROUTE_OPTIMIZERS[name])
+    except KeyError:
+        raise ValueError(f"Unknown route optimizer: {name}")
+
+
+def get_map_plotter_class(name: str) -> type:
+    try:
+        return import_string(MAP_PLOTTERS[name])
+    except KeyError:
+        raise ValueError(f"Unknown map plotter: {name}")
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def route_key(start_location: str, end_location: str, *vehicle_params: float, waypoints: Sequence[str] = ()) -> str:
+    """Normalized key of a route request, insensitive to case and whitespace."""
+    def normalize(location: str) -> str:
+        return ' '.join(location.lower().split())
+
+    return '|'.join(
+        [normalize(start_location)]
+        + ['via ' + normalize(waypoint) for waypoint in waypoints]
+        + [normalize(end_location)]
+        + [f"{param:g}" for param in vehicle_params]
+    )
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Concurrent calls for the same key wait on one in-flight computation and share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _InFlightCall] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlightCall()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the call before waking followers, so later requests compute afresh
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+@contextmanager
+def advisory_lock(key: str):
+    """Session level Postgres advisory lock, held by one process at a time."""
+    lock_id = int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [lock_id])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+
+class RouteRequestCoalescer:
+    """
+    Coalesce identical route requests within the process, and optionally across processes.
+    Across processes, the leader holds an advisory lock while computing and leaves its result
+    in the shared Django cache for a few seconds, which is what the waiting processes pick up.
+    """
+
+    def __init__(self, across_processes: bool = False, result_ttl: float = 5):
+        self.single_flight = SingleFlight()
+        self.across_processes = across_processes
+        self.result_ttl = result_ttl
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.across_processes:
+            return self.single_flight.do(key, fn)
+        return self.single_flight.do(key, lambda: self._do_across_processes(key, fn))
+
+    def _do_across_processes(self, key: str, fn: Callable[[], Any]) -> Any:
+        cache_key = 'route-coalesce:' + hashlib.sha256(key.encode()).hexdigest()
+        with advisory_lock(key):
+            result = cache.get(cache_key)
+            if result is not None:
+                logger.info("Reusing route computed by another process.")
+                return result
+            result = fn()
+            cache.set(cache_key, result, timeout=self.result_ttl)
+            return result
+
+
+_route_coalescer = None
+_route_coalescer_lock = threading.Lock()
+
+
+def get_route_coalescer() -> RouteRequestCoalescer:
+    global _route_coalescer
+    if _route_coalescer is None:
+        with _route_coalescer_lock:
+            if _route_coalescer is None:
+                _route_coalescer = RouteRequestCoalescer(
+                    across_processes=settings.ROUTE_COALESCE_ACROSS_PROCESSES,
+                    result_ttl=settings.ROUTE_COALESCE_RESULT_TTL,
+                )
+    return _route_coalescer
@@ -0,0 +1,147 @@
+import hashlib
+import math
+from typing import Iterable
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def haversine_miles(point1: tuple[float, float], point2: tuple[float, float]) -> float:
+    lat1, lon1 = map(math.radians, point1)
+    lat2, lon2 = map(math.radians, point2)
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return EARTH_RADIUS_MILES * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def polyline_length_miles(points: list[tuple[float, float]]) -> float:
+    return sum(haversine_miles(a, b) for a, b in zip(points, points[1:]))
+
+
+def snap_to_route(
+    points: list[tuple[float, float]],
+    position: tuple[float, float]
+) -> tuple[int, tuple[float, float], float]:
+    """
+    Project a position onto the closest segment of a route.
+    Returns the index of the segment's first point, the snapped position and its distance in miles.
+    """
+    if len(points) == 1:
+        return 0, points[0], haversine_miles(points[0], position)
+
+    best = None
+    for i, (start, end) in enumerate(zip(points, points[1:])):
+        # Project on a local equirectangular plane, accurate enough at segment scale
+        scale = math.cos(math.radians(start[0]))
+        dx, dy = (end[1] - start[1]) * scale, end[0] - start[0]
+        px, py = (position[1] - start[1]) * scale, position[0] - start[0]
+        length = dx * dx + dy * dy
+        t = 0.0 if length == 0 else max(0.0, min(1.0, (px * dx + py * dy) / length))
+        snapped = (start[0] + t * (end[0] - start[0]), start[1] + t * (end[1] - start[1]))
+        distance = haversine_miles(snapped, position)
+        if best is None or distance < best[2]:
+            best = (i, snapped, distance)
+    return best
+
+
+def dedupe_consecutive(points: Iterable[tuple[float, float]]) -> list[tuple[float, float]]:
+    """Drop points repeating the previous one, the optimizer emits most points twice."""
+    deduped = []
+    for point in points:
+        if not deduped or deduped[-1] != point:
+            deduped.append(point)
+    return deduped
+
+
+def encode_polyline(points: Iterable[tuple[float, float]], precision: int = 5) -> str:
+    """Encode (latitude, longitude) points with Google's encoded polyline algorithm."""
+    factor = 10 ** precision
+    encoded = []
+    previous_lat = previous_lon = 0
+
+    for lat, lon in points:
+        lat, lon = round(lat * factor), round(lon * factor)
+        for delta in (lat - previous_lat, lon - previous_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat, previous_lon = lat, lon
+
+    return ''.join(encoded)
+
+
+def geometry_hash(points: Iterable[tuple[float, float]]) -> str:
+    """Hash of a route's coordinates, to ~10 cm so float noise from the provider doesn't change it."""
+    return hashlib.blake2b(encode_polyline(points, precision=6).encode(), digest_size=16).hexdigest()
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> list[tuple[float, float]]:
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+
+    return points
+
+
+def _perpendicular_distance(point, start, end) -> float:
+    # Planar distance in degrees, plenty for deciding what is visible on a map
+    if start == end:
+        return ((point[0] - start[0]) ** 2 + (point[1] - start[1]) ** 2) ** 0.5
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    return abs(dy * (point[0] - start[0]) - dx * (point[1] - start[1])) / (dx * dx + dy * dy) ** 0.5
+
+
+def simplify(points: list[tuple[float, float]], tolerance: float) -> list[tuple[float, float]]:
+    """Ramer-Douglas-Peucker simplification, tolerance in degrees."""
+    if len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, None
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_to(
+    points: list[tuple[float, float]],
+    max_points: int,
+    tolerance: float = 0.0005
+) -> list[tuple[float, float]]:
+    """Simplify with a growing tolerance until at most max_points remain."""
+    if max_points < 2:
+        # Both ends are always kept
+        raise ValueError(f"max_points must be at least 2, got {max_points}")
+    simplified = simplify(dedupe_consecutive(points), tolerance)
+    while len(simplified) > max_points:
+        tolerance *= 2
+        simplified = simplify(simplified, tolerance)
+    return simplified
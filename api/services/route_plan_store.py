@@ -0,0 +1,118 @@
+import logging
+import math
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+
+from ..db_routers import use_primary
+from ..models import FuelStation, RoutePlan
+from .price_snapshot import get_price_version
+from .route_geometry import geometry_hash
+from .spotter_fuel_station_repository import SpotterFuelStationRepository
+from .station_tiles import TILE_COLUMNS, TILE_DEGREES
+
+logger = logging.getLogger(__name__)
+
+
+class RoutePlanStore:
+    """Persist computed plans with their route geometry and corridor stations."""
+
+    def __init__(self, station_repository: SpotterFuelStationRepository, corridor_miles: float):
+        self.station_repository = station_repository
+        self.corridor_miles = corridor_miles
+
+    def save(
+        self,
+        start_location: str,
+        end_location: str,
+        route_points: list[tuple[float, float]],
+        total_distance: float,
+        max_range_miles: float,
+        mpg: float,
+        candidate_station_ids: list[int] | None = None,
+    ) -> RoutePlan:
+        route_hash = geometry_hash(route_points)
+        if len(route_points) < 2:
+            route_points = list(route_points) * 2  # a LineString needs two points
+        return RoutePlan.objects.create(
+            start_location=start_location[:255],
+            end_location=end_location[:255],
+            route=LineString([(lon, lat) for lat, lon in route_points], srid=4326),
+            geometry_hash=route_hash,
+            price_version=get_price_version(),
+            total_distance=total_distance,
+            max_range_miles=max_range_miles,
+            mpg=mpg,
+            candidate_station_ids=(
+                candidate_station_ids if candidate_station_ids is not None
+                else self.station_repository.get_station_ids_along_route(route_points, self.corridor_miles)
+            ),
+        )
+
+    def get(self, plan_id) -> RoutePlan:
+        return RoutePlan.objects.get(pk=plan_id)
+
+    def price_version(self, route_points: list[tuple[float, float]], max_range_miles: float, mpg: float) -> int | None:
+        """
+        Price version a plan of this route and vehicle was last made with, if no price load touched its corridor
+        since. None when there is no such plan.
+        """
+        return (retained_plans()
+                .filter(geometry_hash=geometry_hash(route_points), max_range_miles=max_range_miles, mpg=mpg,
+                        stale=False)
+                .aggregate(version=Max('price_version'))['version'])
+
+    @staticmethod
+    def route_points(plan: RoutePlan) -> list[tuple[float, float]]:
+        return [(lat, lon) for lon, lat in plan.route.coords]
+
+
+def retained_plans():
+    """
+    Plans of the last ROUTE_PLAN_RETENTION_DAYS. Price loads only mark these stale, older ones no longer vouch for
+    their price version and wait for prune_route_plans.
+    """
+    return RoutePlan.objects.filter(
+        created_at__gte=timezone.now() - timedelta(days=settings.ROUTE_PLAN_RETENTION_DAYS))
+
+
+def prune_route_plans(older_than: timedelta) -> int:
+    """Delete the plans made more than older_than ago. Returns how many were deleted."""
+    deleted, _ = RoutePlan.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+    logger.info("Deleted %s route plans.", deleted)
+    return deleted
+
+
+def mark_stale_plans(station_ids: Iterable[int] | None) -> int:
+    """
+    Mark the retained plans a price load affects as stale: the ones that considered one of the changed stations, and
+    the ones whose corridor a new or moved station is now in. All of them when station_ids is None.
+    """
+    plans = retained_plans().filter(stale=False)
+    if station_ids is None:
+        stale = plans.update(stale=True)
+        logger.info("Marked %s route plans stale.", stale)
+        return stale
+
+    station_ids = list(station_ids)
+    if not station_ids:
+        return 0
+    stale = plans.filter(candidate_station_ids__overlap=station_ids).update(stale=True)
+
+    with use_primary():  # the stations were just written
+        stations = FuelStation.objects.filter(id__in=station_ids, tile__isnull=False)
+        tiles = stations.aggregate(first=Min('tile'), last=Max('tile'))
+        if tiles['first'] is not None:
+            # Corridor in degrees at the latitude furthest from the equator, the spatial index prunes with it
+            max_latitude = min(max(abs(tiles['first'] // TILE_COLUMNS * TILE_DEGREES - 90),
+                                   abs((tiles['last'] // TILE_COLUMNS + 1) * TILE_DEGREES - 90)), 80)
+            corridor_degrees = settings.ROUTE_CORRIDOR_MILES / (69.05 * math.cos(math.radians(max_latitude)))
+            nearby = stations.filter(location__dwithin=(OuterRef('route'), corridor_degrees))
+            stale += plans.filter(Exists(nearby)).update(stale=True)
+
+    logger.info("Marked %s route plans stale.", stale)
+    return stale
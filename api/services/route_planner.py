@@ -0,0 +1,270 @@
+import logging
+from typing import Any, NamedTuple, Sequence
+
+from .base_services import FuelCostCalculator, GeocodingService, RouteOptimizer
+from .route_coalescer import RouteRequestCoalescer, route_key
+from .route_geometry import dedupe_consecutive, polyline_length_miles, snap_to_route
+
+logger = logging.getLogger(__name__)
+
+
+class Directions(NamedTuple):
+    route_points: list[tuple[float, float]]
+    total_distance: float  # driving distance in miles
+    # Miles of the route that weren't driven by the provider, when a stored route was reused
+    approximation_miles: float | None = None
+
+
+class RoutePlanner:
+    """Route pipeline: directions, fuel stop optimization and cost calculation."""
+
+    def __init__(
+        self,
+        geocoding_service: GeocodingService,
+        route_optimizer: RouteOptimizer,
+        cost_calculator: FuelCostCalculator,
+        coalescer: RouteRequestCoalescer | None = None,
+        plan_store=None,
+        station_repository=None,
+        corridor_miles: float = 25,
+        route_reuse=None,
+    ):
+        self.geocoding_service = geocoding_service
+        self.route_optimizer = route_optimizer
+        self.cost_calculator = cost_calculator
+        self.coalescer = coalescer
+        self.plan_store = plan_store
+        # Itineraries fetch the stations within corridor_miles of the whole route at once, when given
+        self.station_repository = station_repository
+        self.corridor_miles = corridor_miles
+        # Lanes without waypoints reuse stored routes with nearby endpoints, when given
+        self.route_reuse = route_reuse
+
+    def directions(
+        self,
+        start_location: str,
+        end_location: str,
+        waypoints: Sequence[str] = (),
+    ) -> Directions:
+        """
+        Route coordinates and driving distance in miles, through the waypoints in order with a single
+        directions call. Identical concurrent requests share one call.
+        """
+        if self.coalescer is None:
+            return self._directions(start_location, end_location, waypoints)
+        key = 'directions|' + route_key(start_location, end_location, waypoints=waypoints)
+        return self.coalescer.do(key, lambda: self._directions(start_location, end_location, waypoints))
+
+    def _directions(
+        self,
+        start_location: str,
+        end_location: str,
+        waypoints: Sequence[str] = (),
+    ) -> Directions:
+        reuse = self.route_reuse is not None and not waypoints
+        if reuse:
+            directions = self.route_reuse.find(start_location, end_location)
+            if directions is not None:
+                return directions
+
+        # Get the route, with googlemaps, we don't need coordinates
+        if waypoints:
+            route = self.geocoding_service.get_route(start_location, end_location, waypoints=list(waypoints))
+        else:
+            route = self.geocoding_service.get_route(start_location, end_location)
+        # Extract route details
+        directions = Directions(
+            self.geocoding_service.get_route_coordinates(route),
+            self.geocoding_service.get_route_distance(route),
+        )
+        if reuse:
+            self.route_reuse.save(directions, start_location, end_location)
+        return directions
+
+    def plan(
+        self,
+        start_location: str,
+        end_location: str,
+        directions: Directions | None = None,
+        waypoints: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        """
+        Plan a lane, or an itinerary through the waypoints in order, reusing directions() already fetched
+        for it if given. Fuel is planned across the whole itinerary, not leg by leg.
+        """
+        if self.coalescer is None:
+            return self._plan(start_location, end_location, directions, waypoints)
+
+        key = route_key(
+            start_location,
+            end_location,
+            self.route_optimizer.max_range_miles,
+            self.route_optimizer.mpg,
+            waypoints=waypoints,
+        )
+        return self.coalescer.do(key, lambda: self._plan(start_location, end_location, directions, waypoints))
+
+    def _plan(
+        self,
+        start_location: str,
+        end_location: str,
+        directions: Directions | None = None,
+        waypoints: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        directions = directions or self._directions(start_location, end_location, waypoints)
+        route_coords, total_distance = directions.route_points, directions.total_distance
+        corridor_stations, optimizer_options = None, {}
+        if self.station_repository is not None and (waypoints or self.plan_store is not None):
+            # One corridor query for the whole itinerary instead of a station query per stop. Stored plans only
+            # stop in the corridor too, so its stations are all a price load can change the plan with.
+            corridor_stations = self.station_repository.get_stations_along_route(route_coords, self.corridor_miles)
+            optimizer_options['corridor_stations'] = corridor_stations
+        # Find optimal fuel stops
+        fuel_stops = self.route_optimizer.find_optimal_stops(
+            route_coords,
+            total_distance,
+            **optimizer_options,
+        )
+        # Calculate total fuel cost
+        total_fuel_cost = self.cost_calculator.calculate_total_cost(
+            fuel_stops['stops']
+        )
+
+        result = {
+            'total_distance': total_distance,
+            'total_fuel_cost': total_fuel_cost,
+            'route': fuel_stops['route'],
+            'stops': fuel_stops['stops'],
+        }
+        if directions.approximation_miles is not None:
+            result['route_approximation_miles'] = directions.approximation_miles
+        if self.plan_store is not None:
+            # Keep the geometry and the stations the optimizer picked from around for re-plans
+            result['plan_id'] = self.plan_store.save(
+                start_location,
+                end_location,
+                route_coords,
+                total_distance,
+                self.route_optimizer.max_range_miles,
+                self.route_optimizer.mpg,
+                candidate_station_ids=(
+                    [station.id for station in corridor_stations] if corridor_stations is not None else None
+                ),
+            ).id
+        return result
+
+    def what_if(
+        self,
+        start_location: str,
+        end_location: str,
+        max_range_miles: list[float],
+        mpg: list[float],
+        fuel_levels: list[float],
+        waypoints: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        """
+        Greedy plans of the lane for every combination of tank range, mpg and starting fuel level (0 to 1),
+        from one directions call and one station query. Costs and stop counts are indexed
+        [max_range_miles][mpg][fuel_level], with None for the vehicles that can't make it.
+        """
+        # numpy is only imported by the processes that get what-if requests
+        from .station_snapshot import StationSnapshot
+        from .what_if import plan_scenarios, scenario_grid
+
+        if self.station_repository is None:
+            raise Exception("What-if plans need a station repository.")
+
+        route_coords, total_distance, _ = self.directions(start_location, end_location, waypoints)
+        stations = StationSnapshot.from_records(
+            self.station_repository.get_stations_along_route(route_coords, self.corridor_miles))
+        ranges, mpgs, levels = scenario_grid(max_range_miles, mpg, fuel_levels)
+        plans = plan_scenarios(route_coords, total_distance, stations, ranges, mpgs, levels * ranges)
+
+        return {
+            'total_distance': total_distance,
+            'max_range_miles': list(max_range_miles),
+            'mpg': list(mpg),
+            'fuel_levels': list(fuel_levels),
+            **plans.as_lists((len(max_range_miles), len(mpg), len(fuel_levels))),
+        }
+
+    def alternatives(
+        self,
+        start_location: str,
+        end_location: str,
+        count: int,
+        objective: str = 'cost',
+        avoid: Sequence[str] = (),
+        waypoints: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        """
+        The count best plans of the lane ranked by objective ('cost' or 'stops'), skipping the stations whose
+        name contains one of the avoid chains, from one directions call, one station query and one optimizer pass.
+        """
+        # numpy is only imported by the processes that get alternatives requests
+        from .alternative_plans import k_best_plans
+        from .station_snapshot import StationSnapshot
+
+        if self.station_repository is None:
+            raise Exception("Alternative plans need a station repository.")
+
+        route_coords, total_distance, _ = self.directions(start_location, end_location, waypoints)
+        avoid = [chain.lower() for chain in avoid]
+        stations = StationSnapshot.from_records([
+            station for station in self.station_repository.get_stations_along_route(route_coords, self.corridor_miles)
+            if not any(chain in (station.name or '').lower() for chain in avoid)
+        ])
+        plans = k_best_plans(
+            route_coords, total_distance, stations, self.route_optimizer.max_range_miles, count, objective=objective)
+        if not plans:
+            logger.error("No stations can be reached to refuel. Stuck without fuel.")
+            raise Exception("No stations can be reached to refuel. Stuck without fuel.")
+
+        alternatives = []
+        for plan in plans:
+            stops = [stations.records[index] for index in plan.stations]
+            alternatives.append({
+                'total_fuel_cost': self.cost_calculator.calculate_total_cost(stops),
+                'stops': stops,
+            })
+        return {
+            'total_distance': total_distance,
+            'objective': objective,
+            'route': route_coords,
+            'alternatives': alternatives,
+        }
+
+    def replan(self, plan, position: tuple[float, float], fuel_level: float) -> dict[str, Any]:
+        """
+        Re-optimize the rest of a stored plan from the current position and fuel level (0 to 1),
+        reusing its route geometry and candidate stations instead of asking for directions again.
+        """
+        route_coords = self.plan_store.route_points(plan)
+        index, snapped, off_route_miles = snap_to_route(route_coords, position)
+        remaining_coords = dedupe_consecutive([snapped] + route_coords[index + 1:])
+
+        # Scale the straight line length of what's left to the driving distance of the whole route
+        full_length = polyline_length_miles(route_coords)
+        remaining_distance = round(
+            plan.total_distance * polyline_length_miles(remaining_coords) / full_length if full_length else 0.0,
+            5
+        )
+
+        fuel_stops = self.route_optimizer.find_optimal_stops(
+            remaining_coords,
+            remaining_distance,
+            start_fuel_range=fuel_level * self.route_optimizer.max_range_miles,
+            candidate_station_ids=plan.candidate_station_ids,
+        )
+        total_fuel_cost = self.cost_calculator.calculate_total_cost(
+            fuel_stops['stops']
+        )
+
+        return {
+            'plan_id': plan.id,
+            'total_distance': remaining_distance,
+            'total_fuel_cost': total_fuel_cost,
+            'off_route_miles': round(off_route_miles, 5),
+            'route': fuel_stops['route'],
+            'stops': fuel_stops['stops'],
+        }
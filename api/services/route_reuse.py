@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import LineString, Point
+from django.contrib.gis.measure import D
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import CachedRoute
+from .base_services import GeocodingService
+from .route_geometry import dedupe_consecutive, haversine_miles
+from .route_planner import Directions
+
+logger = logging.getLogger(__name__)
+
+
+class RouteReuse:
+    """
+    Answer directions requests with a stored route whose endpoints are within radius_miles of the request's.
+    Ends further than connector_miles from the stored route are joined to it with a short connector leg from
+    the provider, closer ones with a straight line, whose length is reported as the approximation. Lanes needing
+    two connector legs are fetched directly, that's one provider call instead of two. The end is only geocoded
+    when a stored route starts near the start.
+    """
+
+    def __init__(
+        self,
+        geocoding_service: GeocodingService,
+        radius_miles: float,
+        connector_miles: float = 1,
+        max_age: timedelta = timedelta(days=30),
+    ):
+        self.geocoding_service = geocoding_service
+        self.radius_miles = radius_miles
+        self.connector_miles = connector_miles
+        self.max_age = max_age
+
+    def find(self, start_location: str, end_location: str) -> Directions | None:
+        start = self.locate(start_location)
+        starting_near = self._starting_near(start)
+        if not starting_near.exists():
+            return None
+        end = self.locate(end_location)
+        cached_route = self._nearest(starting_near, end)
+        if cached_route is None:
+            return None
+
+        route_points = [(lat, lon) for lon, lat in cached_route.route.coords]
+        if min(haversine_miles(start, route_points[0]), haversine_miles(route_points[-1], end)) > self.connector_miles:
+            return None
+        start_leg = self._connect(start, route_points[0])
+        end_leg = self._connect(route_points[-1], end)
+        logger.info("Reusing route %s for %s - %s", cached_route.pk, start_location, end_location)
+        return Directions(
+            dedupe_consecutive(start_leg.route_points[:-1] + route_points + end_leg.route_points[1:]),
+            round(start_leg.total_distance + cached_route.total_distance + end_leg.total_distance, 5),
+            round(start_leg.approximation_miles + end_leg.approximation_miles, 5),
+        )
+
+    def save(self, directions: Directions, start_location: str = '', end_location: str = '') -> CachedRoute:
+        route_points = directions.route_points
+        if len(route_points) < 2:
+            route_points = list(route_points) * 2  # a LineString needs two points
+        return CachedRoute.objects.create(
+            start_point=Point(route_points[0][1], route_points[0][0], srid=4326),
+            end_point=Point(route_points[-1][1], route_points[-1][0], srid=4326),
+            route=LineString([(lon, lat) for lat, lon in route_points], srid=4326),
+            total_distance=directions.total_distance,
+            start_location=normalize_location(start_location)[:255],
+            end_location=normalize_location(end_location)[:255],
+        )
+
+    def locate(self, location: str) -> tuple[float, float]:
+        """
+        Coordinates of an address: the end of a stored route fetched for it, or geocoded once per max_age.
+        """
+        normalized = normalize_location(location)
+        key = 'geocode|' + hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+        coordinates = cache.get(key)
+        if coordinates is None:
+            coordinates = self._stored_location(normalized) or tuple(self.geocoding_service.get_coordinates(location))
+            cache.set(key, coordinates, timeout=self.max_age.total_seconds())
+        return coordinates
+
+    def _stored_location(self, normalized: str) -> tuple[float, float] | None:
+        # Shared by every process, unlike the per process cache
+        fresh = CachedRoute.objects.filter(created_at__gte=timezone.now() - self.max_age).order_by('-created_at')
+        for location_field, point_field in (('start_location', 'start_point'), ('end_location', 'end_point')):
+            point = fresh.filter(**{location_field: normalized[:255]}).values_list(point_field, flat=True).first()
+            if point is not None:
+                return point.y, point.x
+        return None
+
+    def _radius_degrees(self, latitude: float) -> float:
+        # A bounding distance in degrees lets the spatial index prune, the exact distance in miles follows
+        return self.radius_miles / (69.05 * math.cos(math.radians(min(abs(latitude), 80))))
+
+    def _starting_near(self, start: tuple[float, float]):
+        start_point = Point(start[1], start[0], srid=4326)
+        return (CachedRoute.objects
+                .filter(created_at__gte=timezone.now() - self.max_age)
+                .filter(start_point__dwithin=(start_point, self._radius_degrees(start[0])))
+                .filter(start_point__distance_lte=(start_point, D(mi=self.radius_miles)))
+                .annotate(start_offset=Distance('start_point', start_point)))
+
+    def _nearest(self, starting_near, end: tuple[float, float]) -> CachedRoute | None:
+        end_point = Point(end[1], end[0], srid=4326)
+        return (starting_near
+                .filter(end_point__dwithin=(end_point, self._radius_degrees(end[0])))
+                .filter(end_point__distance_lte=(end_point, D(mi=self.radius_miles)))
+                .annotate(offset=F('start_offset') + Distance('end_point', end_point))
+                .order_by('offset', '-created_at')
+                .first())
+
+    def _connect(self, start: tuple[float, float], end: tuple[float, float]) -> Directions:
+        """A connector leg between two points, a straight line when they are close."""
+        offset = haversine_miles(start, end)
+        if offset <= self.connector_miles:
+            return Directions([start, end], offset, offset)
+        route = self.geocoding_service.get_route(start, end)
+        route_points = self.geocoding_service.get_route_coordinates(route)
+        return Directions([start, *route_points, end], self.geocoding_service.get_route_distance(route), 0.0)
+
+
+def normalize_location(location: str) -> str:
+    """Address insensitive to case and whitespace."""
+    return ' '.join(location.lower().split())
+
+
+def build_route_reuse(geocoding_service: GeocodingService) -> RouteReuse | None:
+    """Route reuse as configured by the ROUTE_REUSE_* settings, None when disabled."""
+    if not settings.ROUTE_REUSE_RADIUS_MILES:
+        return None
+    return RouteReuse(
+        geocoding_service,
+        settings.ROUTE_REUSE_RADIUS_MILES,
+        connector_miles=settings.ROUTE_REUSE_CONNECTOR_MILES,
+        max_age=timedelta(days=settings.ROUTE_REUSE_MAX_AGE_DAYS),
+    )
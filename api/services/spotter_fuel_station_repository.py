@@ -1,11 +1,14 @@
+import math
 from typing import Any
 from django.contrib.gis.measure import D
 
 from ..models import FuelStation
 from .base_services import FuelStationRepository
 from .spotter_geocoding_service import GoogleMapsGeocodingService
+from .station_records import STATION_RECORD_FIELDS, StationRecord, station_record_rows, station_records
+from .station_tiles import tiles_near
 
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import LineString, Point
 from django.contrib.gis.db.models.functions import Distance
 
 
@@ -32,24 +35,55 @@ class SpotterFuelStationRepository(FuelStationRepository):
         # Loop through each route point and query stations near it
         # Query stations within max_distance of the current route point
         stations = FuelStation.objects.filter(
+            tile__in=tiles_near([route_point], max_distance),
             location__distance_lte=(route_points_object, D(m=max_distance*1609.34))  # in meters
         )
         stations = stations.annotate(
             distance=Distance('location', route_points_object)
         ).order_by('retail_price', 'distance')
 
-        # Add stations to the result if they haven't been added yet
-        for station in stations:
+        # Add stations to the result if they haven't been added yet, as records rather than model instances
+        for *fields, distance in station_record_rows(stations).values_list(*STATION_RECORD_FIELDS, 'distance'):
+            station = StationRecord(*fields)
             if station.id not in seen_stations:
                 seen_stations.add(station.id)
                 fuel_stops.append({
                     'station': station,
-                    'distance': station.distance.mi,  # Convert to miles
+                    'distance': distance.mi,  # Convert to miles
                     'price': station.retail_price
                 })
 
         return fuel_stops
 
+    def get_station_ids_along_route(
+        self,
+        route_points: list[tuple[float, float]],
+        corridor_miles: float
+    ) -> list[int]:
+        return list(self._along_route(route_points, corridor_miles).values_list('id', flat=True))
+
+    def get_stations_along_route(
+        self,
+        route_points: list[tuple[float, float]],
+        corridor_miles: float
+    ) -> list[StationRecord]:
+        """Priced stations within corridor_miles of the route, in one query."""
+        stations = self._along_route(route_points, corridor_miles).filter(retail_price__isnull=False)
+        return station_records(stations)
+
+    def _along_route(self, route_points: list[tuple[float, float]], corridor_miles: float):
+        if len(route_points) < 2:
+            route_points = list(route_points) * 2  # a LineString needs two points
+        route_line = LineString([(lon, lat) for lat, lon in route_points], srid=4326)
+
+        # A bounding distance in degrees lets the spatial index prune, the exact distance in miles follows
+        max_latitude = min(max(abs(lat) for lat, _ in route_points), 80)
+        corridor_degrees = corridor_miles / (69.05 * math.cos(math.radians(max_latitude)))
+        return (FuelStation.objects
+                .filter(tile__in=tiles_near(route_points, corridor_miles))
+                .filter(location__dwithin=(route_line, corridor_degrees))
+                .filter(location__distance_lte=(route_line, D(mi=corridor_miles))))
+
     def save_station(self, data: dict[str, Any]) -> FuelStation:
         return FuelStation.objects.update_or_create(
             truckstop_id=data['truckstop_id'],
@@ -71,5 +105,5 @@ class SpotterFuelStationRepository(FuelStationRepository):
                     station.city}, {station.state}, USA"
             )
             station.location = Point(
-                station_coords[0], station_coords[1], srid=4326)
+                station_coords[1], station_coords[0], srid=4326)  # longitude, latitude
             station.save()
@@ -1,44 +1,84 @@
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict
 
 from django.conf import settings
-from openrouteservice import Client
-import googlemaps
 from .base_services import GeocodingService
+from .provider_quota import get_quota_manager
+
+if TYPE_CHECKING:
+    import googlemaps
 
 
 class OpenRouteGeocodingService(GeocodingService):
     def __init__(self):
+        # Client libraries are imported when a service is built, not when this module is
+        from openrouteservice import Client
+
         self.client = Client(key=settings.OPENROUTE_API_KEY)
 
     def get_coordinates(self, location: str) -> tuple[float, float]:
+        get_quota_manager().acquire('openroute.geocode')
         geocode = self.client.pelias_search(text=location)
 
         if not geocode['features']:
             raise ValueError(
                 f"Could not find coordinates for location: {location}")
 
+        # geojson coordinates are (longitude, latitude), every service returns (latitude, longitude)
         coords = geocode['features'][0]['geometry']['coordinates']
-        return (coords[0], coords[1])
+        return (coords[1], coords[0])
 
     def get_route(
         self,
-        start_coords: tuple[float, float],
-        end_coords: tuple[float, float]
+        start_coords: tuple[float, float] | str,
+        end_coords: tuple[float, float] | str,
+        waypoints: list[tuple[float, float] | str] | None = None,
     ) -> Dict[str, Any]:
+        # openrouteservice only routes between coordinates, resolve addresses first. It takes them as
+        # (longitude, latitude), the others as (latitude, longitude)
+        coordinates = [
+            tuple(reversed(self.get_coordinates(location) if isinstance(location, str) else location))
+            for location in [start_coords, *(waypoints or []), end_coords]
+        ]
+
+        get_quota_manager().acquire('openroute.directions')
         return self.client.directions(
-            coordinates=[start_coords, end_coords],
+            coordinates=coordinates,
             profile='driving-car',
             format='geojson'
         )
 
+    def get_route_coordinates(
+        self,
+        route: Dict[str, Any]
+    ) -> list[tuple[float, float]]:
+        # geojson coordinates are (longitude, latitude), the optimizer expects (latitude, longitude)
+        return [
+            (coords[1], coords[0])
+            for coords in route['features'][0]['geometry']['coordinates']
+        ]
+
+    def get_route_distance(
+        self,
+        route: Dict[str, Any]
+    ) -> float:
+        segments = route['features'][0]['properties']['segments']
+        return round(
+            sum(segment['distance'] for segment in segments) / 1609.34,  # miles
+            5
+        )
+
 
 class GoogleMapsGeocodingService(GeocodingService):
     def __init__(self):
-        self.client: googlemaps.Client = googlemaps.Client(
+        import googlemaps
+
+        self.client: "googlemaps.Client" = googlemaps.Client(
             key=settings.GOOGLE_MAPS_API_KEY,
+            base_url=settings.GOOGLE_MAPS_BASE_URL,
         )
 
     def get_coordinates(self, location: str) -> tuple[float, float]:
+        get_quota_manager().acquire('google.geocode')
         loc = self.client.geocode(location)
 
         if not loc:
@@ -53,12 +93,16 @@ class GoogleMapsGeocodingService(GeocodingService):
     def get_route(
         self,
         start_coords: tuple[float, float],
-        end_coords: tuple[float, float]
+        end_coords: tuple[float, float],
+        waypoints: list[tuple[float, float] | str] | None = None,
     ) -> Dict[str, Any]:
+        get_quota_manager().acquire('google.directions')
+        # One route with a leg per stop, in the given order
         return self.client.directions(
             origin=start_coords,
             destination=end_coords,
             mode='driving',
+            **({'waypoints': waypoints} if waypoints else {}),
         )
 
     def get_route_coordinates(
@@ -67,13 +111,14 @@ class GoogleMapsGeocodingService(GeocodingService):
     ) -> list[tuple[float, float]]:
         route_coords = []
 
-        for step in route[0]['legs'][0]['steps']:
-            route_coords.append(
-                (
-                    step['start_location']['lat'],
-                    step['start_location']['lng']
+        for leg in route[0]['legs']:
+            for step in leg['steps']:
+                route_coords.append(
+                    (
+                        step['start_location']['lat'],
+                        step['start_location']['lng']
+                    )
                 )
-            )
         # also add the end location
         route_coords.append(
             (
@@ -88,12 +133,12 @@ class GoogleMapsGeocodingService(GeocodingService):
         route: list[dict[str, Any]]
     ) -> float:
         return round(
-            route[0]['legs'][0]['distance']['value'] / 1609.34,  # miles
+            sum(leg['distance']['value'] for leg in route[0]['legs']) / 1609.34,  # miles
             5
         )
 
     def get_distance_between_points(self, point_a: tuple[float, float], point_b: tuple[float, float]) -> float:
-
+        get_quota_manager().acquire('google.distance_matrix')
         result = self.client.distance_matrix(
             origins=(point_a[0], point_a[1]),
             destinations=(point_b[0], point_b[1]),
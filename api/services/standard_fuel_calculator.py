@@ -1,19 +1,18 @@
 from decimal import Decimal
 
 from .base_services import FuelCostCalculator
-from ..models import FuelStation
+from .station_records import StationRecord
 
 
 class StandardFuelCostCalculator(FuelCostCalculator):
-    def __init__(self, mpg: float = 10):
+    def __init__(self, mpg: float = 10, max_range_miles: float = 500):
         self.mpg = mpg
-        self.total_distance_capacity = 500
+        self.total_distance_capacity = max_range_miles  # a full tank at every stop
 
     def calculate_total_cost(
         self,
-        fuel_stops: list[FuelStation]
+        fuel_stops: list[StationRecord]
     ) -> Decimal:
-        print(fuel_stops)
         total_gallons = self.total_distance_capacity / self.mpg
         total_price = sum(Decimal(str(stop.retail_price))
                           for stop in fuel_stops)
@@ -0,0 +1,289 @@
+import heapq
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from django.conf import settings
+
+from ..db_routers import use_primary
+from ..models import FuelStation
+from .geo_arrays import ROAD_DETOUR_FACTOR, bearing_radians, haversine_miles
+from .price_events import PriceChange, subscribe
+from .station_snapshot import StationSnapshot
+
+logger = logging.getLogger(__name__)
+
+MILES_PER_DEGREE_LATITUDE = 69.05
+POSITION_BLOCK_SIZE = 256
+
+
+class StationGraph:
+    """
+    Sparse station-to-station reachability graph in CSR form. The out edges of station i
+    are indices[indptr[i]:indptr[i + 1]], weighted by the approximate driving distance.
+    """
+
+    def __init__(self, station_ids, latitudes, longitudes, prices, indptr, indices, distances, max_range_miles):
+        self.station_ids = station_ids
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.prices = prices
+        self.indptr = indptr
+        self.indices = indices
+        self.distances = distances
+        self.max_range_miles = float(max_range_miles)
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def build(
+        cls,
+        snapshot: StationSnapshot,
+        max_range_miles: float,
+        sectors: int = 8,
+        rings: int = 10,
+    ) -> "StationGraph":
+        """
+        Connect each station to the stations within tank range. To keep the graph sparse, only
+        the cheapest station of every (bearing sector, distance ring) cell around it is kept,
+        which preserves long hops and cheap stops in every direction of travel.
+        """
+        latitudes, longitudes, prices = snapshot.latitudes, snapshot.longitudes, snapshot.prices
+        order = np.argsort(latitudes, kind='stable')
+        sorted_latitudes = latitudes[order]
+        band = max_range_miles / ROAD_DETOUR_FACTOR / MILES_PER_DEGREE_LATITUDE
+
+        indptr = np.zeros(len(snapshot) + 1, dtype=np.int64)
+        neighbours, neighbour_distances = [], []
+        for i in range(len(snapshot)):
+            # Only stations in the latitude band can be in range
+            low, high = np.searchsorted(sorted_latitudes, [latitudes[i] - band, latitudes[i] + band])
+            candidates = order[low:high]
+            distances = haversine_miles(
+                latitudes[i], longitudes[i], latitudes[candidates], longitudes[candidates]
+            ) * ROAD_DETOUR_FACTOR
+            in_range = (distances <= max_range_miles) & (candidates != i)
+            candidates, distances = candidates[in_range], distances[in_range]
+
+            bearings = bearing_radians(latitudes[i], longitudes[i], latitudes[candidates], longitudes[candidates])
+            sector = np.minimum((bearings / (2 * np.pi) * sectors).astype(np.int64), sectors - 1)
+            ring = np.minimum((distances / max_range_miles * rings).astype(np.int64), rings - 1)
+            cell = sector * rings + ring
+
+            # Sort by cell, then price, then distance and keep the first station of every cell
+            by_cell = np.lexsort((distances, prices[candidates], cell))
+            first_of_cell = np.ones(len(by_cell), dtype=bool)
+            first_of_cell[1:] = cell[by_cell][1:] != cell[by_cell][:-1]
+            kept = by_cell[first_of_cell]
+
+            neighbours.append(candidates[kept].astype(np.int32))
+            neighbour_distances.append(distances[kept].astype(np.float32))
+            indptr[i + 1] = indptr[i] + len(kept)
+
+        return cls(
+            station_ids=snapshot.ids,
+            latitudes=latitudes,
+            longitudes=longitudes,
+            prices=prices,
+            indptr=indptr,
+            indices=np.concatenate(neighbours) if neighbours else np.zeros(0, dtype=np.int32),
+            distances=np.concatenate(neighbour_distances) if neighbour_distances else np.zeros(0, dtype=np.float32),
+            max_range_miles=max_range_miles,
+        )
+
+    def save(self, path: Path | str):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write next to the target and rename, readers never see a half written file
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.npz', delete=False) as file:
+            np.savez_compressed(
+                file,
+                station_ids=self.station_ids,
+                latitudes=self.latitudes,
+                longitudes=self.longitudes,
+                prices=self.prices,
+                indptr=self.indptr,
+                indices=self.indices,
+                distances=self.distances,
+                max_range_miles=np.array(self.max_range_miles),
+            )
+        os.replace(file.name, path)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "StationGraph":
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    def with_prices(self, prices: dict[int, float], station_ids: Iterable[int] | None = None) -> "StationGraph":
+        """
+        Copy sharing the edges, with the prices of station_ids (every station when None) read from prices.
+        Stations missing from prices lost theirs and are never stopped at.
+        """
+        if station_ids is None:
+            nodes = np.arange(len(self))
+        else:
+            nodes = np.flatnonzero(np.isin(self.station_ids, np.fromiter(station_ids, dtype=np.int64)))
+        repriced = self.prices.copy()
+        repriced[nodes] = [prices.get(int(self.station_ids[node]), np.inf) for node in nodes]
+        return StationGraph(
+            self.station_ids, self.latitudes, self.longitudes, repriced,
+            self.indptr, self.indices, self.distances, self.max_range_miles,
+        )
+
+    def cheapest_path(
+        self,
+        route_points: list[tuple[float, float]],
+        total_distance: float,
+        max_range_miles: float,
+        mpg: float,
+        start_range_miles: float | None = None,
+        station_ids: Iterable[int] | None = None,
+    ) -> tuple[list[int], float] | None:
+        """
+        A* search for the cheapest sequence of stations along the route, among station_ids (e.g. the ones of the
+        route corridor, every station when None). Each station sits at the route mile closest to it, and stopping
+        there costs the drive off the route and back. Costs are the ones of StandardFuelCostCalculator: a full tank
+        of max_range_miles / mpg gallons at every stop, so the cost returned is the one the plan is billed. Starts
+        with a full tank unless start_range_miles says otherwise.
+        Returns graph indices of the stations in route order and the fuel cost, or None when the end can't be reached.
+        """
+        gallons = max_range_miles / mpg
+        searched = np.isfinite(self.prices)
+        if station_ids is not None:
+            searched &= np.isin(self.station_ids, np.fromiter(station_ids, dtype=np.int64))
+        nodes = np.flatnonzero(searched)
+        route_miles, detours = route_positions(
+            self.latitudes[nodes], self.longitudes[nodes], route_points, total_distance)
+        order = np.argsort(route_miles, kind='stable')
+        nodes, route_miles, detours = nodes[order], route_miles[order], detours[order]
+        prices = self.prices[nodes]
+
+        # Driving distance from the start to each station, and on from it to the end
+        from_start = route_miles + detours
+        to_end = total_distance - route_miles + detours
+        # Admissible: every tank past this one is bought at the cheapest price there is
+        tanks_left = np.maximum(np.ceil(to_end / max_range_miles) - 1, 0)
+        heuristic = tanks_left * gallons * (prices.min() if len(prices) else 0)
+
+        costs = np.full(len(nodes), np.inf)  # of the stops up to and including this station's
+        previous = np.full(len(nodes), -1, dtype=np.int64)
+        heap = []
+        start_range_miles = max_range_miles if start_range_miles is None else start_range_miles
+        for i in np.flatnonzero(from_start <= start_range_miles):
+            costs[i] = prices[i] * gallons
+            heapq.heappush(heap, (costs[i] + heuristic[i], float(costs[i]), int(i)))
+
+        best_cost, best_last = np.inf, None
+        while heap:
+            estimate, cost, i = heapq.heappop(heap)
+            if estimate >= best_cost:
+                break
+            if cost > costs[i]:
+                continue  # stale heap entry
+
+            if to_end[i] <= max_range_miles:
+                if cost < best_cost:
+                    best_cost, best_last = cost, i
+                continue  # stopping again on the way only costs more
+
+            # Stations further along the route within a tank, driving back is never cheaper
+            ahead = np.arange(i + 1, np.searchsorted(route_miles, route_miles[i] + max_range_miles, side='right'))
+            ahead = ahead[route_miles[ahead] - route_miles[i] + detours[i] + detours[ahead] <= max_range_miles]
+            new_costs = cost + prices[ahead] * gallons
+            improved = new_costs < costs[ahead]
+            for j, new_cost in zip(ahead[improved], new_costs[improved]):
+                costs[j] = new_cost
+                previous[j] = i
+                heapq.heappush(heap, (new_cost + heuristic[j], float(new_cost), int(j)))
+
+        if best_last is None:
+            return None
+
+        path = [best_last]
+        while previous[path[-1]] != -1:
+            path.append(int(previous[path[-1]]))
+        return [int(nodes[i]) for i in path[::-1]], float(best_cost)
+
+
+def route_positions(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    route_points: list[tuple[float, float]],
+    total_distance: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Route mile of the route point closest to each location, scaled to the driving distance, and the approximate
+    driving distance from that point to the location.
+    """
+    route_latitudes = np.array([point[0] for point in route_points], dtype=np.float64)
+    route_longitudes = np.array([point[1] for point in route_points], dtype=np.float64)
+    along = np.concatenate(([0.0], np.cumsum(haversine_miles(
+        route_latitudes[:-1], route_longitudes[:-1], route_latitudes[1:], route_longitudes[1:]))))
+    if along[-1] > 0:
+        along *= total_distance / along[-1]
+
+    route_miles = np.empty(len(latitudes))
+    detours = np.empty(len(latitudes))
+    # A block of locations at a time keeps the distance matrix small on long routes
+    for block in range(0, len(latitudes), POSITION_BLOCK_SIZE):
+        rows = slice(block, block + POSITION_BLOCK_SIZE)
+        distances = haversine_miles(
+            latitudes[rows, None], longitudes[rows, None], route_latitudes, route_longitudes)
+        closest = distances.argmin(axis=1)
+        route_miles[rows] = along[closest]
+        detours[rows] = distances[np.arange(len(closest)), closest] * ROAD_DETOUR_FACTOR
+    return route_miles, detours
+
+
+_graph_cache = {'graph': None, 'mtime': None}
+_graph_lock = threading.Lock()
+
+
+def get_station_graph() -> StationGraph | None:
+    """Process-wide graph, reloaded whenever the precomputation job rewrites the file."""
+    path = Path(settings.STATION_GRAPH_FILE)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+    with _graph_lock:
+        if _graph_cache['mtime'] != mtime:
+            _graph_cache['graph'] = StationGraph.load(path)
+            _graph_cache['mtime'] = mtime
+            logger.info("Loaded station graph with %s stations.", len(_graph_cache['graph']))
+        return _graph_cache['graph']
+
+
+@subscribe
+def _reprice_graph(change: PriceChange):
+    """
+    Reprice the changed stations of the loaded graph until build_station_graph rewrites the file. The edges
+    stay the ones picked with the old prices, the fuel costs and stops of new plans use the new ones.
+    """
+    with _graph_lock:
+        graph = _graph_cache['graph']
+    if graph is None:
+        return
+
+    stations = FuelStation.objects.filter(retail_price__isnull=False)
+    if change.station_ids is not None:
+        stations = stations.filter(id__in=change.station_ids)
+    with use_primary():  # notified on commit, replicas may lag behind
+        prices = dict(stations.values_list('id', 'retail_price'))
+    repriced = graph.with_prices(prices, change.station_ids)
+
+    with _graph_lock:
+        # Unless the rebuilt graph was loaded meanwhile
+        if _graph_cache['graph'] is graph:
+            _graph_cache['graph'] = repriced
+    logger.info("Repriced the station graph for price version %s.", change.version)
@@ -0,0 +1,60 @@
+from typing import Iterable, NamedTuple
+
+from django.contrib.gis.db.models.functions import GeoFunc
+from django.db.models import FloatField, QuerySet
+
+from ..models import FuelStation
+
+
+class Latitude(GeoFunc):
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+class Longitude(GeoFunc):
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+class Location(NamedTuple):
+    """Longitude/latitude pair read like a GEOS Point."""
+    x: float
+    y: float
+
+
+class StationRecord(NamedTuple):
+    """Plain, picklable stand-in for a FuelStation row, with the fields the route pipeline reads."""
+    id: int
+    name: str
+    address: str
+    city: str
+    state: str
+    latitude: float
+    longitude: float
+    retail_price: float
+
+    @property
+    def location(self) -> Location:
+        return Location(self.longitude, self.latitude)
+
+
+# Columns of a StationRecord, coordinates are read in SQL so no GEOS Point is built per row
+STATION_RECORD_FIELDS = (
+    'id', 'name', 'address', 'city', 'state', 'record_latitude', 'record_longitude', 'retail_price'
+)
+
+
+def station_record_rows(queryset: QuerySet) -> QuerySet:
+    """values_list() of the queryset in StationRecord column order."""
+    return (queryset
+            .annotate(record_latitude=Latitude('location'), record_longitude=Longitude('location'))
+            .values_list(*STATION_RECORD_FIELDS))
+
+
+def station_records(queryset: QuerySet) -> list[StationRecord]:
+    return [StationRecord(*row) for row in station_record_rows(queryset)]
+
+
+def records_by_id(station_ids: Iterable[int]) -> dict[int, StationRecord]:
+    """Records of the given stations in one query, like in_bulk() without model instances."""
+    return {record.id: record for record in station_records(FuelStation.objects.filter(id__in=list(station_ids)))}
@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..models import FuelStation
+from .geo_arrays import haversine_miles
+from .station_records import StationRecord, station_record_rows
+
+
+@dataclass
+class StationSnapshot:
+    """Read-only column arrays of every priced, located fuel station."""
+    ids: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    prices: np.ndarray
+    records: list[StationRecord] | None = None  # only loaded with_details
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_db(cls, with_details: bool = False) -> "StationSnapshot":
+        queryset = (FuelStation.objects
+                    .filter(location__isnull=False, retail_price__isnull=False)
+                    .order_by('id'))
+
+        records = None
+        if with_details:
+            records = [StationRecord(*row) for row in station_record_rows(queryset).iterator()]
+            rows = [(record.id, record.latitude, record.longitude, record.retail_price) for record in records]
+        else:
+            rows = list(station_record_rows(queryset)
+                        .values_list('id', 'record_latitude', 'record_longitude', 'retail_price')
+                        .iterator())
+        ids, latitudes, longitudes, prices = zip(*rows) if rows else ([], [], [], [])
+
+        return cls(
+            ids=np.array(ids, dtype=np.int64),
+            latitudes=np.array(latitudes, dtype=np.float64),
+            longitudes=np.array(longitudes, dtype=np.float64),
+            prices=np.array(prices, dtype=np.float64),
+            records=records,
+        )
+
+    @classmethod
+    def from_records(cls, records: list[StationRecord]) -> "StationSnapshot":
+        """Snapshot of already fetched stations, e.g. the ones along a route."""
+        records = sorted(records, key=lambda record: record.id)
+        return cls(
+            ids=np.array([record.id for record in records], dtype=np.int64),
+            latitudes=np.array([record.latitude for record in records], dtype=np.float64),
+            longitudes=np.array([record.longitude for record in records], dtype=np.float64),
+            prices=np.array([record.retail_price for record in records], dtype=np.float64),
+            records=records,
+        )
+
+    def record(self, station_id: int) -> StationRecord:
+        """Details of a station by id, the ids are sorted."""
+        index = int(np.searchsorted(self.ids, station_id))
+        if index == len(self.ids) or self.ids[index] != station_id:
+            raise KeyError(station_id)
+        return self.records[index]
+
+    def find_next_station(
+        self,
+        latitude: float,
+        longitude: float,
+        max_range_miles: float,
+        candidate_station_ids: list[int] | None = None,
+    ) -> StationRecord | None:
+        """Cheapest station within range, the closest one on a price tie. Same choice as the spatial query."""
+        distances = haversine_miles(latitude, longitude, self.latitudes, self.longitudes)
+        in_range = distances <= max_range_miles
+        if candidate_station_ids is not None:
+            in_range &= np.isin(self.ids, candidate_station_ids)
+
+        candidates = np.flatnonzero(in_range)
+        if len(candidates) == 0:
+            return None
+        best = candidates[np.lexsort((distances[candidates], self.prices[candidates]))[0]]
+        return self.records[best]
@@ -0,0 +1,50 @@
+"""
+Stations are stored with the id of the TILE_DEGREES square tile they fall in. Lookups first narrow the table
+to the tiles their search area touches, so they read about the same number of rows however many stations
+there are elsewhere on the continent.
+"""
+import math
+from typing import Iterable
+
+TILE_DEGREES = 1  # about 69 by 50 miles at US latitudes, changing it needs the tile column recomputed
+TILE_COLUMNS = 360 // TILE_DEGREES
+MILES_PER_DEGREE = 69.05
+
+
+def station_tile(latitude: float, longitude: float) -> int:
+    row = math.floor((latitude + 90) / TILE_DEGREES)
+    column = math.floor((longitude + 180) / TILE_DEGREES) % TILE_COLUMNS
+    return row * TILE_COLUMNS + column
+
+
+def tiles_near(points: Iterable[tuple[float, float]], miles: float) -> list[int]:
+    """Tiles within miles of the polyline through the points, over-approximated by segment bounding boxes."""
+    points = list(points)
+    if not points:
+        return []
+    latitude_margin = miles / MILES_PER_DEGREE
+    # Degrees of longitude shrink towards the poles, pad with the margin of the furthest latitude
+    widest = min(max(abs(latitude) for latitude, _ in points) + latitude_margin, 89)
+    longitude_margin = miles / (MILES_PER_DEGREE * math.cos(math.radians(widest)))
+
+    # Padded tile box of every point, a segment's box spans the boxes of its two ends
+    boxes = [
+        (
+            math.floor((max(latitude - latitude_margin, -90) + 90) / TILE_DEGREES),
+            math.floor((min(latitude + latitude_margin, 90) + 90) / TILE_DEGREES),
+            math.floor((longitude - longitude_margin + 180) / TILE_DEGREES),
+            math.floor((longitude + longitude_margin + 180) / TILE_DEGREES),
+        )
+        for latitude, longitude in points
+    ]
+    segment_boxes = {
+        (min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]))
+        for a, b in zip(boxes, boxes[1:] or boxes)
+    }
+
+    tiles = set()
+    for south, north, west, east in segment_boxes:
+        rows = range(south, north + 1)
+        columns = range(west, min(east, west + TILE_COLUMNS - 1) + 1)
+        tiles.update(row * TILE_COLUMNS + column % TILE_COLUMNS for row in rows for column in columns)
+    return sorted(tiles)
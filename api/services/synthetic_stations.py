@@ -0,0 +1,199 @@
+from typing import Any, Iterator
+
+import numpy as np
+
+from .geo_arrays import haversine_miles
+
+MILES_PER_DEGREE_LATITUDE = 69.05
+
+# Major interstates as (city, state, latitude, longitude) waypoints, where truck stops cluster
+CORRIDORS = {
+    'I-5': [
+        ('San Diego', 'CA', 32.72, -117.16), ('Los Angeles', 'CA', 34.05, -118.24),
+        ('Sacramento', 'CA', 38.58, -121.49), ('Redding', 'CA', 40.59, -122.39),
+        ('Portland', 'OR', 45.52, -122.68), ('Seattle', 'WA', 47.61, -122.33),
+    ],
+    'I-10': [
+        ('Los Angeles', 'CA', 34.05, -118.24), ('Phoenix', 'AZ', 33.45, -112.07),
+        ('Tucson', 'AZ', 32.22, -110.97), ('El Paso', 'TX', 31.76, -106.49),
+        ('San Antonio', 'TX', 29.42, -98.49), ('Houston', 'TX', 29.76, -95.37),
+        ('New Orleans', 'LA', 29.95, -90.07), ('Mobile', 'AL', 30.69, -88.04),
+        ('Tallahassee', 'FL', 30.44, -84.28), ('Jacksonville', 'FL', 30.33, -81.66),
+    ],
+    'I-15': [
+        ('San Diego', 'CA', 32.72, -117.16), ('Las Vegas', 'NV', 36.17, -115.14),
+        ('Salt Lake City', 'UT', 40.76, -111.89), ('Idaho Falls', 'ID', 43.49, -112.04),
+        ('Great Falls', 'MT', 47.50, -111.30),
+    ],
+    'I-20': [
+        ('Pecos', 'TX', 31.42, -103.49), ('Abilene', 'TX', 32.45, -99.73),
+        ('Dallas', 'TX', 32.78, -96.80), ('Shreveport', 'LA', 32.52, -93.75),
+        ('Jackson', 'MS', 32.30, -90.18), ('Birmingham', 'AL', 33.52, -86.80),
+        ('Atlanta', 'GA', 33.75, -84.39),
+    ],
+    'I-35': [
+        ('Laredo', 'TX', 27.53, -99.48), ('San Antonio', 'TX', 29.42, -98.49),
+        ('Austin', 'TX', 30.27, -97.74), ('Dallas', 'TX', 32.78, -96.80),
+        ('Oklahoma City', 'OK', 35.47, -97.52), ('Wichita', 'KS', 37.69, -97.34),
+        ('Kansas City', 'MO', 39.10, -94.58), ('Des Moines', 'IA', 41.59, -93.62),
+        ('Minneapolis', 'MN', 44.98, -93.27), ('Duluth', 'MN', 46.79, -92.10),
+    ],
+    'I-40': [
+        ('Barstow', 'CA', 34.90, -117.02), ('Flagstaff', 'AZ', 35.20, -111.65),
+        ('Albuquerque', 'NM', 35.08, -106.65), ('Amarillo', 'TX', 35.22, -101.83),
+        ('Oklahoma City', 'OK', 35.47, -97.52), ('Memphis', 'TN', 35.15, -90.05),
+        ('Nashville', 'TN', 36.16, -86.78), ('Raleigh', 'NC', 35.78, -78.64),
+        ('Wilmington', 'NC', 34.23, -77.94),
+    ],
+    'I-65': [
+        ('Mobile', 'AL', 30.69, -88.04), ('Montgomery', 'AL', 32.37, -86.30),
+        ('Birmingham', 'AL', 33.52, -86.80), ('Nashville', 'TN', 36.16, -86.78),
+        ('Louisville', 'KY', 38.25, -85.76), ('Indianapolis', 'IN', 39.77, -86.16),
+        ('Gary', 'IN', 41.60, -87.34),
+    ],
+    'I-70': [
+        ('Cove Fort', 'UT', 38.60, -112.58), ('Grand Junction', 'CO', 39.06, -108.55),
+        ('Denver', 'CO', 39.74, -104.99), ('Kansas City', 'MO', 39.10, -94.58),
+        ('St. Louis', 'MO', 38.63, -90.20), ('Indianapolis', 'IN', 39.77, -86.16),
+        ('Columbus', 'OH', 39.96, -83.00), ('Baltimore', 'MD', 39.29, -76.61),
+    ],
+    'I-75': [
+        ('Miami', 'FL', 25.76, -80.19), ('Tampa', 'FL', 27.95, -82.46),
+        ('Atlanta', 'GA', 33.75, -84.39), ('Chattanooga', 'TN', 35.05, -85.31),
+        ('Knoxville', 'TN', 35.96, -83.92), ('Lexington', 'KY', 38.04, -84.50),
+        ('Cincinnati', 'OH', 39.10, -84.51), ('Detroit', 'MI', 42.33, -83.05),
+    ],
+    'I-80': [
+        ('San Francisco', 'CA', 37.77, -122.42), ('Reno', 'NV', 39.53, -119.81),
+        ('Salt Lake City', 'UT', 40.76, -111.89), ('Cheyenne', 'WY', 41.14, -104.82),
+        ('Omaha', 'NE', 41.26, -95.93), ('Des Moines', 'IA', 41.59, -93.62),
+        ('Gary', 'IN', 41.60, -87.34), ('Toledo', 'OH', 41.65, -83.54),
+        ('Cleveland', 'OH', 41.50, -81.69), ('New York', 'NY', 40.71, -74.01),
+    ],
+    'I-90': [
+        ('Seattle', 'WA', 47.61, -122.33), ('Spokane', 'WA', 47.66, -117.43),
+        ('Missoula', 'MT', 46.87, -113.99), ('Billings', 'MT', 45.78, -108.50),
+        ('Rapid City', 'SD', 44.08, -103.23), ('Sioux Falls', 'SD', 43.54, -96.73),
+        ('Madison', 'WI', 43.07, -89.40), ('Chicago', 'IL', 41.88, -87.63),
+        ('Cleveland', 'OH', 41.50, -81.69), ('Buffalo', 'NY', 42.89, -78.88),
+        ('Albany', 'NY', 42.65, -73.76), ('Boston', 'MA', 42.36, -71.06),
+    ],
+    'I-95': [
+        ('Miami', 'FL', 25.76, -80.19), ('Jacksonville', 'FL', 30.33, -81.66),
+        ('Savannah', 'GA', 32.08, -81.09), ('Fayetteville', 'NC', 35.05, -78.88),
+        ('Richmond', 'VA', 37.54, -77.44), ('Washington', 'DC', 38.91, -77.04),
+        ('Baltimore', 'MD', 39.29, -76.61), ('Philadelphia', 'PA', 39.95, -75.16),
+        ('New York', 'NY', 40.71, -74.01), ('Boston', 'MA', 42.36, -71.06),
+    ],
+}
+
+# "City, ST" -> (latitude, longitude) of every waypoint, e.g. for a FakeGeocodingService
+CITY_LOCATIONS = {
+    f"{city}, {state}": (lat, lon)
+    for waypoints in CORRIDORS.values()
+    for city, state, lat, lon in waypoints
+}
+
+BRANDS = [
+    'PILOT TRAVEL CENTER', 'LOVES TRAVEL STOP', 'FLYING J TRAVEL PLAZA', 'TA TRAVEL CENTER',
+    'PETRO STOPPING CENTER', 'KWIK TRIP', 'CASEYS GENERAL STORE', 'SHELL', 'CIRCLE K', 'SPEEDWAY',
+]
+
+
+def _segments() -> list[tuple[str, tuple, tuple]]:
+    return [
+        (name, start, end)
+        for name, waypoints in CORRIDORS.items()
+        for start, end in zip(waypoints, waypoints[1:])
+    ]
+
+
+def sample_corridor_points(
+    count: int,
+    rng: np.random.Generator,
+    spread_miles: float = 0.5,
+    exit_spacing_miles: float = 12.0,
+) -> dict[str, np.ndarray]:
+    """
+    Points along the corridors, proportionally to segment length. Positions snap to exits
+    every exit_spacing_miles, then scatter by spread_miles, so points clump like truck stops do.
+    """
+    segments = _segments()
+    starts = np.array([[start[2], start[3]] for _, start, _ in segments])
+    ends = np.array([[end[2], end[3]] for _, _, end in segments])
+    lengths = haversine_miles(starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1])
+    # Miles from the start of the interstate to the start of each segment, for exit numbers
+    corridor_miles = np.zeros(len(segments))
+    for i in range(1, len(segments)):
+        if segments[i][0] == segments[i - 1][0]:
+            corridor_miles[i] = corridor_miles[i - 1] + lengths[i - 1]
+
+    segment = rng.choice(len(segments), size=count, p=lengths / lengths.sum())
+    exit_number = np.round(rng.uniform(0, 1, count) * lengths[segment] / exit_spacing_miles)
+    fraction = np.clip(exit_number * exit_spacing_miles / lengths[segment], 0, 1)
+
+    latitudes = starts[segment, 0] + fraction * (ends[segment, 0] - starts[segment, 0])
+    longitudes = starts[segment, 1] + fraction * (ends[segment, 1] - starts[segment, 1])
+    latitudes += rng.normal(0, spread_miles, count) / MILES_PER_DEGREE_LATITUDE
+    longitudes += rng.normal(0, spread_miles, count) / (
+        MILES_PER_DEGREE_LATITUDE * np.cos(np.radians(latitudes)))
+
+    return {
+        'segment': segment,
+        'exit_number': (exit_number + np.round(corridor_miles[segment] / exit_spacing_miles)).astype(np.int64),
+        'nearest_end': fraction >= 0.5,
+        'latitudes': latitudes,
+        'longitudes': longitudes,
+    }
+
+
+def generate_stations(count: int, seed: int = 0, off_corridor_share: float = 0.1) -> Iterator[dict[str, Any]]:
+    """
+    Synthetic fuel stations with locations, clustered at interstate exits. A share of them sits
+    in towns off the corridors. Prices follow a west/east gradient, higher on the west coast.
+    """
+    rng = np.random.default_rng(seed)
+    segments = _segments()
+    points = sample_corridor_points(count, rng)
+
+    # Move some stations up to ~40 miles off the corridor
+    off_corridor = rng.uniform(0, 1, count) < off_corridor_share
+    offsets = rng.normal(0, 20, (count, 2)) * off_corridor[:, None]
+    latitudes = points['latitudes'] + offsets[:, 0] / MILES_PER_DEGREE_LATITUDE
+    longitudes = points['longitudes'] + offsets[:, 1] / (MILES_PER_DEGREE_LATITUDE * np.cos(np.radians(latitudes)))
+
+    prices = 3.05 + 0.9 * np.exp(-((longitudes + 121) / 4) ** 2) + rng.normal(0, 0.18, count)
+    prices = np.round(np.clip(prices, 2.55, 5.5), 3)
+    brands = rng.integers(0, len(BRANDS), count)
+    rack_ids = rng.integers(100, 1000, count)
+
+    for i in range(count):
+        name, start, end = segments[points['segment'][i]]
+        city, state = (end if points['nearest_end'][i] else start)[:2]
+        yield {
+            'truckstop_id': f"SYN{i:07d}",
+            'name': f"{BRANDS[brands[i]]} #{i + 1}",
+            'address': f"{name}, EXIT {points['exit_number'][i]}",
+            'city': city,
+            'state': state,
+            'rack_id': str(rack_ids[i]),
+            'retail_price': float(prices[i]),
+            'latitude': float(latitudes[i]),
+            'longitude': float(longitudes[i]),
+        }
+
+
+def generate_lanes(count: int, seed: int = 0) -> list[dict[str, str]]:
+    """Lanes between two cities of the same corridor, the way trucks run them."""
+    rng = np.random.default_rng(seed)
+    corridors = list(CORRIDORS.values())
+    lanes = []
+    for i in range(count):
+        waypoints = corridors[rng.integers(len(corridors))]
+        start, end = rng.choice(len(waypoints), size=2, replace=False)
+        lanes.append({
+            'id': f"lane-{i + 1}",
+            'start_location': f"{waypoints[start][0]}, {waypoints[start][1]}",
+            'end_location': f"{waypoints[end][0]}, {waypoints[end][1]}",
+        })
+    return lanes
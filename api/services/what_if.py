@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .geo_arrays import haversine_miles
+from .station_snapshot import StationSnapshot
+
+
+@dataclass
+class ScenarioPlans:
+    """Greedy plans of one route for many vehicles, one entry per scenario."""
+    max_range_miles: np.ndarray
+    mpg: np.ndarray
+    start_fuel_range: np.ndarray
+    stops: np.ndarray  # number of fuel stops
+    total_fuel_cost: np.ndarray  # NaN where the vehicle gets stuck without fuel
+
+    def __len__(self) -> int:
+        return len(self.stops)
+
+    def as_lists(self, shape: tuple[int, ...]) -> dict[str, list]:
+        """Costs and stops as nested lists of the given shape, None for the vehicles that get stuck."""
+        total_fuel_cost = self.total_fuel_cost.astype(object)
+        total_fuel_cost[np.isnan(self.total_fuel_cost)] = None
+        return {
+            'total_fuel_cost': total_fuel_cost.reshape(shape).tolist(),
+            'stops': self.stops.reshape(shape).tolist(),
+        }
+
+
+def scenario_grid(
+    max_range_miles: list[float],
+    mpg: list[float],
+    fuel_levels: list[float],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Every combination of the values, flattened in (max_range_miles, mpg, fuel_level) order."""
+    ranges, mpgs, levels = np.meshgrid(
+        np.asarray(max_range_miles, dtype=np.float64),
+        np.asarray(mpg, dtype=np.float64),
+        np.asarray(fuel_levels, dtype=np.float64),
+        indexing='ij',
+    )
+    return ranges.ravel(), mpgs.ravel(), levels.ravel()
+
+
+def plan_scenarios(
+    route_points: list[tuple[float, float]],
+    total_distance: float,
+    stations: StationSnapshot,
+    max_range_miles: np.ndarray,
+    mpg: np.ndarray,
+    start_fuel_range: np.ndarray,
+) -> ScenarioPlans:
+    """
+    The stops GreedyRouteOptimizer would make with each vehicle, all vehicles at once. Instead of
+    stepping point by point, every scenario jumps to the last route point its fuel reaches, so a pass
+    over the scenarios is made per fuel stop rather than per route point. Costs are the ones of
+    StandardFuelCostCalculator: a full tank at the price of every stop.
+    """
+    max_range_miles = np.asarray(max_range_miles, dtype=np.float64)
+    mpg = np.asarray(mpg, dtype=np.float64)
+    fuel_range = np.array(start_fuel_range, dtype=np.float64)
+    count = len(max_range_miles)
+
+    route = np.asarray(route_points, dtype=np.float64).reshape(-1, 2)
+    latitudes, longitudes = route[:, 0], route[:, 1]
+    # Straight line distance along the route up to every point
+    along = np.concatenate([[0.0], np.cumsum(
+        haversine_miles(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:]))])
+    last = len(route) - 1
+
+    index = np.zeros(count, dtype=np.int64)  # last route point passed
+    current_latitude = np.full(count, latitudes[0])
+    current_longitude = np.full(count, longitudes[0])
+    stops = np.zeros(count, dtype=np.int64)
+    price_sum = np.zeros(count)
+    stuck = np.zeros(count, dtype=bool)
+    # Enough fuel for the whole trip, no stops
+    active = (total_distance > fuel_range) & (last > 0)
+
+    while active.any():
+        scenarios = np.flatnonzero(active)
+        to_next = haversine_miles(
+            current_latitude[scenarios], current_longitude[scenarios],
+            latitudes[index[scenarios] + 1], longitudes[index[scenarios] + 1])
+        reaches = to_next <= fuel_range[scenarios]
+
+        # Drive to the next route point and on to the last one the fuel left reaches
+        driving = scenarios[reaches]
+        if len(driving):
+            fuel_range[driving] -= to_next[reaches]
+            start = index[driving] + 1
+            end = np.searchsorted(along, along[start] + fuel_range[driving], side='right') - 1
+            end = np.clip(end, start, last)
+            fuel_range[driving] -= along[end] - along[start]
+            index[driving] = end
+            current_latitude[driving], current_longitude[driving] = latitudes[end], longitudes[end]
+            active[driving[end == last]] = False
+
+        # Out of fuel before the next route point: the cheapest station in range, the closest on a price tie
+        refueling = scenarios[~reaches]
+        if len(refueling):
+            distances = haversine_miles(
+                current_latitude[refueling, None], current_longitude[refueling, None],
+                stations.latitudes[None, :], stations.longitudes[None, :])
+            in_range = distances <= fuel_range[refueling, None]
+            prices = np.where(in_range, stations.prices[None, :], np.inf)
+            cheapest = prices.min(axis=1, initial=np.inf)
+            ties = np.where(in_range & (prices == cheapest[:, None]), distances, np.inf)
+            chosen = ties.argmin(axis=1) if len(stations) else np.zeros(len(refueling), dtype=np.int64)
+
+            found = np.isfinite(cheapest)
+            stuck[refueling[~found]] = True
+            active[refueling[~found]] = False
+            refueling, chosen = refueling[found], chosen[found]
+
+            stops[refueling] += 1
+            price_sum[refueling] += stations.prices[chosen]
+            fuel_range[refueling] = max_range_miles[refueling]
+            current_latitude[refueling] = stations.latitudes[chosen]
+            current_longitude[refueling] = stations.longitudes[chosen]
+
+            # A full tank doesn't reach the next route point from the station either
+            beyond_reach = haversine_miles(
+                current_latitude[refueling], current_longitude[refueling],
+                latitudes[index[refueling] + 1], longitudes[index[refueling] + 1]) > fuel_range[refueling]
+            stuck[refueling[beyond_reach]] = True
+            active[refueling[beyond_reach]] = False
+
+    total_fuel_cost = np.round(max_range_miles / mpg * price_sum, 5)
+    total_fuel_cost[stuck] = np.nan
+    return ScenarioPlans(
+        max_range_miles=max_range_miles,
+        mpg=mpg,
+        start_fuel_range=np.asarray(start_fuel_range, dtype=np.float64),
+        stops=stops,
+        total_fuel_cost=total_fuel_cost,
+    )
@@ -0,0 +1,114 @@
+"""
+Query and provider call budgets for tests of the route pipeline.
+
+CallRecorder records the SQL executed and the provider calls made while it is active. Provider
+calls are the ones let through the quota manager, named '<provider>.<kind>' like 'google.directions'
+(the FakeGeocodingService reports 'fake.directions'), and budgets count them by kind.
+
+This module is also a pytest plugin (enabled in the root conftest.py), providing
+
+- a `budget` marker, the test body must stay within it:
+
+    @pytest.mark.budget(queries=2, directions=1)
+    def test_plan(...):
+
+- a `call_budget` fixture for a budget around part of a test:
+
+    with call_budget(queries=2, directions=1) as recorder:
+        planner.plan('New York, NY', 'Boston, MA')
+"""
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Any
+
+import pytest
+
+from .profiling import QueryRecorder
+from .services.provider_quota import provider_call_listener
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+class CallRecorder:
+    """Record the SQL queries of the current thread and the provider calls of the current context."""
+
+    def __init__(self):
+        self.provider_calls: list[dict[str, str]] = []
+        self._query_recorder = QueryRecorder()
+        self._lock = threading.Lock()  # hedged requests call providers from worker threads
+        self._stack = None
+
+    @property
+    def queries(self) -> list[dict[str, Any]]:
+        return self._query_recorder.queries
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self._stack.enter_context(self._query_recorder)
+        self._stack.enter_context(provider_call_listener(self._record_call))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record_call(self, endpoint: str, priority: str):
+        with self._lock:
+            self.provider_calls.append({'endpoint': endpoint, 'priority': priority})
+
+    def calls(self, kind: str | None = None) -> int:
+        """Provider calls of a kind ('directions', 'geocode', ...) or to an endpoint ('google.directions')."""
+        return sum(
+            1 for call in self.provider_calls
+            if kind is None or kind in (call['endpoint'], call['endpoint'].rpartition('.')[2])
+        )
+
+    def check(self, queries: int | None = None, **calls: int):
+        """Raise BudgetExceeded when more queries or provider calls of a kind were made than allowed."""
+        exceeded = []
+        if queries is not None and len(self.queries) > queries:
+            exceeded.append(f"{len(self.queries)} queries (budget {queries})")
+        for kind, limit in calls.items():
+            if self.calls(kind) > limit:
+                exceeded.append(f"{self.calls(kind)} {kind} calls (budget {limit})")
+        if exceeded:
+            raise BudgetExceeded(f"Budget exceeded: {', '.join(exceeded)}\n{self.report()}")
+
+    def report(self) -> str:
+        endpoints = Counter(call['endpoint'] for call in self.provider_calls)
+        lines = [f"Provider calls: {dict(endpoints) or 'none'}", f"Queries ({len(self.queries)}):"]
+        lines += [f"  {i}. {query['sql']}" for i, query in enumerate(self.queries, start=1)]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def call_budget(queries: int | None = None, **calls: int):
+    """Record the block and check it stayed within the budget."""
+    with CallRecorder() as recorder:
+        yield recorder
+    recorder.check(queries, **calls)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'budget(queries=None, **calls): maximum SQL queries and provider calls by kind of the test body')
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker('budget')
+    if marker is None:
+        return (yield)
+
+    # Only the test body is recorded, fixtures are set up and torn down outside of it
+    with CallRecorder() as recorder:
+        result = yield
+    recorder.check(**marker.kwargs)
+    return result
+
+
+@pytest.fixture(name='call_budget')
+def call_budget_fixture():
+    return call_budget
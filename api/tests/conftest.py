@@ -3,6 +3,7 @@ from decimal import Decimal
 from django.conf import settings
 from api.models import FuelStation
 from api.services import (
+    FakeGeocodingService,
     OpenRouteGeocodingService,
     SpotterFuelStationRepository,
     GreedyRouteOptimizer,
@@ -78,3 +79,18 @@ def route_optimizer(station_repository):
 @pytest.fixture
 def cost_calculator():
     return StandardFuelCostCalculator()
+
+
+@pytest.fixture
+def patch_route_planner(mocker, settings):
+    """
+    Views route through FakeGeocodingService and plot no maps. Returns a function replacing a RoutePlanner
+    method with a mock returning return_value.
+    """
+    settings.MAP_PLOTTER = ''
+    mocker.patch('api.views.get_routing_service', return_value=FakeGeocodingService())
+
+    def patch(method: str, return_value):
+        return mocker.patch(f'api.services.route_planner.RoutePlanner.{method}', return_value=return_value)
+
+    return patch
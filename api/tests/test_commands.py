@@ -1,8 +1,15 @@
+import json
 import pytest
 from unittest.mock import patch, mock_open
 from io import StringIO
-from api.models import FuelStation
+from api.models import FuelStation, PlanJob, RoutePlan
+from api.services import FakeGeocodingService
+from api.services.price_events import subscribe, unsubscribe
+from api.services.station_graph import StationGraph
+from datetime import timedelta
+from django.contrib.gis.geos import LineString, Point
 from django.core.management import call_command
+from django.utils import timezone
 
 
 @pytest.fixture
@@ -31,7 +38,8 @@ TEST002,Station (Main),456 Test Ave.,Test Town,TS,3.60,RACK002
 
 @pytest.mark.django_db
 class TestLoadFuelPricesCommand:
-    def test_load_fuel_prices_success(self, sample_csv_data):
+    def test_load_fuel_prices_success(self, sample_csv_data, settings, tmp_path):
+        settings.STATION_GRAPH_FILE = tmp_path / 'graph.npz'
         # Mock the file open and geocoding service
         with patch('builtins.open', mock_open(read_data=sample_csv_data)), \
                 patch('api.services.GoogleMapsGeocodingService.get_coordinates') as mock_geocoding:
@@ -51,3 +59,137 @@ class TestLoadFuelPricesCommand:
             assert station1.retail_price == 3.50
             assert station1.location.y == 10.0
             assert station1.location.x == 20.0
+
+        assert not (tmp_path / 'graph.npz').exists()  # the greedy optimizer doesn't read it
+
+    def test_load_fuel_prices_builds_graph_for_graph_optimizer(self, sample_csv_data, settings, tmp_path):
+        settings.ROUTE_OPTIMIZER = 'graph'
+        settings.STATION_GRAPH_FILE = tmp_path / 'graph.npz'
+
+        with patch('builtins.open', mock_open(read_data=sample_csv_data)), \
+                patch('api.services.GoogleMapsGeocodingService.get_coordinates', return_value=(10.0, 20.0)):
+            call_command('load_fuel_prices', 'dummy.csv', stdout=StringIO())
+
+        assert len(StationGraph.load(tmp_path / 'graph.npz')) == 2
+
+    def test_load_fuel_prices_notifies_changed_stations(self, sample_csv_data):
+        changes = []
+        subscribe(changes.append)
+        try:
+            with patch('api.services.GoogleMapsGeocodingService.get_coordinates', return_value=(10.0, 20.0)):
+                with patch('builtins.open', mock_open(read_data=sample_csv_data)):
+                    call_command('load_fuel_prices', 'dummy.csv', '--skip-graph', stdout=StringIO())
+                with patch('builtins.open', mock_open(read_data=sample_csv_data.replace('3.60', '3.65'))):
+                    call_command('load_fuel_prices', 'dummy.csv', '--skip-graph', stdout=StringIO())
+        finally:
+            unsubscribe(changes.append)
+
+        assert changes[0].station_ids == set(FuelStation.objects.values_list('id', flat=True))
+        assert changes[1].station_ids == {FuelStation.objects.get(truckstop_id='TEST002').id}
+        assert changes[1].version > changes[0].version
+
+
+@pytest.mark.django_db
+class TestBuildStationGraphCommand:
+    def test_build_station_graph(self, tmp_path):
+        FuelStation.objects.create(name='East', location=Point(-75.0, 40.0, srid=4326), retail_price=3.5)
+        FuelStation.objects.create(name='West', location=Point(-77.0, 40.0, srid=4326), retail_price=3.2)
+        FuelStation.objects.create(name='Unpriced', location=Point(-76.0, 40.0, srid=4326))
+
+        out = StringIO()
+        call_command('build_station_graph', '--output', str(tmp_path / 'graph.npz'), stdout=out)
+
+        graph = StationGraph.load(tmp_path / 'graph.npz')
+        assert len(graph) == 2
+        assert graph.edge_count == 2
+        assert 'Station graph with 2 stations' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestPruneRoutePlansCommand:
+    def test_prune_route_plans(self):
+        route = LineString((-74.0, 40.7), (-75.2, 39.9), srid=4326)
+        for start_location in ('Old', 'New'):
+            RoutePlan.objects.create(start_location=start_location, end_location='Philadelphia', route=route,
+                                     total_distance=95, max_range_miles=500, mpg=10)
+        RoutePlan.objects.filter(start_location='Old').update(created_at=timezone.now() - timedelta(days=40))
+
+        out = StringIO()
+        call_command('prune_route_plans', '--days', '30', stdout=out)
+
+        assert list(RoutePlan.objects.values_list('start_location', flat=True)) == ['New']
+        assert 'Deleted 1 route plans' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestPlanLanesCommand:
+    def test_plan_lanes(self, tmp_path, mocker):
+        FuelStation.objects.create(name='East', location=Point(-75.0, 40.0, srid=4326), retail_price=3.5)
+        geocoding_service = FakeGeocodingService(locations={
+            'Philadelphia, PA': (39.95, -75.16),
+            'Pittsburgh, PA': (40.44, -79.99),
+        })
+        get_route = geocoding_service.get_route
+
+        def route_or_fail(start, end):
+            if start == 'Nowhere':
+                raise Exception("No route found")
+            return get_route(start, end)
+
+        mocker.patch.object(geocoding_service, 'get_route', side_effect=route_or_fail)
+        mocker.patch('api.services.lane_planner.build_routing_service', return_value=geocoding_service)
+        lanes_file = tmp_path / 'lanes.jsonl'
+        lanes_file.write_text(
+            '{"id": "phl-pit", "start_location": "Philadelphia, PA", "end_location": "Pittsburgh, PA"}\n'
+            '{"start_location": "Nowhere", "end_location": "Pittsburgh, PA"}\n'
+        )
+
+        out, err = StringIO(), StringIO()
+        call_command('plan_lanes', str(lanes_file), str(tmp_path / 'plans.jsonl'), '--processes', '1',
+                     '--optimizer', 'greedy', stdout=out, stderr=err)
+
+        rows = [json.loads(line) for line in (tmp_path / 'plans.jsonl').read_text().splitlines()]
+        assert [row['id'] for row in rows] == ['phl-pit', '2']
+        assert rows[0]['error'] is None
+        assert rows[0]['stops'] == []
+        assert rows[0]['total_distance'] > 0
+        assert rows[1]['error'] == 'No route found'
+        assert 'Planned 2/2 lanes (1 failed)' in out.getvalue()
+        assert 'Lane 2 failed: No route found' in err.getvalue()
+
+
+@pytest.mark.django_db
+class TestGenerateSyntheticStationsCommand:
+    def test_generate_synthetic_stations(self, tmp_path):
+        FuelStation.objects.create(name='Real', location=Point(-75.0, 40.0, srid=4326), retail_price=3.5)
+        lanes_file = tmp_path / 'lanes.jsonl'
+
+        out = StringIO()
+        call_command('generate_synthetic_stations', '--stations', '50', '--lanes', '3',
+                     '--lanes-output', str(lanes_file), '--skip-graph', stdout=out)
+        call_command('generate_synthetic_stations', '--stations', '20', '--replace', '--skip-graph', stdout=out)
+
+        assert FuelStation.objects.count() == 21  # the real station is kept
+        assert FuelStation.objects.filter(truckstop_id__startswith='SYN', location__isnull=False).count() == 20
+        assert len(lanes_file.read_text().splitlines()) == 3
+
+
+@pytest.mark.django_db
+class TestRunPlanWorkersCommand:
+    def test_drain(self, mocker, settings):
+        settings.ROUTE_PLAN_PERSIST = False
+        mocker.patch('api.services.plan_jobs.build_routing_service', return_value=FakeGeocodingService(locations={
+            'Times Square, NY': (40.7580, -73.9855),
+            'Wall Street, NY': (40.7060, -74.0088),
+        }))
+        job = PlanJob.objects.create(
+            start_location='Times Square, NY', end_location='Wall Street, NY', optimizer='greedy',
+            max_range_miles=500, mpg=10)
+
+        call_command('run_plan_workers', '--processes', '1', '--drain', stdout=StringIO())
+
+        job.refresh_from_db()
+        assert job.status == PlanJob.SUCCEEDED
+        assert job.attempts == 1
+        assert job.result['total_fuel_cost'] == '0.00000'
+        assert job.result['route_points'][0] == {'latitude': 40.758, 'longitude': -73.9855}
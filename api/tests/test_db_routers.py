@@ -0,0 +1,118 @@
+import pytest
+from unittest.mock import Mock
+from django.db import OperationalError
+
+from api import db_routers
+from api.db_routers import (
+    ReplicaRouter,
+    check_connection,
+    check_connections,
+    healthy_replicas,
+    mark_replica_down,
+    pinned_replica,
+    use_primary,
+)
+from api.models import FuelStation, PlanJob
+
+
+@pytest.fixture(autouse=True)
+def replicas(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ['replica_1', 'replica_2']
+    settings.DATABASE_REPLICA_RETRY_SECONDS = 30
+    settings.DATABASE_HEALTH_CHECK_INTERVAL = 10
+    monkeypatch.setattr(db_routers, '_down_until', {})
+    return settings.DATABASE_REPLICAS
+
+
+def connection(usable=True, error=None, close_at=None):
+    return Mock(
+        connection=object(),
+        in_atomic_block=False,
+        close_at=close_at,
+        health_checked_at=None,
+        is_usable=Mock(return_value=usable),
+        ensure_connection=Mock(side_effect=error),
+    )
+
+
+class TestReplicaRouter:
+    def test_station_reads_of_the_route_pipeline_go_to_a_replica(self, replicas):
+        router = ReplicaRouter()
+
+        with pinned_replica():
+            assert router.db_for_read(FuelStation) in replicas
+            assert router.db_for_read(PlanJob) is None
+        assert router.db_for_write(FuelStation) == 'default'
+
+    def test_other_station_reads_go_to_the_primary(self):
+        # Admin pages, commands and the reads right after a load
+        assert ReplicaRouter().db_for_read(FuelStation) is None
+
+    def test_use_primary(self):
+        router = ReplicaRouter()
+
+        with pinned_replica():
+            with use_primary():
+                assert router.db_for_read(FuelStation) is None
+            assert router.db_for_read(FuelStation) is not None
+
+    def test_replicas_down_are_skipped(self):
+        router = ReplicaRouter()
+
+        with pinned_replica():
+            mark_replica_down('replica_1')
+            assert {router.db_for_read(FuelStation) for _ in range(20)} == {'replica_2'}
+
+            mark_replica_down('replica_2')
+            assert router.db_for_read(FuelStation) is None  # the primary then
+
+    def test_pinned_replica(self):
+        router = ReplicaRouter()
+
+        with pinned_replica():
+            assert len({router.db_for_read(FuelStation) for _ in range(20)}) == 1
+
+    def test_migrations_only_run_on_the_primary(self):
+        assert ReplicaRouter().allow_migrate('default', 'api')
+        assert not ReplicaRouter().allow_migrate('replica_1', 'api')
+
+
+class TestCheckConnections:
+    def test_closes_broken_connections(self, mocker):
+        default, replica = connection(usable=False), connection()
+        mocker.patch('api.db_routers.connections', {'default': default, 'replica_1': replica, 'replica_2': replica})
+
+        check_connections()
+
+        default.close.assert_called_once()
+        replica.close.assert_not_called()
+
+    def test_checked_connections_are_trusted_for_a_while(self, settings):
+        checked = connection()
+
+        check_connection(checked)
+        check_connection(checked)
+        assert checked.is_usable.call_count == 1
+
+        settings.DATABASE_HEALTH_CHECK_INTERVAL = 0
+        check_connection(checked)
+        assert checked.is_usable.call_count == 2
+
+    def test_closes_connections_past_their_max_age(self):
+        expired = connection(close_at=0.0)
+
+        check_connection(expired)
+
+        expired.close.assert_called_once()
+        expired.is_usable.assert_not_called()
+
+    def test_unreachable_replica_is_marked_down(self, mocker):
+        mocker.patch('api.db_routers.connections', {
+            'default': connection(),
+            'replica_1': connection(error=OperationalError("could not connect")),
+            'replica_2': connection(),
+        })
+
+        check_connections()
+
+        assert healthy_replicas() == ['replica_2']
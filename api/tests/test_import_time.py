@@ -0,0 +1,13 @@
+import os
+import pytest
+
+from benchmarks.import_time import SCENARIOS, benchmark
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_cold_start_within_budget(scenario):
+    result = benchmark(scenario, repeat=3, budget_scale=float(os.environ.get('IMPORT_TIME_BUDGET_SCALE', 1)))
+
+    assert result['eager_heavy_modules'] == []
+    assert result['wall_ms'] <= result['budget_ms'], result['slowest']
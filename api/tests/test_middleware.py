@@ -0,0 +1,76 @@
+import json
+import time
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from api.middleware import PROFILE_HEADER, RouteProfilingMiddleware
+from api.profiling import SamplingProfiler
+
+
+@pytest.fixture
+def profiling_settings(settings, tmp_path):
+    settings.ROUTE_PROFILING_ENABLED = True
+    settings.ROUTE_PROFILING_SAMPLE_RATE = 0
+    settings.ROUTE_PROFILING_INTERVAL = 0.001
+    settings.ROUTE_PROFILING_DIR = tmp_path
+    return settings
+
+
+def slow_view(request):
+    time.sleep(0.05)
+    return HttpResponse("ok")
+
+
+def route_request(**headers):
+    return RequestFactory().post(
+        reverse('optimize-route'),
+        data=json.dumps({'start_location': 'New York, NY', 'end_location': 'Boston, MA'}),
+        content_type='application/json',
+        **headers,
+    )
+
+
+class TestRouteProfilingMiddleware:
+    def test_header_triggers_profile(self, profiling_settings, tmp_path):
+        middleware = RouteProfilingMiddleware(slow_view)
+
+        response = middleware(route_request(HTTP_X_PROFILE_ROUTE='1'))
+
+        assert response.status_code == 200
+        profile_file = next(tmp_path.glob('*_new-york-ny-to-boston-ma.speedscope.json'))
+        profile = json.loads(profile_file.read_text())
+        assert profile['profiles'][0]['type'] == 'sampled'
+        assert profile['profiles'][0]['samples']
+        sql = json.loads(next(tmp_path.glob('*.sql.json')).read_text())
+        assert sql['status_code'] == 200
+        assert sql['query_count'] == 0
+
+    def test_unsampled_request_is_not_profiled(self, profiling_settings, tmp_path):
+        RouteProfilingMiddleware(slow_view)(route_request())
+
+        assert not list(tmp_path.iterdir())
+
+    def test_disabled_ignores_header(self, profiling_settings, tmp_path):
+        profiling_settings.ROUTE_PROFILING_ENABLED = False
+
+        RouteProfilingMiddleware(slow_view)(route_request(**{f"HTTP_{PROFILE_HEADER.upper().replace('-', '_')}": '1'}))
+
+        assert not list(tmp_path.iterdir())
+
+
+class TestSamplingProfiler:
+    def test_samples_profiled_thread(self):
+        def busy_loop():
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                pass
+
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy_loop()
+
+        names = {frame['name'] for frame in profiler.frames}
+        assert 'busy_loop' in names
+        assert len(profiler.samples) == len(profiler.weights)
+        assert profiler.duration >= 0.05
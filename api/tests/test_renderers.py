@@ -0,0 +1,75 @@
+import json
+import msgpack
+import pytest
+from decimal import Decimal
+
+from api.renderers import (
+    EncodedPolylineRenderer,
+    GeoJSONRenderer,
+    MessagePackRenderer,
+    compact_route_plan,
+)
+from api.services.route_geometry import decode_polyline, encode_polyline
+
+
+@pytest.fixture
+def route_plan():
+    return {
+        'total_distance': 2788.89172,
+        'total_fuel_cost': Decimal('862.32532'),
+        'route': [
+            {'latitude': 40.7130598, 'longitude': -74.0072308},
+            {'latitude': 40.7130598, 'longitude': -74.0072308},
+            {
+                'latitude': 42.5617566,
+                'longitude': -79.1192977,
+                'name': 'NATIVE PRIDE',
+                'address': 'I-90, EXIT 58 & US-20',
+                'city': 'Irving',
+                'state': 'NY',
+                'price': 2.899,
+            },
+            {'latitude': 41.5847011, 'longitude': -87.2353198},
+        ],
+    }
+
+
+class TestEncodedPolyline:
+    def test_matches_reference_encoding(self):
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+        assert encode_polyline(points) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+        assert decode_polyline(encode_polyline(points)) == points
+
+
+class TestRoutePlanRenderers:
+    def test_compact_route_plan(self, route_plan):
+        plan = compact_route_plan(route_plan)
+
+        assert len(plan['route']) == 3  # repeated point dropped
+        assert plan['total_fuel_cost'] == 862.32532
+        assert [stop['name'] for stop in plan['stops']] == ['NATIVE PRIDE']
+
+    def test_geojson(self, route_plan):
+        collection = json.loads(GeoJSONRenderer().render(compact_route_plan(route_plan)))
+
+        line, stop = collection['features']
+        assert line['geometry']['type'] == 'LineString'
+        assert line['geometry']['coordinates'][0] == [-74.007231, 40.71306]
+        assert stop['geometry'] == {'type': 'Point', 'coordinates': [-79.119298, 42.561757]}
+        assert stop['properties']['price'] == 2.899
+
+    def test_polyline(self, route_plan):
+        body = json.loads(EncodedPolylineRenderer().render(compact_route_plan(route_plan)))
+
+        assert len(decode_polyline(body['polyline'])) == 3
+        assert body['stops'][0]['city'] == 'Irving'
+
+    def test_msgpack(self, route_plan):
+        body = msgpack.unpackb(MessagePackRenderer().render(compact_route_plan(route_plan)))
+
+        assert len(body['route']) == 6
+        assert body['route'][0] == pytest.approx(40.7130598, abs=1e-5)
+        assert body['total_distance'] == 2788.89172
+        assert body['total_fuel_cost'] == 862.32532  # only the route is in single precision
+        assert body['stops'][0]['price'] == 2.899
@@ -1,16 +1,47 @@
+import numpy as np
 import pytest
+import threading
+import time
 from decimal import Decimal
 from unittest.mock import Mock
 from django.contrib.gis.geos import Point
+from django.core.cache import cache
 
-from api.models import FuelStation
+from api.models import FuelStation, PlanJob, RoutePlan
 from api.services import (
     GoogleMapsGeocodingService,
+    OpenRouteGeocodingService,
     SpotterFuelStationRepository,
     GreedyRouteOptimizer,
+    GraphRouteOptimizer,
     StandardFuelCostCalculator,
-    FoliumMapPlotter
+    FoliumMapPlotter,
+    FakeGeocodingService,
+    HedgedRoutingService,
+    get_price_version,
+    publish_price_snapshot,
 )
+from api.services import price_snapshot
+from api.services.alternative_plans import k_best_plans
+from benchmarks.fake_provider import FakeProvider, start_fake_provider
+from api.services.hedged_routing_service import CircuitBreaker, RoutingProviderUnavailable
+from api.services.plan_jobs import PlanJobQueue
+from api.services.price_events import MAX_PAYLOAD_BYTES, PriceChange, dispatch, subscribe, unsubscribe
+from api.services.provider_quota import QuotaExceeded, QuotaManager, bulk_priority
+from api.services.route_coalescer import RouteRequestCoalescer, SingleFlight, route_key
+from api.services.route_plan_store import RoutePlanStore, mark_stale_plans
+from api.services.route_planner import RoutePlanner
+from api.services.route_reuse import RouteReuse
+from api.services.route_geometry import (
+    haversine_miles, polyline_length_miles, simplify, simplify_to, snap_to_route,
+)
+from api.services.station_graph import StationGraph
+from api.services.station_records import StationRecord
+from api.services.station_snapshot import StationSnapshot
+from api.services.station_tiles import station_tile, tiles_near
+from api.testing import BudgetExceeded, CallRecorder
+from api.services.synthetic_stations import CITY_LOCATIONS, generate_lanes, generate_stations
+from api.services.what_if import plan_scenarios, scenario_grid
 
 
 @pytest.fixture
@@ -58,6 +89,31 @@ class TestGoogleMapsGeocodingService:
         with pytest.raises(ValueError):
             service.get_coordinates("NonexistentLocation123")
 
+    def test_get_coordinates_acquires_quota(self, mocker):
+        mock_client = mocker.patch('googlemaps.Client')
+        mock_client.geocode.return_value = [{'geometry': {'location': {'lat': 40.7128, 'lng': -74.0060}}}]
+        quota_manager = mocker.patch('api.services.spotter_geocoding_service.get_quota_manager').return_value
+
+        service = GoogleMapsGeocodingService()
+        service.client = mock_client
+        service.get_coordinates("New York, NY")
+
+        quota_manager.acquire.assert_called_once_with('google.geocode')
+
+    def test_base_url(self, settings):
+        server = start_fake_provider(FakeProvider(latency_ms=0, jitter_ms=0))
+        settings.GOOGLE_MAPS_BASE_URL = f'http://127.0.0.1:{server.server_address[1]}'
+        settings.GOOGLE_MAPS_API_KEY = 'AIza-test'
+        try:
+            service = GoogleMapsGeocodingService()
+            coords = service.get_coordinates("Chicago, IL")
+            route = service.get_route("New York, NY", "Chicago, IL")
+        finally:
+            server.shutdown()
+
+        assert coords == (41.88, -87.63)
+        assert service.get_route_coordinates(route)[-1] == coords
+
     def test_get_route_success(self, mocker):
         mock_client = mocker.patch('googlemaps.Client')
         mock_client.directions.return_value = [{
@@ -79,6 +135,524 @@ class TestGoogleMapsGeocodingService:
         assert len(route) > 0
 
 
+class TestOpenRouteGeocodingService:
+    def test_get_route_coordinates_and_distance(self, mocker, sample_route_response):
+        mocker.patch('openrouteservice.Client')
+        service = OpenRouteGeocodingService()
+
+        coords = service.get_route_coordinates(sample_route_response)
+        assert coords == [(20.0, 10.0), (25.0, 15.0), (40.0, 30.0)]  # flipped to (lat, lon)
+        assert service.get_route_distance(sample_route_response) == round(100000 / 1609.34, 5)
+
+    def test_get_coordinates_are_latitude_first(self, mocker):
+        mocker.patch('openrouteservice.Client')
+        service = OpenRouteGeocodingService()
+        service.client.pelias_search.return_value = {'features': [{'geometry': {'coordinates': [-74.0, 40.7]}}]}
+
+        assert service.get_coordinates("New York, NY") == (40.7, -74.0)
+
+    def test_get_route_geocodes_addresses(self, mocker):
+        mocker.patch('openrouteservice.Client')
+        service = OpenRouteGeocodingService()
+        service.get_coordinates = Mock(side_effect=[(40.7, -74.0), (42.3, -71.0)])
+
+        service.get_route("New York, NY", "Boston, MA")
+
+        service.client.directions.assert_called_once_with(
+            coordinates=[(-74.0, 40.7), (-71.0, 42.3)],
+            profile='driving-car',
+            format='geojson'
+        )
+
+    def test_hedged_coordinates_reach_openroute_longitude_first(self, mocker):
+        mocker.patch('openrouteservice.Client')
+        service = OpenRouteGeocodingService()
+        service.client.directions.return_value = {'features': []}
+        hedged = HedgedRoutingService([
+            ('google', FakeGeocodingService(error=RuntimeError("boom"))),
+            ('openroute', service),
+        ])
+
+        route = hedged.get_route((40.7, -74.0), (42.3, -71.0), waypoints=[(41.8, -72.7)])
+
+        assert route.provider == 'openroute'
+        coordinates = service.client.directions.call_args.kwargs['coordinates']
+        assert coordinates == [(-74.0, 40.7), (-72.7, 41.8), (-71.0, 42.3)]
+
+
+class TestHedgedRoutingService:
+    def test_primary_answers_without_hedging(self):
+        primary = FakeGeocodingService()
+        secondary = FakeGeocodingService()
+        service = HedgedRoutingService([('primary', primary), ('secondary', secondary)])
+
+        route = service.get_route("New York, NY", "Boston, MA")
+
+        assert route.provider == 'primary'
+        assert secondary.calls == 0
+        assert len(service.get_route_coordinates(route)) == primary.steps + 1
+        assert service.get_route_distance(route) > 0
+
+    def test_slow_primary_is_hedged(self):
+        primary = FakeGeocodingService(latency=0.5)
+        secondary = FakeGeocodingService()
+        service = HedgedRoutingService(
+            [('primary', primary), ('secondary', secondary)], default_hedge_delay=0.01)
+
+        route = service.get_route("New York, NY", "Boston, MA")
+
+        assert route.provider == 'secondary'
+        assert service.stats()['secondary']['hedges'] == 1
+        assert service.stats()['secondary']['wins'] == 1
+
+    def test_queued_primary_is_not_hedged(self):
+        primary = FakeGeocodingService()
+        secondary = FakeGeocodingService()
+        service = HedgedRoutingService(
+            [('primary', primary), ('secondary', secondary)], default_hedge_delay=0.05, max_workers=1)
+        service._executor.submit(time.sleep, 0.3)  # another request holding the only worker
+
+        route = service.get_route("New York, NY", "Boston, MA")
+
+        assert route.provider == 'primary'
+        assert secondary.calls == 0
+
+    def test_failing_primary_fails_over(self):
+        primary = FakeGeocodingService(error=RuntimeError("boom"))
+        secondary = FakeGeocodingService()
+        service = HedgedRoutingService(
+            [('primary', primary), ('secondary', secondary)], default_hedge_delay=10)
+
+        route = service.get_route("New York, NY", "Boston, MA")
+
+        assert route.provider == 'secondary'
+        assert service.stats()['primary']['errors'] == 1
+
+    def test_circuit_opens_after_repeated_failures(self):
+        primary = FakeGeocodingService(error=RuntimeError("boom"))
+        secondary = FakeGeocodingService()
+        service = HedgedRoutingService(
+            [('primary', primary), ('secondary', secondary)], failure_threshold=2)
+
+        for _ in range(3):
+            service.get_route("New York, NY", "Boston, MA")
+
+        assert primary.calls == 2  # third request skipped the open circuit
+        assert service.stats()['primary']['circuit'] == CircuitBreaker.OPEN
+
+    def test_all_providers_failing(self):
+        service = HedgedRoutingService([
+            ('primary', FakeGeocodingService(error=RuntimeError("boom"))),
+            ('secondary', FakeGeocodingService(error=RuntimeError("bang"))),
+        ])
+
+        with pytest.raises(RoutingProviderUnavailable):
+            service.get_route("New York, NY", "Boston, MA")
+
+
+class TestCircuitBreaker:
+    def test_half_open_after_reset_timeout(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+
+        breaker.record_failure()
+        assert not breaker.allow_request()
+
+        now[0] = 11
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()  # only one trial request
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestQuotaManager:
+    @pytest.fixture
+    def clock(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        return now, sleep
+
+    def test_calls_over_the_rate_wait_instead_of_failing(self, clock):
+        now, sleep = clock
+        manager = QuotaManager({'google.geocode': (10, 5)}, clock=lambda: now[0], sleep=sleep)
+
+        for _ in range(15):
+            manager.acquire('google.geocode')
+
+        assert now[0] == pytest.approx(1.0)  # 5 from the burst, then 10 per second
+        stats = manager.stats()['google.geocode']
+        assert stats['calls'] == 15
+        assert stats['waits'] == 10
+        assert stats['rejected'] == 0
+
+    def test_bulk_calls_leave_a_reserve(self, clock):
+        now, sleep = clock
+        manager = QuotaManager(
+            {'google.geocode': (1, 10)}, bulk_reserve=0.5, max_wait=0, clock=lambda: now[0], sleep=sleep)
+
+        with bulk_priority():
+            for _ in range(5):
+                manager.acquire('google.geocode')
+            with pytest.raises(QuotaExceeded):
+                manager.acquire('google.geocode')
+
+        for _ in range(5):
+            manager.acquire('google.geocode')  # the reserve is left for interactive calls
+        stats = manager.stats()['google.geocode']
+        assert (stats['bulk_calls'], stats['interactive_calls'], stats['rejected']) == (5, 5, 1)
+
+    def test_unknown_endpoints_are_only_counted(self):
+        manager = QuotaManager({}, max_wait=0)
+
+        manager.acquire('fake.directions')
+
+        assert manager.stats()['fake.directions']['calls'] == 1
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_computation(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'total_distance': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight.do('lane', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{'total_distance': 42}] * 5
+        assert single_flight.coalesced == 4
+
+    def test_errors_are_shared_and_not_remembered(self):
+        single_flight = SingleFlight()
+
+        with pytest.raises(ValueError):
+            single_flight.do('lane', Mock(side_effect=ValueError("no route")))
+
+        assert single_flight.do('lane', lambda: 'computed again') == 'computed again'
+
+    def test_route_key_is_normalized(self):
+        assert route_key(" New York,  NY", "boston, ma", 500, 10) == \
+            route_key("new york, ny", "Boston, MA ", 500.0, 10.0)
+        assert route_key("New York, NY", "Boston, MA", 500, 10) != \
+            route_key("New York, NY", "Boston, MA", 600, 10)
+
+
+class TestRoutePlanner:
+    def test_identical_requests_are_coalesced(self):
+        geocoding_service = FakeGeocodingService(latency=0.2)
+        route_optimizer = Mock(max_range_miles=500, mpg=10)
+        route_optimizer.find_optimal_stops.return_value = {'route': [], 'stops': [], 'total_cost': 0.0}
+        cost_calculator = Mock()
+        cost_calculator.calculate_total_cost.return_value = Decimal('0')
+        planner = RoutePlanner(
+            geocoding_service, route_optimizer, cost_calculator, coalescer=RouteRequestCoalescer())
+
+        threads = [
+            threading.Thread(target=planner.plan, args=(start, "Boston, MA"))
+            for start in ["New York, NY", "new york, ny ", "New York,  NY"]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert geocoding_service.calls == 1
+        assert route_optimizer.find_optimal_stops.call_count == 1
+
+    def test_replan_reuses_stored_route(self):
+        geocoding_service = FakeGeocodingService()
+        route_optimizer = Mock(max_range_miles=500, mpg=10)
+        route_optimizer.find_optimal_stops.return_value = {'route': [], 'stops': [], 'total_cost': 0.0}
+        cost_calculator = Mock()
+        cost_calculator.calculate_total_cost.return_value = Decimal('0')
+        plan_store = Mock()
+        plan_store.route_points.return_value = [(40.0, -75.0 - i) for i in range(11)]
+        stored_plan = Mock(id='plan', total_distance=600.0, candidate_station_ids=[1, 2, 3])
+        planner = RoutePlanner(geocoding_service, route_optimizer, cost_calculator, plan_store=plan_store)
+
+        # Halfway along, a bit north of the route, with a quarter of a tank
+        result = planner.replan(stored_plan, (40.05, -80.0), 0.25)
+
+        assert geocoding_service.calls == 0
+        assert result['plan_id'] == 'plan'
+        assert result['total_distance'] == pytest.approx(300.0, rel=0.01)
+        assert result['off_route_miles'] == pytest.approx(3.45, rel=0.05)
+        args, kwargs = route_optimizer.find_optimal_stops.call_args
+        assert args[0][0] == pytest.approx((40.0, -80.0))
+        assert kwargs == {'start_fuel_range': 125.0, 'candidate_station_ids': [1, 2, 3]}
+
+
+class TestRoutePlanBudget:
+    @pytest.fixture
+    def planner(self):
+        geocoding_service = FakeGeocodingService(locations={
+            'New York, NY': (40.7128, -74.0060),
+            'Riverhead, NY': (40.7128, -72.5),
+        })
+        return RoutePlanner(
+            geocoding_service, GreedyRouteOptimizer(max_range_miles=50, mpg=10), StandardFuelCostCalculator(mpg=10))
+
+    @pytest.fixture
+    def station_on_route(self, db):
+        # Where the 50 mile tank runs out on the way to Riverhead
+        return FuelStation.objects.create(name="Test Station", location=Point(-73.1, 40.7128), retail_price=3.50)
+
+    @pytest.mark.budget(queries=1, directions=1, geocode=0)
+    def test_plan_with_one_stop(self, planner, station_on_route):
+        plan = planner.plan('New York, NY', 'Riverhead, NY')
+
+        assert [stop.id for stop in plan['stops']] == [station_on_route.id]
+
+    @pytest.fixture
+    def second_leg_station(self, db):
+        # Where the tank filled up at station_on_route runs out on the way on to Montauk
+        return FuelStation.objects.create(name="Second Leg", location=Point(-72.18, 40.7128), retail_price=3.40)
+
+    @pytest.mark.budget(queries=1, directions=1, geocode=0)
+    def test_itinerary_with_a_stop_on_each_leg(self, station_on_route, second_leg_station):
+        # Stations along the whole itinerary are fetched once instead of once per stop
+        planner = RoutePlanner(
+            FakeGeocodingService(locations={
+                'New York, NY': (40.7128, -74.0060),
+                'Riverhead, NY': (40.7128, -72.5),
+                'Montauk, NY': (40.7128, -71.9),
+            }),
+            GreedyRouteOptimizer(max_range_miles=50, mpg=10),
+            StandardFuelCostCalculator(mpg=10),
+            station_repository=SpotterFuelStationRepository(None),
+        )
+
+        plan = planner.plan('New York, NY', 'Montauk, NY', waypoints=['Riverhead, NY'])
+
+        assert [stop.id for stop in plan['stops']] == [station_on_route.id, second_leg_station.id]
+
+    def test_budget_exceeded(self, planner, call_budget):
+        with pytest.raises(BudgetExceeded, match="2 directions calls"):
+            with call_budget(directions=1):
+                planner.geocoding_service.get_route('New York, NY', 'Riverhead, NY')
+                planner.geocoding_service.get_route('Riverhead, NY', 'New York, NY')
+
+    def test_records_provider_calls_of_hedged_requests(self):
+        service = HedgedRoutingService(
+            [('primary', FakeGeocodingService(latency=0.2)), ('secondary', FakeGeocodingService())],
+            default_hedge_delay=0.01)
+
+        with CallRecorder() as recorder:
+            service.get_route('New York, NY', 'Boston, MA')
+
+        assert recorder.calls('directions') == 2
+        assert recorder.calls('fake.directions') == 2
+        assert recorder.calls('geocode') == 0
+
+
+@pytest.mark.django_db
+class TestRouteReuse:
+    LOCATIONS = {
+        'Yard 1, Newark, NJ': (40.7357, -74.1724),
+        'Yard 2, Newark, NJ': (40.7400, -74.1650),  # half a mile from yard 1
+        'Port, Elizabeth, NJ': (40.6840, -74.1560),  # 3.6 miles from yard 1
+        'Boston, MA': (42.3601, -71.0589),
+        'Cambridge, MA': (42.3736, -71.1097),  # 2.8 miles from Boston
+    }
+
+    @pytest.fixture
+    def planner(self):
+        cache.clear()  # addresses geocoded by other tests
+        geocoding_service = FakeGeocodingService(locations=self.LOCATIONS)
+        return RoutePlanner(
+            geocoding_service, Mock(max_range_miles=500, mpg=10), Mock(),
+            route_reuse=RouteReuse(geocoding_service, radius_miles=5, connector_miles=1),
+        )
+
+    def test_nearby_start_reuses_the_route(self, planner, call_budget):
+        fetched = planner.directions('Yard 1, Newark, NJ', 'Boston, MA')
+
+        with call_budget(directions=0):
+            reused = planner.directions('Yard 2, Newark, NJ', 'Boston, MA')
+
+        offset = haversine_miles(self.LOCATIONS['Yard 1, Newark, NJ'], self.LOCATIONS['Yard 2, Newark, NJ'])
+        assert fetched.approximation_miles is None
+        assert reused.route_points[:len(fetched.route_points) + 1] == [
+            self.LOCATIONS['Yard 2, Newark, NJ'], *fetched.route_points]
+        assert reused.approximation_miles == pytest.approx(offset, abs=1e-4)
+        assert reused.total_distance == pytest.approx(fetched.total_distance + offset)
+
+    def test_far_end_gets_a_connector_leg(self, planner, call_budget):
+        fetched = planner.directions('Yard 1, Newark, NJ', 'Boston, MA')
+
+        with call_budget(directions=1):
+            reused = planner.directions('Port, Elizabeth, NJ', 'Boston, MA')
+
+        assert reused.route_points[0] == self.LOCATIONS['Port, Elizabeth, NJ']
+        assert reused.approximation_miles == 0.0
+        assert reused.total_distance > fetched.total_distance
+
+    def test_two_connector_legs_fetch_the_lane_instead(self, planner, call_budget):
+        planner.directions('Yard 1, Newark, NJ', 'Boston, MA')
+
+        with call_budget(directions=1):
+            fetched = planner.directions('Port, Elizabeth, NJ', 'Cambridge, MA')
+
+        assert fetched.approximation_miles is None
+
+    def test_end_is_not_geocoded_without_a_route_near_the_start(self, planner, call_budget):
+        planner.directions('Yard 1, Newark, NJ', 'Boston, MA')
+
+        with call_budget(directions=1, geocode=1):
+            planner.directions('Cambridge, MA', 'Port, Elizabeth, NJ')
+
+    def test_stored_lanes_are_located_without_geocoding(self, planner, call_budget):
+        fetched = planner.directions('Yard 1, Newark, NJ', 'Boston, MA')
+        cache.clear()  # as in another process
+
+        with call_budget(directions=0, geocode=0):
+            reused = planner.directions('yard 1,  Newark, NJ', 'Boston, MA')
+
+        assert reused.route_points == fetched.route_points
+        assert reused.approximation_miles == 0.0
+
+    def test_other_lanes_are_fetched(self, planner, call_budget):
+        planner.directions('Yard 1, Newark, NJ', 'Boston, MA')
+
+        with call_budget(directions=1):
+            reversed_lane = planner.directions('Boston, MA', 'Yard 1, Newark, NJ')
+
+        assert reversed_lane.approximation_miles is None
+
+
+@pytest.mark.django_db
+class TestRoutePlanStore:
+    EAST_COAST = [(40.7128, -74.0060), (39.9526, -75.1652)]  # New York to Philadelphia
+    MIDWEST = [(41.8781, -87.6298), (43.0389, -87.9065)]  # Chicago to Milwaukee
+
+    @pytest.fixture
+    def plan_store(self):
+        return RoutePlanStore(SpotterFuelStationRepository(), corridor_miles=10)
+
+    def test_changed_candidate_marks_the_plan_stale(self, plan_store, mock_fuel_station):
+        east_coast = plan_store.save('New York', 'Philadelphia', self.EAST_COAST, 95, 500, 10,
+                                     candidate_station_ids=[mock_fuel_station.id])
+        midwest = plan_store.save('Chicago', 'Milwaukee', self.MIDWEST, 90, 500, 10, candidate_station_ids=[])
+        version = get_price_version()
+
+        assert mark_stale_plans([mock_fuel_station.id]) == 1
+
+        east_coast.refresh_from_db()
+        midwest.refresh_from_db()
+        assert east_coast.stale and not midwest.stale
+        assert plan_store.price_version(self.EAST_COAST, 500, 10) is None
+        assert plan_store.price_version(self.MIDWEST, 500, 10) == version
+        assert plan_store.price_version(self.MIDWEST, 400, 10) is None
+
+    def test_plans_past_retention_are_left_alone(self, plan_store, mock_fuel_station, settings):
+        plan_store.save('New York', 'Philadelphia', self.EAST_COAST, 95, 500, 10,
+                        candidate_station_ids=[mock_fuel_station.id])
+        settings.ROUTE_PLAN_RETENTION_DAYS = 0
+
+        assert mark_stale_plans([mock_fuel_station.id]) == 0
+        assert plan_store.price_version(self.EAST_COAST, 500, 10) is None
+
+    def test_new_station_in_the_corridor_marks_the_plan_stale(self, plan_store):
+        east_coast = plan_store.save('New York', 'Philadelphia', self.EAST_COAST, 95, 500, 10,
+                                     candidate_station_ids=[])
+        plan_store.save('Chicago', 'Milwaukee', self.MIDWEST, 90, 500, 10, candidate_station_ids=[])
+        station = FuelStation.objects.create(
+            name="New Station", address="1 Route 1", city="Trenton", state="NJ",
+            location=Point(-74.7429, 40.2206), retail_price=3.20,
+        )
+
+        assert mark_stale_plans([station.id]) == 1
+        east_coast.refresh_from_db()
+        assert east_coast.stale
+
+    def test_stored_plans_only_stop_in_the_corridor(self):
+        planner = RoutePlanner(
+            FakeGeocodingService(locations={'New York, NY': (40.7128, -74.0060), 'Riverhead, NY': (40.7128, -72.5)}),
+            GreedyRouteOptimizer(max_range_miles=50, mpg=10),
+            StandardFuelCostCalculator(mpg=10),
+            plan_store=RoutePlanStore(SpotterFuelStationRepository(), corridor_miles=1),
+            station_repository=SpotterFuelStationRepository(),
+            corridor_miles=1,
+        )
+        # The 50 mile tank runs out ~47 miles along, in range of both
+        on_route = FuelStation.objects.create(name="On Route", location=Point(-73.1, 40.7128), retail_price=3.50)
+        off_corridor = FuelStation.objects.create(
+            name="Off Corridor", location=Point(-73.1, 40.7345), retail_price=3.00)  # 1.5 miles north
+
+        plan = planner.plan('New York, NY', 'Riverhead, NY')
+
+        stored = RoutePlan.objects.get(pk=plan['plan_id'])
+        assert [stop.id for stop in plan['stops']] == [on_route.id]
+        assert on_route.id in stored.candidate_station_ids
+        assert off_corridor.id not in stored.candidate_station_ids
+        # A price change of any station the plan could have stopped at makes it stale
+        assert mark_stale_plans([on_route.id]) == 1
+
+    def test_every_plan_is_stale_without_station_ids(self, plan_store):
+        plan_store.save('Chicago', 'Milwaukee', self.MIDWEST, 90, 500, 10, candidate_station_ids=[])
+
+        publish_price_snapshot()
+
+        assert plan_store.price_version(self.MIDWEST, 500, 10) is None
+
+
+@pytest.mark.django_db
+class TestPlanJobQueue:
+    def submit(self, queue, start_location):
+        return queue.submit(start_location, 'Boston, MA', optimizer='greedy', max_range_miles=500, mpg=10)
+
+    def test_claims_oldest_queued_job_once(self):
+        queue = PlanJobQueue()
+        first = self.submit(queue, 'New York, NY')
+        second = self.submit(queue, 'Albany, NY')
+
+        assert queue.claim('worker-1').pk == first.pk
+        assert queue.claim('worker-2').pk == second.pk
+        assert queue.claim('worker-3') is None
+        first.refresh_from_db()
+        assert (first.status, first.worker, first.attempts) == (PlanJob.RUNNING, 'worker-1', 1)
+
+    def test_abandoned_jobs_are_retried_then_failed(self):
+        queue = PlanJobQueue(stale_after=0, max_attempts=2)
+        job = self.submit(queue, 'New York, NY')
+
+        assert queue.claim('worker-1').pk == job.pk
+        retried = queue.claim('worker-2')
+        assert retried.pk == job.pk and retried.attempts == 2
+        assert queue.claim('worker-3') is None
+
+        assert queue.fail_abandoned() == 1
+        job.refresh_from_db()
+        assert job.status == PlanJob.FAILED
+
+    def test_reclaimed_job_keeps_the_new_claim(self):
+        queue = PlanJobQueue(stale_after=0)
+        self.submit(queue, 'New York, NY')
+        stale_claim = queue.claim('worker-1')
+        queue.claim('worker-2')
+
+        queue.complete(stale_claim, {'total_distance': '1.00000'})
+
+        stale_claim.refresh_from_db()
+        assert (stale_claim.status, stale_claim.worker, stale_claim.result) == (PlanJob.RUNNING, 'worker-2', None)
+
+
 class TestSpotterFuelStationRepository:
     @pytest.mark.django_db
     def test_get_stations_near_route(self, mock_fuel_station):
@@ -92,6 +666,7 @@ class TestSpotterFuelStationRepository:
         assert 'station' in stations[0]
         assert 'distance' in stations[0]
         assert 'price' in stations[0]
+        assert stations[0]['station'].name == "Test Station"
 
     @pytest.mark.django_db
     def test_get_stations_near_route_no_results(self):
@@ -131,6 +706,18 @@ class TestGreedyRouteOptimizer:
         assert str(
             e.value) == "No stations can be reached to refuel. Stuck without fuel."
 
+    @pytest.mark.django_db
+    def test_find_next_station_returns_record(self, mock_fuel_station):
+        optimizer = GreedyRouteOptimizer(max_range_miles=500, mpg=10)
+
+        station = optimizer.find_next_station(Point(-74.0, 40.7, srid=4326), 50)
+
+        assert isinstance(station, StationRecord)
+        assert station.id == mock_fuel_station.id
+        assert station.latitude == pytest.approx(40.7128)
+        assert station.longitude == pytest.approx(-74.0060)
+        assert station.retail_price == 3.50
+
 
 class TestStandardFuelCostCalculator:
     def test_calculate_total_cost(self):
@@ -177,3 +764,344 @@ class TestFoliumMapPlotter:
 
         # Should not raise any exceptions
         plotter.plot_map(data)
+
+    def test_plot_map_lite_mode_bounds_markers_and_points(self, mocker):
+        mocker.patch('folium.Map')
+        mock_marker = mocker.patch('folium.Marker')
+        mock_polyline = mocker.patch('folium.PolyLine')
+
+        data = [{'latitude': 40.0 + i * 0.001, 'longitude': -74.0 + (i % 2) * 0.01} for i in range(5000)]
+        data[2500] = {**data[2500], 'name': 'Test Station', 'address': '123 Test St',
+                      'city': 'Test City', 'state': 'TS', 'price': 3.50}
+
+        FoliumMapPlotter(mode='lite', max_points=500).plot_map(data)
+
+        assert mock_marker.call_count == 3  # start, fuel stop, end
+        assert len(mock_polyline.call_args[0][0]) <= 500
+
+
+class TestRouteGeometry:
+    def test_simplify_drops_collinear_points(self):
+        points = [(0.0, float(i)) for i in range(100)] + [(5.0, 99.0)]
+
+        assert simplify(points, 0.001) == [(0.0, 0.0), (0.0, 99.0), (5.0, 99.0)]
+
+    def test_simplify_to_caps_point_count(self):
+        points = [(i * 0.01, (i % 7) * 0.01) for i in range(10000)]
+
+        simplified = simplify_to(points, 100)
+        assert len(simplified) <= 100
+        assert simplified[0] == points[0] and simplified[-1] == points[-1]
+
+    def test_simplify_to_needs_both_ends(self):
+        with pytest.raises(ValueError):
+            simplify_to([(0.0, 0.0), (0.5, 0.2), (1.0, 0.0)], 1)
+
+    def test_snap_to_route(self):
+        points = [(40.0, -75.0), (40.0, -76.0), (40.0, -77.0)]
+
+        index, snapped, distance = snap_to_route(points, (40.1, -76.5))
+        assert index == 1
+        assert snapped == pytest.approx((40.0, -76.5))
+        assert distance == pytest.approx(6.9, rel=0.05)
+
+
+@pytest.fixture
+def corridor_snapshot():
+    # Stations every ~100 miles due west along the 40th parallel, the third one is cheap
+    longitudes = np.arange(-75.0, -100.0, -1.9)
+    prices = np.full(len(longitudes), 3.5)
+    prices[2] = 2.5
+    return StationSnapshot(
+        ids=np.arange(1, len(longitudes) + 1),
+        latitudes=np.full(len(longitudes), 40.0),
+        longitudes=longitudes,
+        prices=prices,
+        records=[
+            StationRecord(i + 1, f"Station {i + 1}", "", "", "", 40.0, float(longitude), float(price))
+            for i, (longitude, price) in enumerate(zip(longitudes, prices))
+        ],
+    )
+
+
+class TestStationTiles:
+    def test_station_tile(self):
+        assert station_tile(40.7, -74.3) == station_tile(40.2, -74.9)
+        assert station_tile(40.7, -74.3) != station_tile(41.2, -74.3)
+        assert station_tile(40.7, -74.3) != station_tile(40.7, -73.5)
+
+    def test_tiles_near_cover_the_corridor(self):
+        route = [(40.0, -75.0), (40.0, -80.0), (42.0, -85.0)]
+
+        tiles = set(tiles_near(route, 25))
+
+        # Points up to 25 miles off the route, including off its ends
+        for point in [(40.3, -77.5), (39.8, -75.2), (41.0, -82.5), (42.3, -85.2)]:
+            assert station_tile(*point) in tiles
+        assert station_tile(45.0, -80.0) not in tiles
+
+    @pytest.mark.django_db
+    def test_saved_stations_get_their_tile(self, mock_fuel_station):
+        assert mock_fuel_station.tile == station_tile(40.7128, -74.0060)
+
+
+class TestStationSnapshot:
+    def test_find_next_station_picks_cheapest_in_range(self, corridor_snapshot):
+        # Stations 1 to 4 are within 350 miles, station 3 is the cheap one
+        station = corridor_snapshot.find_next_station(40.0, -75.0, 350)
+
+        assert station.id == 3
+        assert station.location == (corridor_snapshot.longitudes[2], 40.0)
+
+    def test_find_next_station_candidates(self, corridor_snapshot):
+        assert corridor_snapshot.find_next_station(40.0, -75.0, 350, candidate_station_ids=[1, 2]).id == 1
+        assert corridor_snapshot.find_next_station(40.0, -75.0, 350, candidate_station_ids=[9]) is None
+
+    def test_greedy_optimizer_uses_snapshot(self, corridor_snapshot):
+        optimizer = GreedyRouteOptimizer(max_range_miles=300, mpg=10, station_snapshot=corridor_snapshot)
+        # Route through the first six stations, ~100 miles apart
+        route = [(40.0, float(longitude)) for longitude in corridor_snapshot.longitudes[:6]]
+
+        result = optimizer.find_optimal_stops(route, 502.0)
+
+        assert [stop.id for stop in result['stops']] == [3, 5]
+
+
+class TestStationGraph:
+    def test_build_keeps_edges_within_range(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+
+        assert len(graph.indptr) == len(corridor_snapshot) + 1
+        assert graph.edge_count > 0
+        assert graph.distances.max() <= 300
+
+    def test_save_and_load(self, corridor_snapshot, tmp_path):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+        graph.save(tmp_path / 'graph.npz')
+
+        loaded = StationGraph.load(tmp_path / 'graph.npz')
+        assert loaded.max_range_miles == 300
+        assert np.array_equal(loaded.indices, graph.indices)
+
+    @staticmethod
+    def route_west(end_longitude):
+        # Due west along the stations, a point every few miles
+        return [(40.0, float(longitude)) for longitude in np.arange(-74.5, end_longitude, -0.1)]
+
+    def test_cheapest_path(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+        route = self.route_west(-99.0)
+
+        path, cost = graph.cheapest_path(route, polyline_length_miles(route), max_range_miles=300, mpg=10)
+
+        assert 2 in path  # the cheap station is on the way
+        assert cost == pytest.approx(graph.prices[path].sum() * 300 / 10)  # a full tank at every stop
+        assert list(path) == sorted(path)  # always heading west
+
+    def test_only_searches_the_given_stations(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+        route = self.route_west(-99.0)
+        # Every station but the cheap one, e.g. when it's outside the route corridor
+        station_ids = [station_id for station_id in corridor_snapshot.ids.tolist() if station_id != 3]
+
+        path, _ = graph.cheapest_path(
+            route, polyline_length_miles(route), max_range_miles=300, mpg=10, station_ids=station_ids)
+
+        assert 2 not in path
+
+    def test_stops_cost_the_detour(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+        route = self.route_west(-99.0)
+        # The same lane a degree north past a third of the way, the stations there are ~80 driving miles off it
+        detoured = self.route_west(-83.0) + [(41.0, float(longitude)) for longitude in np.arange(-83.0, -99.0, -0.1)]
+
+        on_route, _ = graph.cheapest_path(route, polyline_length_miles(route), max_range_miles=300, mpg=10)
+        off_route, _ = graph.cheapest_path(detoured, polyline_length_miles(detoured), max_range_miles=300, mpg=10)
+
+        assert len(off_route) > len(on_route)  # the drive there and back leaves less of every tank
+
+    def test_optimizer_stops_at_candidates_only(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+        optimizer = GraphRouteOptimizer(max_range_miles=300, mpg=10, graph=graph, station_snapshot=corridor_snapshot)
+        route = self.route_west(-99.0)
+
+        result = optimizer.find_optimal_stops(
+            route, polyline_length_miles(route), candidate_station_ids=[1, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14])
+
+        assert [stop.id for stop in result['stops']] == [2, 4, 6, 8, 9, 11]
+
+    def test_unreachable_end(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+        route = self.route_west(-120.0)
+
+        assert graph.cheapest_path(route, polyline_length_miles(route), max_range_miles=300, mpg=10) is None
+
+    def test_with_prices(self, corridor_snapshot):
+        graph = StationGraph.build(corridor_snapshot, max_range_miles=300)
+
+        repriced = graph.with_prices({3: 4.5, 4: 3.0}, station_ids=[3, 4, 5])
+
+        assert list(repriced.prices[:6]) == [3.5, 3.5, 4.5, 3.0, np.inf, 3.5]  # station 5 lost its price
+        assert graph.prices[2] == 2.5
+        assert repriced.indices is graph.indices
+
+
+class TestPriceEvents:
+    @pytest.fixture
+    def changes(self):
+        changes = []
+        subscribe(changes.append)
+        yield changes
+        unsubscribe(changes.append)
+
+    def test_payload_round_trip(self):
+        change = PriceChange(7, frozenset({3, 1, 2}))
+
+        assert change.payload() == '{"version":7,"stations":[1,2,3]}'
+        assert PriceChange.from_payload(change.payload()) == change
+
+    def test_too_many_stations_is_a_change_of_every_station(self):
+        change = PriceChange(7, frozenset(range(100000, 100000 + MAX_PAYLOAD_BYTES)))
+
+        received = PriceChange.from_payload(change.payload())
+
+        assert received == PriceChange(7, None)
+        assert received.affects(1)
+
+    @pytest.mark.django_db
+    def test_publish_notifies_subscribers(self, changes, mock_fuel_station):
+        get_price_version()
+
+        snapshot = publish_price_snapshot([mock_fuel_station.id])
+
+        assert changes == [PriceChange(snapshot.id, frozenset({mock_fuel_station.id}))]
+        assert get_price_version() == snapshot.id  # without waiting for the cached version to expire
+
+    def test_replica_versions_are_read_again_after_a_change(self, monkeypatch):
+        monkeypatch.setattr(price_snapshot, '_cached_versions', {'default': (1, 0.0), 'replica_1': (1, 0.0)})
+
+        dispatch(PriceChange(2))
+
+        assert list(price_snapshot._cached_versions) == ['default']  # replicas may not have version 2 yet
+        assert price_snapshot._cached_versions['default'][0] == 2
+
+    def test_failing_subscriber_does_not_stop_the_others(self, changes):
+        def failing(change):
+            raise RuntimeError('boom')
+
+        subscribe(failing)
+        try:
+            dispatch(PriceChange(None))
+        finally:
+            unsubscribe(failing)
+
+        assert changes == [PriceChange(None)]
+
+
+class TestWhatIf:
+    @pytest.fixture
+    def route(self, corridor_snapshot):
+        # Due west through the first ten stations, ~100 miles apart
+        return [(40.0, float(longitude)) for longitude in corridor_snapshot.longitudes[:10]]
+
+    def test_scenario_grid(self):
+        ranges, mpgs, levels = scenario_grid([300, 500], [8, 10], [0.5, 1.0])
+
+        assert len(ranges) == 8
+        assert (ranges[0], mpgs[0], levels[0]) == (300, 8, 0.5)
+        assert (ranges[1], mpgs[1], levels[1]) == (300, 8, 1.0)
+        assert (ranges[2], mpgs[2], levels[2]) == (300, 10, 0.5)
+
+    def test_matches_greedy_optimizer(self, corridor_snapshot, route):
+        ranges, mpgs, levels = scenario_grid([150, 250, 400], [6, 10], [0.1, 0.5, 1.0])
+
+        plans = plan_scenarios(route, 900.0, corridor_snapshot, ranges, mpgs, levels * ranges)
+
+        for i in range(len(plans)):
+            optimizer = GreedyRouteOptimizer(max_range_miles=ranges[i], mpg=mpgs[i], station_snapshot=corridor_snapshot)
+            result = optimizer.find_optimal_stops(route, 900.0, start_fuel_range=levels[i] * ranges[i])
+            calculator = StandardFuelCostCalculator(mpg=mpgs[i], max_range_miles=ranges[i])
+            assert plans.stops[i] == len(result['stops'])
+            assert plans.total_fuel_cost[i] == pytest.approx(float(calculator.calculate_total_cost(result['stops'])))
+
+    def test_stuck_without_fuel(self, corridor_snapshot, route):
+        # Stations are ~100 miles apart, a 60 mile tank can't get past the first one
+        plans = plan_scenarios(route, 900.0, corridor_snapshot, np.array([60.0, 300.0]), np.array([10.0, 10.0]),
+                               np.array([60.0, 300.0]))
+
+        assert np.isnan(plans.total_fuel_cost[0])
+        assert plans.as_lists((2,))['total_fuel_cost'][0] is None
+        assert plans.total_fuel_cost[1] > 0
+
+
+class TestAlternativePlans:
+    @pytest.fixture
+    def route(self, corridor_snapshot):
+        # Due west through the first ten stations, ~100 miles apart
+        return [(40.0, float(longitude)) for longitude in corridor_snapshot.longitudes[:10]]
+
+    def test_cheapest_first(self, corridor_snapshot, route):
+        plans = k_best_plans(route, 900.0, corridor_snapshot, 250, 5)
+
+        assert len(plans) == 5
+        assert plans[0].stations[0] == 2  # the cheap third station
+        assert plans[0].price_sum == pytest.approx(2.5 + 3 * 3.5)
+        assert [plan.price_sum for plan in plans] == sorted(plan.price_sum for plan in plans)
+        assert len({tuple(plan.stations) for plan in plans}) == 5
+
+    def test_fewest_stops_first(self, corridor_snapshot, route):
+        plans = k_best_plans(route, 900.0, corridor_snapshot, 250, 5, objective='stops')
+
+        # 900 miles on a 250 mile tank with stations every 100 miles take 4 stops, the cheapest of those first
+        assert [plan.stops for plan in plans] == [4] * 5
+        assert plans[0].price_sum == pytest.approx(2.5 + 3 * 3.5)
+
+    def test_best_plan_is_the_cheapest(self, corridor_snapshot, route):
+        [best] = k_best_plans(route, 900.0, corridor_snapshot, 250, 1)
+        optimizer = GreedyRouteOptimizer(max_range_miles=250, mpg=10, station_snapshot=corridor_snapshot)
+        result = optimizer.find_optimal_stops(route, 900.0)
+
+        assert best.price_sum <= sum(stop.retail_price for stop in result['stops'])
+
+    def test_no_stop_needed(self, corridor_snapshot, route):
+        plans = k_best_plans(route, 900.0, corridor_snapshot, 1000, 3)
+
+        assert plans[0].stations == []
+        assert plans[1].stations == [2]  # then the cheapest single stop
+
+    def test_avoided_chain(self, corridor_snapshot, route):
+        geocoding_service = Mock()
+        geocoding_service.get_route_coordinates.return_value = route
+        geocoding_service.get_route_distance.return_value = 900.0
+        station_repository = Mock()
+        station_repository.get_stations_along_route.return_value = corridor_snapshot.records
+        planner = RoutePlanner(
+            geocoding_service, Mock(max_range_miles=250, mpg=10), StandardFuelCostCalculator(10, 250),
+            station_repository=station_repository,
+        )
+
+        result = planner.alternatives('New York, NY', 'Chicago, IL', 3, avoid=['station 3'])
+
+        assert len(result['alternatives']) == 3
+        for plan in result['alternatives']:
+            assert 'Station 3' not in [stop.name for stop in plan['stops']]
+        # Without the cheap third station the next one is too far, it takes 4 stops at 3.5 of 25 gallons
+        assert result['alternatives'][0]['total_fuel_cost'] == Decimal('350.00000')
+
+
+class TestSyntheticStations:
+    def test_generate_stations(self):
+        stations = list(generate_stations(2000, seed=1))
+
+        assert len(stations) == 2000
+        assert stations == list(generate_stations(2000, seed=1))
+        assert all(24 < station['latitude'] < 50 and -125 < station['longitude'] < -66 for station in stations)
+        assert all(2.5 <= station['retail_price'] <= 5.5 for station in stations)
+        assert len({station['truckstop_id'] for station in stations}) == 2000
+
+    def test_generate_lanes(self):
+        lanes = generate_lanes(20, seed=1)
+
+        assert len(lanes) == 20
+        assert all(lane['start_location'] != lane['end_location'] for lane in lanes)
+        assert all(lane['start_location'] in CITY_LOCATIONS for lane in lanes)
@@ -1,11 +1,19 @@
+import json
+import msgpack
 import pytest
+import threading
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from decimal import Decimal
 from django.contrib.gis.geos import Point
-from api.models import FuelStation
+from api.models import FuelStation, PlanJob, RoutePlan
+from api.serializers import RouteResponseSerializer, RouteWithStopSerializer, route_point_data
+from api.services import SpotterFuelStationRepository, publish_price_snapshot
+from api.services.route_plan_store import RoutePlanStore
+from api.services.station_records import StationRecord
+from api.warmup import WarmUp
 
 
 @pytest.fixture
@@ -26,6 +34,16 @@ def valid_request_data():
     }
 
 
+@pytest.fixture
+def simple_plan():
+    return {
+        'total_distance': 50.0,
+        'total_fuel_cost': Decimal('0'),
+        'route': [(10.0, 20.0), (30.0, 40.0)],
+        'stops': [],
+    }
+
+
 @pytest.mark.django_db
 class TestOptimizeRouteView:
     def test_optimize_route_success(
@@ -73,3 +91,324 @@ class TestOptimizeRouteView:
         assert 'route_points' in response.data
         assert 'total_distance' in response.data
         assert 'total_fuel_cost' in response.data
+
+
+@pytest.mark.django_db
+class TestOptimizeRouteViewFormats:
+    @pytest.fixture(autouse=True)
+    def route_plan(self, patch_route_planner, simple_plan):
+        return patch_route_planner('plan', simple_plan)
+
+    def test_geojson(self, api_client, optimize_route_url, valid_request_data):
+        response = api_client.post(
+            optimize_route_url, valid_request_data, format='json', HTTP_ACCEPT='application/geo+json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/geo+json'
+        assert json.loads(response.content)['features'][0]['geometry']['coordinates'] == [[20.0, 10.0], [40.0, 30.0]]
+
+    def test_msgpack(self, api_client, optimize_route_url, valid_request_data):
+        response = api_client.post(
+            optimize_route_url, valid_request_data, format='json', HTTP_ACCEPT='application/msgpack')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert msgpack.unpackb(response.content)['route'] == [10.0, 20.0, 30.0, 40.0]
+
+    def test_error_is_json(self, api_client, optimize_route_url):
+        response = api_client.post(optimize_route_url, {}, format='json', HTTP_ACCEPT='application/geo+json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response['Content-Type'] == 'application/json'
+        assert 'start_location' in json.loads(response.content)
+
+    def test_json_stays_default(self, api_client, optimize_route_url, valid_request_data):
+        response = api_client.post(optimize_route_url, valid_request_data, format='json')
+
+        assert response['Content-Type'] == 'application/json'
+        assert response.data['route_points'][0] == {'latitude': 10.0, 'longitude': 20.0}
+
+
+@pytest.mark.django_db
+class TestOptimizeRouteViewConditional:
+    @pytest.fixture(autouse=True)
+    def route_plan(self, patch_route_planner, simple_plan):
+        return patch_route_planner('plan', simple_plan)
+
+    def test_not_modified(self, api_client, optimize_route_url, valid_request_data, route_plan):
+        response = api_client.get(optimize_route_url, valid_request_data)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Cache-Control'] == 'private, max-age=60, must-revalidate'
+
+        repeated = api_client.get(optimize_route_url, valid_request_data, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        assert repeated.status_code == status.HTTP_304_NOT_MODIFIED
+        assert repeated['ETag'] == response['ETag']
+        assert route_plan.call_count == 1
+
+    @pytest.mark.parametrize('renderer_format', ['geojson', 'msgpack'])
+    def test_not_modified_compact_format(self, api_client, optimize_route_url, valid_request_data, renderer_format):
+        request_data = {**valid_request_data, 'format': renderer_format}
+        response = api_client.get(optimize_route_url, request_data)
+
+        repeated = api_client.get(optimize_route_url, request_data, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        assert repeated.status_code == status.HTTP_304_NOT_MODIFIED
+        assert repeated.content == b''
+
+    def test_new_prices_change_the_etag(self, api_client, optimize_route_url, valid_request_data):
+        response = api_client.post(optimize_route_url, valid_request_data, format='json')
+        publish_price_snapshot()
+
+        repeated = api_client.post(
+            optimize_route_url, valid_request_data, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        assert repeated.status_code == status.HTTP_200_OK
+        assert repeated['ETag'] != response['ETag']
+
+    def test_etag_depends_on_format(self, api_client, optimize_route_url, valid_request_data):
+        response = api_client.get(optimize_route_url, valid_request_data)
+        geojson = api_client.get(optimize_route_url, {**valid_request_data, 'format': 'geojson'})
+
+        assert geojson['ETag'] != response['ETag']
+
+
+@pytest.mark.django_db
+class TestOptimizeRouteViewItinerary:
+    @pytest.fixture(autouse=True)
+    def route_plan(self, patch_route_planner, simple_plan):
+        return patch_route_planner('plan', simple_plan)
+
+    def test_waypoints(self, api_client, optimize_route_url, valid_request_data, route_plan):
+        waypoints = ['Hartford, CT', 'Worcester, MA']
+
+        posted = api_client.post(optimize_route_url, {**valid_request_data, 'waypoints': waypoints}, format='json')
+        polled = api_client.get(optimize_route_url, {**valid_request_data, 'waypoints': waypoints})
+
+        assert posted.status_code == polled.status_code == status.HTTP_200_OK
+        assert [call.kwargs['waypoints'] for call in route_plan.call_args_list] == [waypoints, waypoints]
+        assert posted['ETag'] == polled['ETag']
+
+    def test_waypoints_change_the_etag(self, api_client, optimize_route_url, valid_request_data):
+        direct = api_client.get(optimize_route_url, valid_request_data)
+        via = api_client.get(optimize_route_url, {**valid_request_data, 'waypoints': ['Hartford, CT']})
+
+        assert via['ETag'] != direct['ETag']
+
+    def test_too_many_waypoints(self, api_client, optimize_route_url, valid_request_data, settings):
+        waypoints = [f'Stop {i}' for i in range(settings.ROUTE_MAX_WAYPOINTS + 1)]
+
+        response = api_client.post(optimize_route_url, {**valid_request_data, 'waypoints': waypoints}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'waypoints' in response.data
+
+
+@pytest.mark.django_db
+class TestWhatIfView:
+    @pytest.fixture(autouse=True)
+    def what_if(self, patch_route_planner):
+        return patch_route_planner('what_if', {
+            'total_distance': 1000.0,
+            'max_range_miles': [300.0, 500.0],
+            'mpg': [10.0],
+            'fuel_levels': [1.0],
+            'total_fuel_cost': [[[350.0]], [[None]]],
+            'stops': [[[3]], [[2]]],
+        })
+
+    def test_grid(self, api_client, valid_request_data, what_if):
+        response = api_client.post(reverse('what-if'), {
+            **valid_request_data,
+            'max_range_miles': [300, 500],
+        }, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_fuel_cost'] == [[[350.0]], [[None]]]
+        args = what_if.call_args.args
+        assert args[2:] == ([300.0, 500.0], [10.0], [1.0])  # vehicle defaults fill the other axes
+
+    def test_too_many_scenarios(self, api_client, valid_request_data, settings):
+        settings.WHAT_IF_MAX_SCENARIOS = 8
+
+        response = api_client.post(reverse('what-if'), {
+            **valid_request_data,
+            'max_range_miles': [300, 400, 500],
+            'fuel_levels': [0.5, 1.0, 0.25],
+        }, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'non_field_errors' in response.data
+
+
+@pytest.mark.django_db
+class TestAlternativesView:
+    @pytest.fixture(autouse=True)
+    def alternatives(self, patch_route_planner):
+        stop = StationRecord(7, "Cheap Fuel ", "1 Main St", "Reading", "PA", 40.3, -75.9, 2.5)
+        return patch_route_planner('alternatives', {
+            'total_distance': 600.0,
+            'objective': 'cost',
+            'route': [(40.7, -74.0), (40.3, -80.0)],
+            'alternatives': [
+                {'total_fuel_cost': Decimal('125'), 'stops': [stop]},
+                {'total_fuel_cost': Decimal('150'), 'stops': [stop, stop]},
+            ],
+        })
+
+    def test_ranked_plans(self, api_client, valid_request_data, alternatives):
+        response = api_client.post(reverse('alternatives'), {
+            **valid_request_data,
+            'count': 2,
+            'avoid': ['Pricey Oil'],
+        }, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [plan['rank'] for plan in response.data['alternatives']] == [1, 2]
+        assert response.data['alternatives'][0]['total_fuel_cost'] == '125.00000'
+        assert response.data['alternatives'][0]['stops'][0]['name'] == 'Cheap Fuel'
+        assert response.data['route_points'][0] == {'latitude': 40.7, 'longitude': -74.0}
+        args, kwargs = alternatives.call_args
+        assert args[2] == 2 and kwargs['objective'] == 'cost' and kwargs['avoid'] == ['Pricey Oil']
+
+    def test_too_many_plans(self, api_client, valid_request_data, settings):
+        response = api_client.post(reverse('alternatives'), {
+            **valid_request_data,
+            'count': settings.ALTERNATIVE_PLANS_MAX + 1,
+        }, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'count' in response.data
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('patch_route_planner')
+class TestReplanRouteView:
+    def test_unknown_plan(self, api_client, settings):
+        settings.ROUTE_PLAN_PERSIST = True
+        response = api_client.post(reverse('replan-route'), {
+            'plan_id': '00000000-0000-0000-0000-000000000000',
+            'latitude': 40.7,
+            'longitude': -74.0,
+            'fuel_level': 0.5,
+        }, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_invalid_fuel_level(self, api_client):
+        response = api_client.post(reverse('replan-route'), {
+            'plan_id': '00000000-0000-0000-0000-000000000000',
+            'latitude': 40.7,
+            'longitude': -74.0,
+            'fuel_level': 1.5,
+        }, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'fuel_level' in response.data
+
+
+class TestProviderStatsView:
+    def test_providers_apart_from_quota(self, api_client, mocker):
+        mocker.patch('api.views.get_routing_service', return_value=Mock(stats=Mock(return_value={'google': {}})))
+
+        response = api_client.get(reverse('provider-stats'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {'providers', 'quota'}
+        assert response.data['providers'] == {'google': {}}
+
+
+class TestRoutePointData:
+    def test_matches_serializer(self):
+        points = [
+            (10.0, 20.0),
+            {'latitude': 30, 'longitude': 40.5},
+            {'latitude': 31.0, 'longitude': 41.0, 'name': ' Test Station ', 'address': '123 Test St',
+             'city': 'Test City', 'state': 'TS', 'price': 3.123456789},
+        ]
+        serializer = RouteResponseSerializer(data={
+            'total_distance': 10.0,
+            'total_fuel_cost': 3.5,
+            'route_points': [RouteWithStopSerializer(point).data for point in points],
+        })
+        serializer.is_valid(raise_exception=True)
+
+        expected = [dict(point) for point in serializer.data['route_points']]
+        assert [route_point_data(point) for point in points] == expected
+
+
+class TestReadinessView:
+    @pytest.fixture
+    def warmup(self, mocker):
+        warmup = WarmUp()
+        mocker.patch('api.views.get_warmup', return_value=warmup)
+        return warmup
+
+    def test_ready_when_required_steps_succeed(self, api_client, warmup):
+        warmup.steps = [
+            ('database', Mock(return_value={'databases': ['default']}), True),
+            ('hot_lanes', Mock(side_effect=RuntimeError('no plans')), False),
+        ]
+
+        warmup.start()
+        warmup.finished.wait(5)
+        response = api_client.get(reverse('ready'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['ready'] is True
+        assert response.data['steps']['hot_lanes'] == {
+            'ok': False, 'error': 'no plans', 'required': False, 'seconds': pytest.approx(0, abs=1)}
+
+    def test_not_ready_while_warming_up(self, api_client, warmup):
+        connected = threading.Event()
+        warmup.steps = [('database', connected.wait, True)]
+
+        response = api_client.get(reverse('ready'))
+        connected.set()
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.data['warming_up'] is True
+
+    def test_not_ready_when_a_required_step_fails(self, api_client, warmup):
+        warmup.steps = [('database', Mock(side_effect=RuntimeError('connection refused')), True)]
+
+        warmup.start()
+        warmup.finished.wait(5)
+        response = api_client.get(reverse('ready'))
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.data['steps']['database']['error'] == 'connection refused'
+
+    @pytest.mark.django_db
+    def test_hot_lanes_are_planned_from_their_stored_route(self, settings, call_budget):
+        settings.ROUTE_OPTIMIZER = 'greedy'
+        # A 50 mile tank from New York to Riverhead stops once, ~47 miles along
+        FuelStation.objects.create(name="On Route", location=Point(-73.1, 40.7128), retail_price=3.50)
+        RoutePlanStore(SpotterFuelStationRepository(None), corridor_miles=25).save(
+            'New York, NY', 'Riverhead, NY', [(40.7128, -74.0060 + 0.0753 * i) for i in range(21)], 78.9, 50, 10,
+            candidate_station_ids=[])
+
+        with call_budget(directions=0, geocode=0):
+            detail = WarmUp().warm_hot_lanes()
+
+        assert detail == {'lanes': 1}
+        assert RoutePlan.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestPlanJobsView:
+    def test_submit_and_poll(self, api_client, valid_request_data):
+        response = api_client.post(reverse('plan-jobs'), valid_request_data, format='json')
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == PlanJob.QUEUED
+        assert response['Location'] == reverse('plan-job', args=[response.data['job_id']])
+
+        polled = api_client.get(response['Location'])
+        assert polled.status_code == status.HTTP_200_OK
+        assert polled.data['start_location'] == 'New York, NY'
+        assert polled.data['result'] is None
+
+    def test_unknown_job(self, api_client):
+        response = api_client.get(reverse('plan-job', args=['00000000-0000-0000-0000-000000000000']))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -3,5 +3,12 @@ from . import views
 
 urlpatterns = [
     path('route/', views.OptimizeRouteView.as_view(), name='optimize-route'),
+    path('route/replan/', views.ReplanRouteView.as_view(), name='replan-route'),
+    path('route/what-if/', views.WhatIfView.as_view(), name='what-if'),
+    path('route/alternatives/', views.AlternativesView.as_view(), name='alternatives'),
     path('route/map/', views.map_view, name='map'),
+    path('route/jobs/', views.PlanJobsView.as_view(), name='plan-jobs'),
+    path('route/jobs/<uuid:job_id>/', views.PlanJobView.as_view(), name='plan-job'),
+    path('route/providers/', views.ProviderStatsView.as_view(), name='provider-stats'),
+    path('ready/', views.ReadinessView.as_view(), name='ready'),
 ]
@@ -1,79 +1,252 @@
+import hashlib
 import traceback
+from django.conf import settings
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 
 
+from .renderers import (
+    EncodedPolylineRenderer,
+    GeoJSONRenderer,
+    MessagePackRenderer,
+    RoutePlanRenderer,
+    compact_route_plan,
+)
+from .db_routers import pinned_replica
+from .models import PlanJob, RoutePlan
 from .serializers import (
+    AlternativesRequestSerializer,
+    PlanJobSerializer,
+    ReplanRequestSerializer,
     RouteRequestSerializer,
-    RouteResponseSerializer,
-    RouteWithStopSerializer,
+    WhatIfRequestSerializer,
+    alternatives_response_data,
+    route_response_data,
 )
 
 from .services import (
-    GoogleMapsGeocodingService,
+    get_routing_service,
     SpotterFuelStationRepository,
-    GreedyRouteOptimizer,
     StandardFuelCostCalculator,
-    FoliumMapPlotter,
+    RoutePlanner,
+    RoutePlanStore,
+    get_route_coalescer,
+    get_quota_manager,
+    get_map_plotter_class,
+    get_route_optimizer_class,
+    get_price_version,
 )
+from .services.plan_jobs import get_plan_job_queue
+from .services.route_geometry import geometry_hash
+from .services.route_reuse import build_route_reuse
+from .warmup import get_warmup
 
 
 class OptimizeRouteView(APIView):
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [
+        GeoJSONRenderer,
+        EncodedPolylineRenderer,
+        MessagePackRenderer,
+    ]
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.geocoding_service = GoogleMapsGeocodingService()
+        self.geocoding_service = get_routing_service()
         self.station_repository = SpotterFuelStationRepository(
             self.geocoding_service)
-        self.route_optimizer = GreedyRouteOptimizer(
-            max_range_miles=500,
-            mpg=10
+        self.route_optimizer = get_route_optimizer_class(settings.ROUTE_OPTIMIZER)(
+            max_range_miles=settings.VEHICLE_MAX_RANGE_MILES,
+            mpg=settings.VEHICLE_MPG
+        )
+        self.cost_calculator = StandardFuelCostCalculator(
+            mpg=settings.VEHICLE_MPG, max_range_miles=settings.VEHICLE_MAX_RANGE_MILES)
+        # Plotters are registered by name and imported on first use
+        self.map_plotter = (
+            get_map_plotter_class(settings.MAP_PLOTTER)() if settings.MAP_PLOTTER else None
         )
-        self.cost_calculator = StandardFuelCostCalculator()
-        self.map_plotter = FoliumMapPlotter()
+        self.plan_store = (
+            RoutePlanStore(self.station_repository, settings.ROUTE_CORRIDOR_MILES)
+            if settings.ROUTE_PLAN_PERSIST else None
+        )
+        self.route_planner = RoutePlanner(
+            self.geocoding_service,
+            self.route_optimizer,
+            self.cost_calculator,
+            coalescer=get_route_coalescer(),
+            plan_store=self.plan_store,
+            station_repository=self.station_repository,
+            corridor_miles=settings.ROUTE_CORRIDOR_MILES,
+            route_reuse=build_route_reuse(self.geocoding_service),
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        # Station and price reads of the route pipeline come from one replica, the rest of the API reads the primary
+        with pinned_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request):
+        # Same as POST with the locations as query parameters, the cacheable form for polling clients
+        return self.optimize(request, RouteRequestSerializer(data=request.query_params))
 
     def post(self, request):
-        serializer = RouteRequestSerializer(data=request.data)
+        return self.optimize(request, RouteRequestSerializer(data=request.data))
+
+    def optimize(self, request, serializer: RouteRequestSerializer) -> Response:
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        start_location = serializer.validated_data['start_location']
+        end_location = serializer.validated_data['end_location']
+        waypoints = serializer.validated_data['waypoints']
         try:
-            # Get the route, with googlemaps, we don't need coordinates
-            route = self.geocoding_service.get_route(
-                serializer.validated_data['start_location'],
-                serializer.validated_data['end_location']
+            # One directions call for the whole itinerary, whatever the number of waypoints
+            directions = self.route_planner.directions(start_location, end_location, waypoints)
+            etag = self.route_etag(request, directions.route_points)
+            if if_none_match(request, etag):
+                # The client's copy is current, skip the optimizer and serializers
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                # Identical concurrent requests share a single computation
+                plan = self.route_planner.plan(start_location, end_location, directions=directions, waypoints=waypoints)
+                response = self.plan_response(request, plan)
+            response['ETag'] = etag
+            response['Cache-Control'] = f'private, max-age={settings.ROUTE_CACHE_MAX_AGE}, must-revalidate'
+            return response
+
+        except Exception as e:
+            traceback.print_exc()
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            # Extract route details
-            route_coords = self.geocoding_service.get_route_coordinates(route)
-            total_distance = self.geocoding_service.get_route_distance(route)
-            # Find optimal fuel stops
-            fuel_stops = self.route_optimizer.find_optimal_stops(
-                route_coords,
-                total_distance,
+
+    def route_etag(self, request, route_coords: list[tuple[float, float]]) -> str:
+        """Strong ETag of everything the plan depends on: geometry, prices, vehicle, optimizer and format."""
+        price_version = None
+        if self.plan_store is not None:
+            # Prices of the last plan of this route, unless a price load changed its corridor since
+            price_version = self.plan_store.price_version(
+                route_coords, self.route_optimizer.max_range_miles, self.route_optimizer.mpg)
+        return quote_etag(hashlib.blake2b('|'.join(map(str, (
+            geometry_hash(route_coords),
+            get_price_version() if price_version is None else price_version,
+            settings.ROUTE_OPTIMIZER,
+            self.route_optimizer.max_range_miles,
+            self.route_optimizer.mpg,
+            request.accepted_renderer.format,
+        ))).encode(), digest_size=16).hexdigest())
+
+    def plan_response(self, request, plan: dict) -> Response:
+        if isinstance(request.accepted_renderer, RoutePlanRenderer):
+            # Compact formats skip the per point serializers altogether
+            return Response(compact_route_plan(plan))
+
+        response_data = route_response_data(plan)
+        # Optional: plot the map to see the route
+        if self.map_plotter is not None:
+            self.map_plotter.plot_map(response_data['route_points'])
+
+        return Response(response_data)
+
+
+class ReplanRouteView(OptimizeRouteView):
+    """Re-plan the rest of a stored route from the driver's position and fuel level."""
+    http_method_names = ['post', 'options']
+
+    def post(self, request):
+        serializer = ReplanRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if self.plan_store is None:
+            return Response(
+                {'error': 'Route plans are not stored, set ROUTE_PLAN_PERSIST to enable re-planning.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            stored_plan = self.plan_store.get(serializer.validated_data['plan_id'])
+        except RoutePlan.DoesNotExist:
+            return Response({'error': 'Route plan not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            # Re-plan with the vehicle the plan was made for
+            route_optimizer = get_route_optimizer_class(settings.ROUTE_OPTIMIZER)(
+                max_range_miles=stored_plan.max_range_miles,
+                mpg=stored_plan.mpg
+            )
+            route_planner = RoutePlanner(
+                self.geocoding_service,
+                route_optimizer,
+                StandardFuelCostCalculator(mpg=stored_plan.mpg, max_range_miles=stored_plan.max_range_miles),
+                plan_store=self.plan_store,
+            )
+            plan = route_planner.replan(
+                stored_plan,
+                (serializer.validated_data['latitude'], serializer.validated_data['longitude']),
+                serializer.validated_data['fuel_level']
+            )
+            return self.plan_response(request, plan)
+
+        except Exception as e:
+            traceback.print_exc()
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            # Calculate total fuel cost
-            total_fuel_cost = self.cost_calculator.calculate_total_cost(
-                fuel_stops['stops']
+
+
+class WhatIfView(OptimizeRouteView):
+    """Plan one route for a grid of vehicles: tank ranges x mpg x starting fuel levels."""
+    http_method_names = ['post', 'options']
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def post(self, request):
+        serializer = WhatIfRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            return Response(self.route_planner.what_if(
+                serializer.validated_data['start_location'],
+                serializer.validated_data['end_location'],
+                serializer.validated_data['max_range_miles'],
+                serializer.validated_data['mpg'],
+                serializer.validated_data['fuel_levels'],
+                waypoints=serializer.validated_data['waypoints'],
+            ))
+
+        except Exception as e:
+            traceback.print_exc()
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-            route_points_data = [
-                RouteWithStopSerializer(point).data
-                for point in fuel_stops['route']
-            ]
 
-            response_data = {
-                'total_distance': total_distance,
-                'total_fuel_cost': total_fuel_cost,
-                'route_points': route_points_data
-            }
+class AlternativesView(OptimizeRouteView):
+    """Rank the best plans of one route, e.g. the cheapest ones or the ones with the fewest stops."""
+    http_method_names = ['post', 'options']
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
-            response_serializer = RouteResponseSerializer(data=response_data)
-            response_serializer.is_valid(raise_exception=True)
-            # Optional: plot the map to see the route
-            self.map_plotter.plot_map(route_points_data)
+    def post(self, request):
+        serializer = AlternativesRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response(response_serializer.data)
+        try:
+            return Response(alternatives_response_data(self.route_planner.alternatives(
+                serializer.validated_data['start_location'],
+                serializer.validated_data['end_location'],
+                serializer.validated_data['count'],
+                objective=serializer.validated_data['objective'],
+                avoid=serializer.validated_data['avoid'],
+                waypoints=serializer.validated_data['waypoints'],
+            )))
 
         except Exception as e:
             traceback.print_exc()
@@ -83,6 +256,65 @@ class OptimizeRouteView(APIView):
             )
 
 
+class PlanJobsView(APIView):
+    """Submit a plan to run in the background, poll PlanJobView for its result."""
+
+    def post(self, request):
+        serializer = RouteRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        job = get_plan_job_queue().submit(
+            serializer.validated_data['start_location'],
+            serializer.validated_data['end_location'],
+            waypoints=serializer.validated_data['waypoints'],
+            optimizer=settings.ROUTE_OPTIMIZER,
+            max_range_miles=settings.VEHICLE_MAX_RANGE_MILES,
+            mpg=settings.VEHICLE_MPG,
+        )
+        url = reverse('plan-job', args=[job.pk])
+        return Response(
+            {**PlanJobSerializer(job).data, 'url': request.build_absolute_uri(url)},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': url},
+        )
+
+
+class PlanJobView(APIView):
+    def get(self, request, job_id):
+        try:
+            job = PlanJob.objects.get(pk=job_id)
+        except PlanJob.DoesNotExist:
+            return Response({'error': 'Plan job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PlanJobSerializer(job).data)
+
+
+class ProviderStatsView(APIView):
+    def get(self, request):
+        return Response({
+            'providers': get_routing_service().stats(),
+            'quota': get_quota_manager().stats(),
+        })
+
+
+class ReadinessView(APIView):
+    """Load balancer probe: 200 once this worker is warmed up, 503 before."""
+
+    def get(self, request):
+        warmup = get_warmup()
+        warmup.start()  # no-op when it already started at boot, starts it in workers forked after boot
+        return Response(
+            warmup.status(),
+            status=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+def if_none_match(request, etag: str) -> bool:
+    """Whether the request's If-None-Match lists the ETag, or any representation with '*'."""
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return etag in etags or '*' in etags
+
+
 def map_view(request):
     # Render the saved map
     return render(request, "route_map.html")
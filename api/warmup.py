@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .db_routers import check_connections, healthy_replicas
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """
+    Work a fresh worker would otherwise do on its first requests, run once in a background thread:
+    database connections, library and client loading, station data, the pages of hot lanes and the
+    listener for price changes.
+    The worker is ready once every step ran and the required ones succeeded.
+    """
+
+    def __init__(self):
+        self.steps: list[tuple[str, Callable[[], Any], bool]] = [
+            ('database', self.warm_database, True),
+            ('libraries', self.warm_libraries, True),
+            ('stations', self.warm_stations, False),
+            ('hot_lanes', self.warm_hot_lanes, False),
+            ('price_listener', self.warm_price_listener, False),
+        ]
+        self.results: dict[str, dict[str, Any]] = {}
+        self.started_at = None
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self.started_at = time.monotonic()
+                self._thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+                self._thread.start()
+
+    def run(self):
+        try:
+            for name, step, required in self.steps:
+                started = time.perf_counter()
+                try:
+                    detail = step()
+                    result = {'ok': True, 'detail': detail}
+                except Exception as e:
+                    logger.log(logging.ERROR if required else logging.WARNING, "Warm-up step %s failed: %s", name, e)
+                    result = {'ok': False, 'error': str(e)}
+                result.update({'required': required, 'seconds': round(time.perf_counter() - started, 3)})
+                with self._lock:
+                    self.results[name] = result
+            logger.info("Warm-up finished in %.1fs.", time.monotonic() - self.started_at)
+        finally:
+            # Connections are per thread, don't leave this one's open
+            connections.close_all()
+            self.finished.set()
+
+    def _ready(self) -> bool:
+        # Call with the lock held
+        return self.finished.is_set() and all(result['ok'] for result in self.results.values() if result['required'])
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._ready()
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'ready': self._ready(),
+                'warming_up': self._thread is not None and not self.finished.is_set(),
+                'steps': {name: dict(result) for name, result in self.results.items()},
+            }
+
+    def warm_database(self) -> dict[str, Any]:
+        """Connect to every database, which also loads the PostGIS backend and GEOS/GDAL."""
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        # A replica that can't be reached doesn't keep the worker from serving, its reads go elsewhere
+        check_connections()
+        return {'databases': ['default', *healthy_replicas()]}
+
+    def warm_libraries(self) -> dict[str, Any]:
+        """Import and build what the first route request would: provider clients, optimizer, renderers and plotter."""
+        from . import renderers  # noqa: F401 msgpack and the compact formats
+        from .services import get_map_plotter_class, get_route_optimizer_class, get_routing_service
+
+        get_routing_service()
+        get_route_optimizer_class(settings.ROUTE_OPTIMIZER)
+        if settings.MAP_PLOTTER:
+            get_map_plotter_class(settings.MAP_PLOTTER)
+        return {'routing_providers': settings.ROUTING_PROVIDERS}
+
+    def warm_stations(self) -> dict[str, Any]:
+        """Load the station graph and price version, and run the nearest station query once."""
+        from django.contrib.gis.geos import Point
+
+        from .models import FuelStation
+        from .services import GreedyRouteOptimizer, get_price_version
+        from .services.station_graph import get_station_graph
+
+        detail = {'price_version': get_price_version()}
+        if settings.ROUTE_OPTIMIZER == 'graph':
+            graph = get_station_graph()
+            detail['graph_stations'] = len(graph) if graph is not None else 0
+
+        location = (FuelStation.objects
+                    .filter(location__isnull=False, retail_price__isnull=False)
+                    .values_list('location', flat=True)
+                    .first())
+        if location is not None:
+            # Reads the spatial index and the cheapest rows around a real station into the database cache
+            optimizer = GreedyRouteOptimizer(max_range_miles=settings.VEHICLE_MAX_RANGE_MILES, mpg=settings.VEHICLE_MPG)
+            optimizer.find_next_station(Point(location.x, location.y, srid=4326), settings.VEHICLE_MAX_RANGE_MILES)
+        return detail
+
+    def warm_hot_lanes(self) -> dict[str, Any]:
+        """
+        Plan the most requested lanes of the last WARMUP_LANE_WINDOW_HOURS once from their stored route, through the
+        optimizer and cost calculator of real requests. No directions are fetched and nothing is stored.
+        """
+        from .models import RoutePlan
+        from .services import (
+            FakeGeocodingService,
+            SpotterFuelStationRepository,
+            StandardFuelCostCalculator,
+            get_route_optimizer_class,
+        )
+        from .services.route_plan_store import RoutePlanStore
+        from .services.route_planner import Directions, RoutePlanner
+
+        since = timezone.now() - timedelta(hours=settings.WARMUP_LANE_WINDOW_HOURS)
+        lanes = (RoutePlan.objects
+                 .filter(created_at__gte=since)
+                 .values('start_location', 'end_location')
+                 .annotate(requests=Count('id'), latest=Max('created_at'))
+                 .order_by('-requests')[:settings.WARMUP_HOT_LANES])
+
+        repository = SpotterFuelStationRepository(None)
+        planners = {}  # by (max_range_miles, mpg)
+        planned = 0
+        for lane in lanes:
+            plan = RoutePlan.objects.filter(
+                start_location=lane['start_location'],
+                end_location=lane['end_location'],
+                created_at=lane['latest'],
+            ).first()
+            if plan is None:
+                continue
+            key = (plan.max_range_miles, plan.mpg)
+            if key not in planners:
+                planners[key] = RoutePlanner(
+                    FakeGeocodingService(),  # never asked, the stored route stands in for the directions
+                    get_route_optimizer_class(settings.ROUTE_OPTIMIZER)(max_range_miles=plan.max_range_miles,
+                                                                        mpg=plan.mpg),
+                    StandardFuelCostCalculator(mpg=plan.mpg, max_range_miles=plan.max_range_miles),
+                    station_repository=repository,
+                    corridor_miles=settings.ROUTE_CORRIDOR_MILES,
+                )
+            planners[key].plan(
+                plan.start_location,
+                plan.end_location,
+                directions=Directions(RoutePlanStore.route_points(plan), plan.total_distance),
+            )
+            planned += 1
+        return {'lanes': planned}
+
+    def warm_price_listener(self) -> dict[str, Any]:
+        """Start listening for price loads of other processes, to drop cached prices as soon as they change."""
+        if not settings.PRICE_LISTENER_ENABLED or connections['default'].vendor != 'postgresql':
+            return {'listening': False}
+
+        from .services.price_events import start_price_listener
+
+        listener = start_price_listener()
+        if not listener.listening.wait(5):
+            raise Exception(f"Not listening on {listener.channel} yet, still trying.")
+        return {'listening': True, 'channel': listener.channel}
+
+
+_warmup = None
+_warmup_pid = None
+_warmup_lock = threading.Lock()
+
+
+def get_warmup() -> WarmUp:
+    """Warm-up of this process. Forked workers get their own, threads don't survive a fork."""
+    global _warmup, _warmup_pid
+    with _warmup_lock:
+        if _warmup is None or _warmup_pid != os.getpid():
+            _warmup, _warmup_pid = WarmUp(), os.getpid()
+        return _warmup
+
+
+def start_warmup() -> WarmUp:
+    warmup = get_warmup()
+    warmup.start()
+    return warmup
@@ -0,0 +1,171 @@
+"""
+Local stand-in for the Google Maps geocoding and directions web services, for load tests without the
+live API. Answers with recorded directions responses when it has them, with the synthetic straight line
+routes of FakeGeocodingService otherwise, after a configurable latency.
+
+    python benchmarks/fake_provider.py [--port 8081] [--latency-ms 150] [--jitter-ms 50] [--error-rate 0.01]
+                                       [--recordings routes.jsonl]
+
+Point the service at it with GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8081, ROUTING_PROVIDERS=google and any
+GOOGLE_MAPS_API_KEY starting with AIza. Recordings hold one {"origin": ..., "destination": ..., "routes": [...]}
+object per line, "routes" being the list of a Google directions response. Needs no database.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter.settings')
+
+# Coordinates as googlemaps sends them, "40.712800,-74.006000"
+LAT_LNG = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def location_key(location: str) -> str:
+    return ' '.join(location.lower().split())
+
+
+def load_recordings(path: str) -> dict[tuple, list]:
+    """Recorded directions responses by (origin, destination, waypoints)."""
+    recordings = {}
+    with open(path) as lines:
+        for line in lines:
+            if line.strip():
+                recording = json.loads(line)
+                key = (location_key(recording['origin']), location_key(recording['destination']),
+                       tuple(location_key(waypoint) for waypoint in recording.get('waypoints', [])))
+                recordings[key] = recording['routes']
+    return recordings
+
+
+class FakeProvider:
+    """Google-shaped answers of the fake service, with the latency and failures of a real provider."""
+
+    def __init__(
+        self,
+        latency_ms: float = 150,
+        jitter_ms: float = 50,
+        error_rate: float = 0.0,
+        recordings: dict[tuple, list] | None = None,
+        steps: int = 100,
+        seed: int = 0,
+    ):
+        from api.services.fake_geocoding_service import FakeGeocodingService
+        from api.services.synthetic_stations import CITY_LOCATIONS
+
+        # Synthetic lanes run between these cities, they geocode to where the synthetic stations are
+        self.service = FakeGeocodingService(locations=CITY_LOCATIONS, steps=steps)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.recordings = recordings or {}
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def answer(self, endpoint: str, params: dict[str, str]) -> dict:
+        with self._lock:
+            self.calls[endpoint] += 1
+            latency = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            failed = self.random.random() < self.error_rate
+        time.sleep(latency)
+        if failed:
+            with self._lock:
+                self.calls['errors'] += 1
+            return {'status': 'UNKNOWN_ERROR', 'error_message': 'Injected by the fake provider.'}
+
+        if endpoint == 'geocode':
+            latitude, longitude = self.service.get_coordinates(params.get('address', ''))
+            return {'status': 'OK', 'results': [{
+                'formatted_address': params.get('address', ''),
+                'geometry': {'location': {'lat': latitude, 'lng': longitude}},
+            }]}
+        if endpoint == 'directions':
+            return {'status': 'OK', 'routes': self.directions(params)}
+        return {'status': 'INVALID_REQUEST', 'error_message': f"Unknown endpoint {endpoint}."}
+
+    def directions(self, params: dict[str, str]) -> list:
+        origin, destination = params.get('origin', ''), params.get('destination', '')
+        waypoints = [waypoint for waypoint in params.get('waypoints', '').split('|') if waypoint]
+        recorded = self.recordings.get(
+            (location_key(origin), location_key(destination), tuple(location_key(waypoint) for waypoint in waypoints)))
+        if recorded is not None:
+            return recorded
+        return self.service.get_route(
+            self._location(origin), self._location(destination), [self._location(waypoint) for waypoint in waypoints])
+
+    @staticmethod
+    def _location(location: str) -> tuple[float, float] | str:
+        match = LAT_LNG.match(location)
+        return (float(match[1]), float(match[2])) if match else location
+
+
+def start_fake_provider(provider: FakeProvider, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Serve the provider from a daemon thread, server_address holds the port when 0 picked a free one."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, as the googlemaps requests session expects
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = re.match(r'^/maps/api/(\w+)/json$', url.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            body = json.dumps(provider.answer(match[1] if match else '', params)).encode()
+            self.send_response(200 if match else 404)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # one line per call would drown the report
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-provider', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=150, help='Mean latency of every call')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='Standard deviation of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls answered with an error')
+    parser.add_argument('--recordings', type=str, help='JSON lines of recorded directions responses')
+    parser.add_argument('--steps', type=int, default=100, help='Steps of every synthetic route leg')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    provider = FakeProvider(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        recordings=load_recordings(args.recordings) if args.recordings else None,
+        steps=args.steps,
+        seed=args.seed,
+    )
+    server = start_fake_provider(provider, args.host, args.port)
+    print(f"Fake provider on http://{args.host}:{server.server_address[1]}, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(dict(provider.calls))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Microbenchmark of the per-station and per-point work of a route plan, before and after
+moving the hot path off the ORM:
+
+- materialising a station: FuelStation model instance with a GEOS Point, or a StationRecord
+- serializing route points: RouteWithStopSerializer per point plus response validation,
+  or route_point_data()
+
+    python benchmarks/hot_path.py [--stations 10000] [--points 5000] [--repeat 5] [--json out.json]
+
+Needs GDAL/GEOS for the Point, no database.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter.settings')
+
+
+def measure(function, operations: int, repeat: int) -> dict:
+    """Best of repeat runs in microseconds per operation, then one run under tracemalloc for the memory peak."""
+    best = min(_timed(function) for _ in range(repeat))
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'us_per_op': round(best / operations * 1e6, 3), 'peak_memory_kb': round(peak / 1024)}
+
+
+def _timed(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def station_rows(count: int) -> list[tuple]:
+    """Rows as the database returns them, in StationRecord column order."""
+    from api.services.synthetic_stations import generate_stations
+
+    return [
+        (i, station['name'], station['address'], station['city'], station['state'],
+         station['latitude'], station['longitude'], station['retail_price'])
+        for i, station in enumerate(generate_stations(count, seed=0), start=1)
+    ]
+
+
+def route(points: int, stations: list[tuple]) -> list[dict]:
+    """A route of plain points with a stop every few hundred of them, like the optimizers return."""
+    route_points = []
+    for i in range(points):
+        route_points.append({'latitude': 40.0 + i * 1e-4, 'longitude': -75.0 - i * 1e-4})
+        if i % 500 == 499:
+            _, name, address, city, state, latitude, longitude, price = stations[i % len(stations)]
+            route_points.append({'latitude': latitude, 'longitude': longitude, 'name': name,
+                                 'address': address, 'city': city, 'state': state, 'price': price})
+    return route_points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stations', type=int, default=10000, help='Stations materialised per run')
+    parser.add_argument('--points', type=int, default=5000, help='Route points serialized per run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', type=str, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    import django
+
+    django.setup()
+    from django.contrib.gis.geos import Point
+
+    from api.models import FuelStation
+    from api.serializers import RouteResponseSerializer, RouteWithStopSerializer, route_point_data
+    from api.services.station_records import StationRecord
+
+    rows = station_rows(args.stations)
+    route_points = route(args.points, rows)
+
+    def model_instances():
+        return [
+            FuelStation(id=id, name=name, address=address, city=city, state=state,
+                        location=Point(longitude, latitude, srid=4326), retail_price=price)
+            for id, name, address, city, state, latitude, longitude, price in rows
+        ]
+
+    def records():
+        return [StationRecord(*row) for row in rows]
+
+    def serializer_points():
+        serializer = RouteResponseSerializer(data={
+            'total_distance': 1000.0,
+            'total_fuel_cost': 500.0,
+            'route_points': [RouteWithStopSerializer(point).data for point in route_points],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.data
+
+    def fast_points():
+        serializer = RouteResponseSerializer(data={'total_distance': 1000.0, 'total_fuel_cost': 500.0})
+        serializer.is_valid(raise_exception=True)
+        return {**serializer.data, 'route_points': [route_point_data(point) for point in route_points]}
+
+    results = {
+        'stations': {
+            'model_instances': measure(model_instances, len(rows), args.repeat),
+            'records': measure(records, len(rows), args.repeat),
+        },
+        'route_points': {
+            'serializer': measure(serializer_points, len(route_points), args.repeat),
+            'route_point_data': measure(fast_points, len(route_points), args.repeat),
+        },
+    }
+
+    for group, timings in results.items():
+        legacy, fast = timings.values()
+        print(f"{group} (speedup {legacy['us_per_op'] / fast['us_per_op']:.1f}x)")
+        for name, timing in timings.items():
+            print(f"  {name:18} {timing['us_per_op']:9.3f} us/op  peak {timing['peak_memory_kb']:7d} KB")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
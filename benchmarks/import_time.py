@@ -0,0 +1,102 @@
+"""
+Cold start benchmark based on `python -X importtime`.
+
+Runs each startup scenario in a fresh interpreter, reports the wall clock time and the
+slowest imports, and fails when a scenario exceeds its budget or imports a module that
+should only be loaded on first use.
+
+    python benchmarks/import_time.py [--repeat 5] [--budget-scale 1.5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SETUP = (
+    "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter.settings'); "
+)
+
+# name -> (code run in a fresh interpreter, wall clock budget in milliseconds)
+SCENARIOS = {
+    # What every management command pays before its handle() runs
+    'manage.py': (SETUP + "import django; django.setup(); "
+                  "from django.core.management import load_command_class; "
+                  "load_command_class('api', 'load_fuel_prices')", 1500),
+    # Web worker boot, including the URLconf loaded by the first request. The warm-up thread
+    # loads the heavy modules on purpose, after boot, so it is left out of the measurement
+    'worker': (SETUP + "os.environ['WARMUP_ON_START'] = 'false'; import spotter.wsgi; import spotter.urls", 1500),
+}
+
+# Heavy modules that neither scenario may import eagerly
+LAZY_MODULES = ['folium', 'googlemaps', 'openrouteservice', 'pandas', 'numpy']
+
+
+def run_scenario(code: str) -> tuple[float, list[tuple[int, int, str]]]:
+    """Return wall clock seconds and (self_us, cumulative_us, module) for every import."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BASE_DIR,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': ''},
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((int(self_us), int(cumulative_us), module.strip()))
+    return elapsed, imports
+
+
+def benchmark(name: str, repeat: int = 5, budget_scale: float = 1.0) -> dict:
+    code, budget_ms = SCENARIOS[name]
+    runs = [run_scenario(code) for _ in range(repeat)]
+    # The fastest run is the least disturbed by the machine, it is the one held to the budget
+    elapsed, imports = min(runs, key=lambda run: run[0])
+    top_level = {module.split('.')[0] for _, _, module in imports}
+
+    return {
+        'name': name,
+        'wall_ms': round(elapsed * 1000, 1),
+        'budget_ms': budget_ms * budget_scale,
+        'import_ms': round(sum(self_us for self_us, _, _ in imports) / 1000, 1),
+        'slowest': sorted(imports, key=lambda item: item[1], reverse=True)[:10],
+        'eager_heavy_modules': sorted(top_level & set(LAZY_MODULES)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='Multiply every budget, e.g. for slow CI machines')
+    args = parser.parse_args()
+
+    failed = False
+    for name in SCENARIOS:
+        result = benchmark(name, args.repeat, args.budget_scale)
+        over_budget = result['wall_ms'] > result['budget_ms']
+        failed |= over_budget or bool(result['eager_heavy_modules'])
+
+        print(f"{name}: {result['wall_ms']} ms wall, {result['import_ms']} ms in imports "
+              f"(budget {result['budget_ms']:.0f} ms){' OVER BUDGET' if over_budget else ''}")
+        if result['eager_heavy_modules']:
+            print(f"  eagerly imports: {', '.join(result['eager_heavy_modules'])}")
+        for _, cumulative_us, module in result['slowest']:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+End-to-end load test of the route endpoint against a local fake routing provider.
+
+Starts benchmarks/fake_provider.py in process, starts the service pointed at it (or uses --target), then
+drives POST /api/route/ at a fixed concurrency with a weighted mix of lanes, and reports the throughput,
+latency percentiles and error rates.
+
+    python benchmarks/load_test.py [--concurrency 16] [--requests 2000 | --duration 60] [--lanes lanes.jsonl]
+                                   [--latency-ms 150] [--jitter-ms 50] [--error-rate 0.01] [--json out.json]
+
+Lanes hold one {"start_location": ..., "end_location": ..., "waypoints": [...], "weight": ...} object per line,
+the lanes file of plan_lanes works as is. Without one, --synthetic-lanes lanes between the cities of the
+synthetic stations are used, load them first with generate_synthetic_stations. The service reads the database
+from settings and keeps its provider quotas, raise GOOGLE_*_QPS to measure past them.
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter.settings')
+
+SERVER_COMMAND = f'{shlex.quote(sys.executable)} manage.py runserver 127.0.0.1:{{port}} --noreload'
+
+
+def load_lanes(path: str | None, synthetic_lanes: int, seed: int) -> list[dict]:
+    if path is None:
+        from api.services.synthetic_stations import generate_lanes
+
+        return generate_lanes(synthetic_lanes, seed=seed)
+    with open(path) as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def start_service(command: str, port: int, provider_url: str) -> subprocess.Popen:
+    """The service as a child process, routing through the fake provider only."""
+    env = {
+        **os.environ,
+        'ROUTING_PROVIDERS': 'google',
+        'GOOGLE_MAPS_BASE_URL': provider_url,
+        'GOOGLE_MAPS_API_KEY': 'AIza-load-test',  # googlemaps rejects keys not shaped like Google's
+        'MAP_PLOTTER': '',
+    }
+    return subprocess.Popen(shlex.split(command.format(port=port)), cwd=BASE_DIR, env=env)
+
+
+def wait_until_ready(target: str, timeout: float, service: subprocess.Popen | None = None):
+    """Poll the readiness probe, so the warm-up isn't measured."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if service is not None and service.poll() is not None:
+            raise RuntimeError(f"The service exited with code {service.returncode}")
+        try:
+            if requests.get(f'{target}/api/ready/', timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{target} wasn't ready after {timeout}s")
+
+
+class LoadDriver:
+    """Closed loop clients: each sends its next request as soon as the previous one is answered."""
+
+    def __init__(self, target: str, lanes: list[dict], concurrency: int, timeout: float, seed: int = 0):
+        self.url = f'{target}/api/route/'
+        self.lanes = lanes
+        self.weights = [float(lane.get('weight', 1)) for lane in lanes]
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.seed = seed
+        self.samples: list[tuple[float, str]] = []  # (seconds, status code or exception name)
+        self._lock = threading.Lock()
+        self._sent = 0
+
+    def run(self, requests_count: int | None = None, duration: float | None = None) -> float:
+        """Send requests_count requests, or as many as fit in duration seconds. Returns the wall clock seconds."""
+        self._sent = 0
+        deadline = time.monotonic() + duration if duration else None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            clients = [
+                executor.submit(self._client, client, requests_count, deadline) for client in range(self.concurrency)
+            ]
+            for client in clients:
+                client.result()  # a failing client is a bug of the harness, not an error of the service
+        return time.perf_counter() - started
+
+    def _next(self, requests_count: int | None, deadline: float | None) -> bool:
+        if deadline is not None:
+            return time.monotonic() < deadline
+        with self._lock:
+            self._sent += 1
+            return self._sent <= requests_count
+
+    def _client(self, client: int, requests_count: int | None, deadline: float | None):
+        rng = random.Random(self.seed * 1000 + client)
+        session = requests.Session()
+        while self._next(requests_count, deadline):
+            lane = rng.choices(self.lanes, self.weights)[0]
+            body = {'start_location': lane['start_location'], 'end_location': lane['end_location']}
+            if lane.get('waypoints'):
+                body['waypoints'] = lane['waypoints']
+            started = time.perf_counter()
+            try:
+                outcome = str(session.post(self.url, json=body, timeout=self.timeout).status_code)
+            except requests.RequestException as e:
+                outcome = type(e).__name__
+            latency = time.perf_counter() - started
+            with self._lock:
+                self.samples.append((latency, outcome))
+
+
+def report(samples: list[tuple[float, str]], seconds: float, provider_calls: dict | None = None) -> dict:
+    outcomes = Counter(outcome for _, outcome in samples)
+    errors = sum(count for outcome, count in outcomes.items() if outcome != '200')
+    milliseconds = np.array([latency for latency, _ in samples]) * 1000
+    result = {
+        'requests': len(samples),
+        'seconds': round(seconds, 2),
+        'throughput_rps': round(len(samples) / seconds, 2) if seconds else 0.0,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'outcomes': dict(outcomes),
+        'latency_ms': {
+            name: round(float(np.percentile(milliseconds, percentile)), 2) if len(milliseconds) else None
+            for name, percentile in (('p50', 50), ('p90', 90), ('p95', 95), ('p99', 99), ('max', 100))
+        },
+    }
+    if provider_calls is not None:
+        # Calls per request show how much the caches and request coalescing save
+        result['provider_calls'] = provider_calls
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', type=str,
+                        help='URL of a running service, one routed through the fake provider is started if omitted')
+    parser.add_argument('--port', type=int, default=8765, help='Port of the service started by the load test')
+    parser.add_argument('--server-command', type=str, default=SERVER_COMMAND,
+                        help='Command starting the service, {port} is replaced (e.g. a gunicorn command line)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Clients sending requests at the same time')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests to send')
+    parser.add_argument('--duration', type=float, help='Send requests for this many seconds instead')
+    parser.add_argument('--warmup-requests', type=int, default=0, help='Requests sent first and left out')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds before a request counts as failed')
+    parser.add_argument('--lanes', type=str, help='JSON lines of lanes, with an optional weight')
+    parser.add_argument('--synthetic-lanes', type=int, default=50, help='Synthetic lanes when no file is given')
+    parser.add_argument('--provider-port', type=int, default=0, help='Port of the fake provider, 0 for any')
+    parser.add_argument('--latency-ms', type=float, default=150, help='Mean latency of the fake provider')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='Standard deviation of that latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of provider calls failing')
+    parser.add_argument('--recordings', type=str, help='JSON lines of recorded directions responses')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=str, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    from benchmarks.fake_provider import FakeProvider, load_recordings, start_fake_provider
+
+    lanes = load_lanes(args.lanes, args.synthetic_lanes, args.seed)
+    provider = server = service = None
+    target = args.target
+    if target is None:
+        provider = FakeProvider(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            recordings=load_recordings(args.recordings) if args.recordings else None,
+            seed=args.seed,
+        )
+        server = start_fake_provider(provider, port=args.provider_port)
+        service = start_service(args.server_command, args.port, f'http://127.0.0.1:{server.server_address[1]}')
+        target = f'http://127.0.0.1:{args.port}'
+
+    try:
+        wait_until_ready(target, timeout=120, service=service)
+        driver = LoadDriver(target, lanes, args.concurrency, args.timeout, seed=args.seed)
+        if args.warmup_requests:
+            driver.run(requests_count=args.warmup_requests)
+            driver.samples.clear()
+            if provider is not None:
+                provider.calls.clear()
+        seconds = driver.run(requests_count=args.requests, duration=args.duration)
+        result = {
+            'concurrency': args.concurrency,
+            'lanes': len(lanes),
+            'provider_latency_ms': args.latency_ms if provider is not None else None,
+            **report(driver.samples, seconds, dict(provider.calls) if provider is not None else None),
+        }
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=30)
+        if server is not None:
+            server.shutdown()
+
+    latency = result['latency_ms']
+    print(f"{result['requests']} requests in {result['seconds']}s at concurrency {args.concurrency}: "
+          f"{result['throughput_rps']} req/s, {result['error_rate']:.2%} errors {result['outcomes']}")
+    print(f"  latency p50 {latency['p50']} ms  p90 {latency['p90']} ms  p95 {latency['p95']} ms  "
+          f"p99 {latency['p99']} ms  max {latency['max']} ms")
+    if 'provider_calls' in result:
+        print(f"  provider calls {result['provider_calls']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
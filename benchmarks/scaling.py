@@ -0,0 +1,170 @@
+"""
+Scaling benchmark of station lookup and route planning over synthetic station sets.
+
+For every size, loads that many synthetic stations into a throwaway test database and
+measures the latency percentiles and Python memory peak of:
+
+- GreedyRouteOptimizer.find_next_station around points on the corridors
+- SpotterFuelStationRepository.get_stations_near_route around the same points
+- SpotterFuelStationRepository.get_stations_along_route, the corridor of every synthetic lane
+- end-to-end planning of synthetic lanes, with a local fake routing provider
+
+    python benchmarks/scaling.py [--sizes 10000,100000,1000000] [--queries 200] [--lanes 50] [--json out.json]
+
+Needs the PostGIS database from settings, the test database is created next to it and dropped afterwards.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter.settings')
+
+
+def percentiles(samples: list[float]) -> dict:
+    milliseconds = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(milliseconds, 50)), 2),
+        'p95_ms': round(float(np.percentile(milliseconds, 95)), 2),
+        'max_ms': round(float(milliseconds.max()), 2),
+    }
+
+
+def measure(function, arguments: list, memory_samples: int = 10) -> dict:
+    """
+    Call function once per argument tuple for latency percentiles and failures, then again on a
+    few of them under tracemalloc for the memory peak, tracing would skew the timings.
+    """
+    samples, failures = [], 0
+    for args in arguments:
+        started = time.perf_counter()
+        try:
+            function(*args)
+        except Exception:
+            failures += 1
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    for args in arguments[:memory_samples]:
+        with contextlib.suppress(Exception):
+            function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {**percentiles(samples), 'failures': failures, 'peak_memory_kb': round(peak / 1024)}
+
+
+def benchmark_size(size: int, queries: int, lanes: int, search_miles: float, seed: int) -> dict:
+    from django.conf import settings
+    from django.contrib.gis.geos import Point
+    from django.db import connection
+
+    from api.management.commands.generate_synthetic_stations import insert_stations
+    from api.models import FuelStation
+    from api.services import (
+        FakeGeocodingService,
+        GreedyRouteOptimizer,
+        RoutePlanner,
+        SpotterFuelStationRepository,
+        StandardFuelCostCalculator,
+    )
+    from api.services.synthetic_stations import (
+        CITY_LOCATIONS,
+        generate_lanes,
+        generate_stations,
+        sample_corridor_points,
+    )
+
+    FuelStation.objects.all().delete()
+    started = time.perf_counter()
+    insert_stations(generate_stations(size, seed=seed))
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {FuelStation._meta.db_table}')
+    load_seconds = time.perf_counter() - started
+
+    points = sample_corridor_points(queries, np.random.default_rng(seed + 1), spread_miles=5)
+    query_points = list(zip(points['latitudes'].tolist(), points['longitudes'].tolist()))
+
+    optimizer = GreedyRouteOptimizer(max_range_miles=settings.VEHICLE_MAX_RANGE_MILES, mpg=settings.VEHICLE_MPG)
+    repository = SpotterFuelStationRepository(None)
+    geocoding_service = FakeGeocodingService(locations=CITY_LOCATIONS, steps=100)
+    planner = RoutePlanner(geocoding_service, optimizer, StandardFuelCostCalculator(
+        mpg=settings.VEHICLE_MPG, max_range_miles=settings.VEHICLE_MAX_RANGE_MILES))
+
+    find_next_station = measure(
+        optimizer.find_next_station,
+        [(Point(lon, lat, srid=4326), search_miles) for lat, lon in query_points],
+    )
+    stations_near_route = measure(
+        repository.get_stations_near_route,
+        [((lat, lon), search_miles) for lat, lon in query_points],
+    )
+    lane_routes = [
+        planner.directions(lane['start_location'], lane['end_location']).route_points
+        for lane in generate_lanes(lanes, seed=seed)
+    ]
+    # Pruned to the station tiles the corridor touches, so it should stay flat as the stations grow
+    stations_along_route = measure(
+        repository.get_stations_along_route,
+        [(route, settings.ROUTE_CORRIDOR_MILES) for route in lane_routes],
+    )
+    plan = measure(
+        planner.plan,
+        [(lane['start_location'], lane['end_location']) for lane in generate_lanes(lanes, seed=seed)],
+    )
+
+    return {
+        'stations': size,
+        'load_seconds': round(load_seconds, 1),
+        'find_next_station': find_next_station,
+        'get_stations_near_route': stations_near_route,
+        'get_stations_along_route': stations_along_route,
+        'plan': plan,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=str, default='10000,100000,1000000',
+                        help='Comma separated station counts')
+    parser.add_argument('--queries', type=int, default=200, help='Lookups per size')
+    parser.add_argument('--lanes', type=int, default=50, help='Planned lanes per size')
+    parser.add_argument('--search-miles', type=float, default=100, help='Lookup radius')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keepdb', action='store_true', help='Reuse and keep the test database')
+    parser.add_argument('--json', type=str, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    import django
+    from django.db import connection
+
+    django.setup()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb)
+    results = []
+    try:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            result = benchmark_size(size, args.queries, args.lanes, args.search_miles, args.seed)
+            results.append(result)
+            print(f"{size} stations (loaded in {result['load_seconds']}s)")
+            for name in ('find_next_station', 'get_stations_near_route', 'get_stations_along_route', 'plan'):
+                timings = result[name]
+                print(f"  {name:24} p50 {timings['p50_ms']:9.2f} ms  p95 {timings['p95_ms']:9.2f} ms  "
+                      f"max {timings['max_ms']:9.2f} ms  peak {timings['peak_memory_kb']:7d} KB  "
+                      f"{timings['failures']} failed")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
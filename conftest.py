@@ -0,0 +1,2 @@
+# Query and provider call budgets, see api/testing.py
+pytest_plugins = ['api.testing']
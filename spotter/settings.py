@@ -22,11 +22,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'rest_framework',
     'api',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.DatabaseHealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -34,6 +36,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.RouteProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'spotter.urls'
@@ -56,6 +59,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'spotter.wsgi.application'
 
+# Connections are kept open for PG_CONN_MAX_AGE seconds and checked before requests by
+# api.middleware.DatabaseHealthCheckMiddleware (0 opens one per request, like before).
 DATABASES = {
     'default': {
         'ENGINE': 'django.contrib.gis.db.backends.postgis',
@@ -64,9 +69,26 @@ DATABASES = {
         'PASSWORD': os.environ.get("PG_PSWD"),
         'HOST': os.environ.get("PG_HOST_DEV" if DEBUG else "PG_HOST"),
         'PORT': os.environ.get("PG_PORT"),
+        'CONN_MAX_AGE': int(os.environ.get("PG_CONN_MAX_AGE", 300)),
     }
 }
 
+# Read replicas of the primary, comma separated hosts. Station reads of the route pipeline are spread over
+# the replicas by api.db_routers.ReplicaRouter, everything else and ingestion stay on the primary. A replica
+# failing its health check is skipped for DATABASE_REPLICA_RETRY_SECONDS.
+DATABASE_REPLICAS = []
+for i, host in enumerate(filter(None, os.environ.get("PG_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f'replica_{i}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{i}')
+DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+DATABASE_REPLICA_RETRY_SECONDS = float(os.environ.get("DATABASE_REPLICA_RETRY_SECONDS", 30))
+# Seconds an open connection that passed its health check is trusted without checking it again
+DATABASE_HEALTH_CHECK_INTERVAL = float(os.environ.get("DATABASE_HEALTH_CHECK_INTERVAL", 10))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -97,5 +119,101 @@ GEOS_LIBRARY_PATH = "/opt/homebrew/lib/libgeos_c.dylib"
 # OpenRouteService API Key - Replace with your key
 OPENROUTE_API_KEY = os.environ.get("OPENROUTE_API_KEY")
 GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
+# Google Maps web services, point it at benchmarks/fake_provider.py to load test without the live API
+GOOGLE_MAPS_BASE_URL = os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+# Routing providers in order of preference, the next one is hedged in when the previous is slow
+ROUTING_PROVIDERS = os.environ.get("ROUTING_PROVIDERS", "google,openroute").split(",")
+ROUTING_HEDGE_PERCENTILE = float(os.environ.get("ROUTING_HEDGE_PERCENTILE", 95))
+ROUTING_HEDGE_DEFAULT_DELAY = float(os.environ.get("ROUTING_HEDGE_DEFAULT_DELAY", 1.0))  # seconds
+ROUTING_HEDGE_MIN_DELAY = float(os.environ.get("ROUTING_HEDGE_MIN_DELAY", 0.05))  # seconds
+# Threads running provider calls, shared by all requests of a process: keep it above the request concurrency
+ROUTING_HEDGE_WORKERS = int(os.environ.get("ROUTING_HEDGE_WORKERS", 32))
+ROUTING_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("ROUTING_CIRCUIT_FAILURE_THRESHOLD", 5))
+ROUTING_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("ROUTING_CIRCUIT_RESET_TIMEOUT", 30))  # seconds
+
+# Token buckets of the provider endpoints as (requests per second, burst). Calls over the rate
+# queue for up to PROVIDER_QUOTA_MAX_WAIT seconds. Bulk jobs leave PROVIDER_QUOTA_BULK_RESERVE
+# of every bucket to interactive requests. The postgres backend shares the buckets across processes.
+PROVIDER_QUOTAS = {
+    "google.geocode": (float(os.environ.get("GOOGLE_GEOCODE_QPS", 50)), 50),
+    "google.directions": (float(os.environ.get("GOOGLE_DIRECTIONS_QPS", 50)), 50),
+    "google.distance_matrix": (float(os.environ.get("GOOGLE_DISTANCE_MATRIX_QPS", 50)), 50),
+    "openroute.geocode": (float(os.environ.get("OPENROUTE_GEOCODE_PER_MINUTE", 100)) / 60, 10),
+    "openroute.directions": (float(os.environ.get("OPENROUTE_DIRECTIONS_PER_MINUTE", 40)) / 60, 5),
+}
+PROVIDER_QUOTA_BACKEND = os.environ.get("PROVIDER_QUOTA_BACKEND", "local")  # local or postgres
+PROVIDER_QUOTA_BULK_RESERVE = float(os.environ.get("PROVIDER_QUOTA_BULK_RESERVE", 0.2))  # share of each bucket
+PROVIDER_QUOTA_MAX_WAIT = float(os.environ.get("PROVIDER_QUOTA_MAX_WAIT", 30))  # seconds
+
+# Vehicle assumptions used by the route pipeline
+VEHICLE_MAX_RANGE_MILES = float(os.environ.get("VEHICLE_MAX_RANGE_MILES", 500))
+VEHICLE_MPG = float(os.environ.get("VEHICLE_MPG", 10))
+
+# Fuel stop optimizer: 'greedy' queries stations around the route, 'graph' searches the precomputed
+# station graph written by the build_station_graph command, which price loads run with this optimizer only
+ROUTE_OPTIMIZER = os.environ.get("ROUTE_OPTIMIZER", "greedy")
+STATION_GRAPH_FILE = os.environ.get("STATION_GRAPH_FILE", BASE_DIR / "data/station_graph.npz")
+
+# Coalesce identical concurrent route requests, across processes through a Postgres advisory lock.
+# Sharing results across processes needs a shared CACHES backend (e.g. database or redis).
+ROUTE_COALESCE_ACROSS_PROCESSES = os.environ.get("ROUTE_COALESCE_ACROSS_PROCESSES", "false").lower() == "true"
+ROUTE_COALESCE_RESULT_TTL = float(os.environ.get("ROUTE_COALESCE_RESULT_TTL", 5))  # seconds
+
+# Store every plan with its geometry and the stations within ROUTE_CORRIDOR_MILES of it,
+# so drivers can re-plan mid-route without new directions or a full station search.
+# Off by default, it adds an insert to every route request.
+ROUTE_PLAN_PERSIST = os.environ.get("ROUTE_PLAN_PERSIST", "false").lower() == "true"
+# Plans are kept this many days, then deleted by the prune_route_plans command. Price loads only mark the plans
+# of the window stale, so older ones don't vouch for the price version of ETags either.
+ROUTE_PLAN_RETENTION_DAYS = float(os.environ.get("ROUTE_PLAN_RETENTION_DAYS", 30))
+ROUTE_CORRIDOR_MILES = float(os.environ.get("ROUTE_CORRIDOR_MILES", 25))
+# Waypoints of an itinerary, routed with one directions call. Its stations are fetched once along the
+# ROUTE_CORRIDOR_MILES corridor of the whole itinerary.
+ROUTE_MAX_WAYPOINTS = int(os.environ.get("ROUTE_MAX_WAYPOINTS", 25))
+# Lanes without waypoints whose start and end are both within ROUTE_REUSE_RADIUS_MILES of a route fetched in the last
+# ROUTE_REUSE_MAX_AGE_DAYS reuse it instead of asking for directions (0 disables it). Ends further than
+# ROUTE_REUSE_CONNECTOR_MILES from it are joined to it with a connector leg from the provider, closer ones
+# with a straight line. Lanes needing a connector leg at both ends are fetched directly.
+ROUTE_REUSE_RADIUS_MILES = float(os.environ.get("ROUTE_REUSE_RADIUS_MILES", 0))
+ROUTE_REUSE_CONNECTOR_MILES = float(os.environ.get("ROUTE_REUSE_CONNECTOR_MILES", 1))
+ROUTE_REUSE_MAX_AGE_DAYS = float(os.environ.get("ROUTE_REUSE_MAX_AGE_DAYS", 30))
+# Vehicle combinations (tank ranges x mpg x fuel levels) a single what-if request may ask for
+WHAT_IF_MAX_SCENARIOS = int(os.environ.get("WHAT_IF_MAX_SCENARIOS", 1000))
+# Alternative plans a single alternatives request may ask for
+ALTERNATIVE_PLANS_MAX = int(os.environ.get("ALTERNATIVE_PLANS_MAX", 10))
+
+# Route responses carry an ETag of the route geometry, vehicle and fuel price snapshot. Requests with a
+# matching If-None-Match get a 304 without optimizing. The price version is re-read every few seconds.
+ROUTE_CACHE_MAX_AGE = int(os.environ.get("ROUTE_CACHE_MAX_AGE", 60))  # seconds
+PRICE_VERSION_CACHE_SECONDS = float(os.environ.get("PRICE_VERSION_CACHE_SECONDS", 5))
+
+# Price loads NOTIFY this Postgres channel with the new price version and the changed stations. Each web worker
+# LISTENs on it from its warm-up and drops or refreshes what it cached of those stations.
+PRICE_CHANGES_CHANNEL = os.environ.get("PRICE_CHANGES_CHANNEL", "fuel_price_changes")
+PRICE_LISTENER_ENABLED = os.environ.get("PRICE_LISTENER_ENABLED", "true").lower() == "true"
+
+# Plan jobs submitted to /api/route/jobs/ are run by the run_plan_workers command. Running jobs older than
+# PLAN_JOB_STALE_AFTER seconds are taken to belong to a dead worker and retried, up to PLAN_JOB_MAX_ATTEMPTS runs.
+PLAN_JOB_POLL_INTERVAL = float(os.environ.get("PLAN_JOB_POLL_INTERVAL", 1))  # seconds
+PLAN_JOB_STALE_AFTER = float(os.environ.get("PLAN_JOB_STALE_AFTER", 600))  # seconds
+PLAN_JOB_MAX_ATTEMPTS = int(os.environ.get("PLAN_JOB_MAX_ATTEMPTS", 3))
+
+# Warm-up of every web worker at boot, /api/ready/ answers 503 until it's done. Hot lanes are the
+# WARMUP_HOT_LANES most planned lanes of the last WARMUP_LANE_WINDOW_HOURS, their corridors are queried once.
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "true").lower() == "true"
+WARMUP_HOT_LANES = int(os.environ.get("WARMUP_HOT_LANES", 20))
+WARMUP_LANE_WINDOW_HOURS = float(os.environ.get("WARMUP_LANE_WINDOW_HOURS", 24))
+
+# Opt-in profiling of route requests, sampled or forced with the X-Profile-Route header
+ROUTE_PROFILING_ENABLED = os.environ.get("ROUTE_PROFILING_ENABLED", "false").lower() == "true"
+ROUTE_PROFILING_SAMPLE_RATE = float(os.environ.get("ROUTE_PROFILING_SAMPLE_RATE", 0))  # 0..1
+ROUTE_PROFILING_INTERVAL = float(os.environ.get("ROUTE_PROFILING_INTERVAL", 0.005))  # seconds between samples
+ROUTE_PROFILING_DIR = os.environ.get("ROUTE_PROFILING_DIR", BASE_DIR / "profiles")
 
 MAP_PLOT_FILE = BASE_DIR / "api/templates/route_map.html"
+# Map plotter used after each route request, empty to skip plotting
+MAP_PLOTTER = os.environ.get("MAP_PLOTTER", "folium")
+# 'lite' draws one simplified polyline with markers for the endpoints and fuel stops, 'markers' a marker per point
+MAP_RENDER_MODE = os.environ.get("MAP_RENDER_MODE", "lite")
+MAP_MAX_POINTS = int(os.environ.get("MAP_MAX_POINTS", 2000))
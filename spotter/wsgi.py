@@ -4,3 +4,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter.settings')
 
 application = get_wsgi_application()
+
+# Warm the worker up in the background, /api/ready/ reports when it's done
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_START:
+    from api.warmup import start_warmup  # noqa: E402
+
+    start_warmup()